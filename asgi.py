@@ -0,0 +1,641 @@
+"""ASGI entry point. The routes that wait on Whisper or Groq run as coroutines.
+
+POST /transcribe, /enhance, /translate, /pipeline, /enhance/stream and /translate/stream
+await AsyncOpenAI and agno's `arun`. These calls share one pooled HTTP client, with
+keep-alive, and with HTTP/2 when the `h2` package is installed. An in-flight upstream
+call therefore holds a coroutine, not a thread.
+
+talk.py still does the routing, form parsing, page rendering and before/after_request
+hooks. Every other route runs the Flask app on a worker thread.
+
+    uvicorn asgi:app --workers 4        (or: python serve.py --async)
+"""
+import asyncio, importlib.util, io, json, logging, os, sys, tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+from flask import request
+from werkzeug.exceptions import HTTPException, RequestEntityTooLarge
+
+import services
+import talk
+import upstream
+from batch import parse_packed
+from metrics import stage
+from segment import chunk_text, join_chunks
+from streaming import ThinkStripper, astream_agent, sse
+from transmem import parse_list
+
+log = logging.getLogger(__name__)
+flask_app = talk.app
+
+UPSTREAM_MAX_CONNECTIONS = int(os.getenv("UPSTREAM_MAX_CONNECTIONS", "100"))
+ASGI_THREADS = int(os.getenv("ASGI_THREADS", "32"))
+HTTP2 = importlib.util.find_spec("h2") is not None
+
+http_client = None
+openai_client = None
+warm_up_task = None
+ASYNC_VIEWS = {}
+
+
+def configure(openai_client=None):
+    """Use another async Whisper client (e.g. bench.fakes.AsyncFakeWhisperClient).
+    Agents are configured through `talk.configure`; they need an `arun` method."""
+    globals()["openai_client"] = openai_client
+
+
+async def startup():
+    global http_client, openai_client, warm_up_task
+    if http_client is not None:
+        return
+    asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(ASGI_THREADS, thread_name_prefix="wsgi"))
+    http_client = httpx.AsyncClient(
+        http2=HTTP2,
+        limits=httpx.Limits(max_connections=UPSTREAM_MAX_CONNECTIONS, keepalive_expiry=60),
+        timeout=httpx.Timeout(300, connect=10),
+    )
+    if openai_client is None:
+        from openai import AsyncOpenAI
+        openai_client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"), http_client=http_client, max_retries=0)
+    for agent in (services.enhance_agent(), services.translate_agent(), services.pipeline_agent()):
+        model = getattr(agent, "model", None)
+        if hasattr(model, "async_client"):
+            from groq import AsyncGroq
+            model.async_client = AsyncGroq(api_key=getattr(model, "api_key", None) or os.getenv("GROQ_API_KEY"),
+                                           http_client=http_client, max_retries=0)
+    if services.warm_up_enabled():
+        warm_up_task = asyncio.ensure_future(warm_up())
+
+
+async def warm_up():
+    """Open the pooled upstream connections (TLS, HTTP/2) before the first request needs them."""
+    async def touch(name, call):
+        try:
+            await call()
+        except Exception as e:
+            log.warning("warm-up: %s: %s", name, e)
+
+    targets = [("OpenAI", lambda: openai_client.models.retrieve(talk.WHISPER_MODEL))]
+    for agent in (services.enhance_agent(), services.translate_agent(), services.pipeline_agent()):
+        client = getattr(getattr(agent, "model", None), "async_client", None)
+        if client is not None:
+            targets.append((agent.name, client.models.list))
+    await asyncio.gather(*(touch(name, call) for name, call in targets))
+
+
+async def shutdown():
+    global http_client
+    if http_client is not None:
+        await http_client.aclose()
+        http_client = None
+
+
+# ---------- Async counterparts of the talk.py helpers ----------
+async def agent_output(agent, prompt) -> str:
+    with stage(talk.agent_stage(agent)):
+        raw = await upstream.for_agent(agent).acall(agent.arun, prompt)
+    with stage("clean_output"):
+        return talk.clean_output(getattr(raw, "content", None) or getattr(raw, "text", None) or str(raw))
+
+
+async def as_is(part) -> str:
+    return part
+
+
+def translating(lang):
+    """A make_prompt for translating to `lang`; the glossary lookup runs on a worker thread.
+    Prompt builders here are coroutine functions, so none of them queries SQLite on the loop."""
+    return lambda part: asyncio.to_thread(talk.translate_prompt, part, lang)
+
+
+async def run_agent(agent, prompt, text, lang=None, use_cache=True) -> str:
+    key = await asyncio.to_thread(talk.agent_key, agent, text, lang)
+    return await talk.result_cache.get_or_compute_async(key, lambda: agent_output(agent, prompt), use_cache=use_cache)
+
+
+def run_chunks(agent, chunks, make_prompt, lang, use_cache):
+    """One task per chunk, at most LONG_TEXT_WORKERS running at a time."""
+    limit = asyncio.Semaphore(talk.LONG_TEXT_WORKERS)
+
+    async def process(part):
+        async with limit:
+            return await run_agent(agent, await make_prompt(part), part, lang=lang, use_cache=use_cache)
+
+    return [asyncio.ensure_future(process(chunk.text)) for chunk in chunks]
+
+
+async def process_text(agent, text, make_prompt, lang=None, use_cache=True):
+    chunks = chunk_text(text, talk.LONG_TEXT_CHUNK_TOKENS)
+    if len(chunks) <= 1:
+        return await run_agent(agent, await make_prompt(text), text, lang=lang, use_cache=use_cache), 0
+    outputs = await asyncio.gather(*run_chunks(agent, chunks, make_prompt, lang, use_cache), return_exceptions=True)
+    errors = [output for output in outputs if isinstance(output, BaseException)]
+    if len(errors) == len(chunks):
+        raise errors[0]
+    parts = [(chunk, chunk.text if isinstance(output, BaseException) else output) for chunk, output in zip(chunks, outputs)]
+    return join_chunks(parts), len(errors)
+
+
+async def enhance_text(text, use_cache=True):
+    return await process_text(services.enhance_agent(), text, as_is, use_cache=use_cache)
+
+
+async def translate_text(text, lang, use_cache=True):
+    if not talk.TRANSLATION_MEMORY:
+        return await process_text(services.translate_agent(), text, translating(lang), lang=lang, use_cache=use_cache)
+    plan = await asyncio.to_thread(talk.memory_plan, text, lang, use_cache)
+    pieces, errors = [], []
+    async for piece, piece_errors in memory_pieces(plan, lang):
+        pieces.append(piece)
+        errors.extend(piece_errors)
+    if errors and len(errors) == len(plan.segments):
+        raise errors[0]
+    return "".join(pieces).strip(), len(errors)
+
+
+async def translate_segments(sources, lang, terms=()):
+    agent = services.translate_agent()
+    if len(sources) > 1:
+        found = parse_list(await agent_output(agent, talk.segments_prompt(sources, lang, terms)), len(sources))
+        if found:
+            return found
+        talk.MEMORY_FALLBACKS.inc()
+    return [await agent_output(agent, await asyncio.to_thread(talk.translate_prompt, source, lang, terms))
+            for source in sources]
+
+
+async def memory_pieces(plan, lang):
+    """Async version of talk.memory_pieces: one task per batch, at most LONG_TEXT_WORKERS running."""
+    limit = asyncio.Semaphore(talk.LONG_TEXT_WORKERS)
+
+    async def process(sources):
+        async with limit:
+            translations = await translate_segments(sources, lang, plan.terms)
+        return await asyncio.to_thread(talk.learn_translations, lang, sources, translations)
+
+    tasks = {}
+    for batch in plan.batches:
+        task = asyncio.ensure_future(process(batch))
+        tasks.update((source, task) for source in batch)
+    try:
+        piece, errors = "", []
+        for segment in plan.segments:
+            if segment.source in plan.known:
+                out = plan.known[segment.source]
+            else:
+                task = tasks[segment.source]
+                if piece and not task.done():
+                    yield piece, errors
+                    piece, errors = "", []
+                try:
+                    out = (await task)[segment.source]
+                except Exception as e:
+                    out = segment.source
+                    errors.append(e)
+            piece += out + segment.sep
+        if piece:
+            yield piece, errors
+    finally:
+        for task in tasks.values():
+            task.cancel()
+
+
+async def enhance_translate_part(text, lang, use_cache=True):
+    agent = services.pipeline_agent()
+
+    async def compute():
+        prompt = await asyncio.to_thread(talk.combined_prompt, text, lang)
+        found = parse_packed(await agent_output(agent, prompt), talk.COMBINED_KEYS)
+        return json.dumps(found) if len(found) == len(talk.COMBINED_KEYS) else None
+
+    key = await asyncio.to_thread(talk.agent_key, agent, text, lang)
+    found = await talk.result_cache.get_or_compute_async(key, compute, use_cache=use_cache)
+    if found:
+        found = json.loads(found)
+        return found["enhanced"], found["translation"]
+    talk.PIPELINE_FALLBACKS.inc()
+    enhanced = await run_agent(services.enhance_agent(), text, text, use_cache=use_cache)
+    translation = await run_agent(services.translate_agent(), await translating(lang)(enhanced), enhanced,
+                                  lang=lang, use_cache=use_cache)
+    return enhanced, translation
+
+
+async def enhance_and_translate(text, lang, use_cache=True):
+    chunks = chunk_text(text, talk.LONG_TEXT_CHUNK_TOKENS)
+    if len(chunks) <= 1:
+        return (*await enhance_translate_part(text, lang, use_cache), 0)
+    limit = asyncio.Semaphore(talk.LONG_TEXT_WORKERS)
+
+    async def process(part):
+        async with limit:
+            return await enhance_translate_part(part, lang, use_cache)
+
+    outputs = await asyncio.gather(*(process(chunk.text) for chunk in chunks), return_exceptions=True)
+    errors = [output for output in outputs if isinstance(output, BaseException)]
+    if len(errors) == len(chunks):
+        raise errors[0]
+    pairs = [(chunk.text, chunk.text) if isinstance(output, BaseException) else output for chunk, output in zip(chunks, outputs)]
+    return (join_chunks([(chunk, pair[0]) for chunk, pair in zip(chunks, pairs)]),
+            join_chunks([(chunk, pair[1]) for chunk, pair in zip(chunks, pairs)]), len(errors))
+
+
+async def whisper_transcribe(stream, kind, size, long_mode=False):
+    if long_mode or size > talk.LONG_AUDIO_MIN_MB * 1024 * 1024:
+        # Decoding is CPU-bound and the segments already fan out on their own threads.
+        return await asyncio.to_thread(talk.whisper_transcribe, stream, kind, size, True)
+    name, payload = await asyncio.to_thread(talk.whisper_upload, stream, kind, size)
+    client = upstream.scheduled_client(openai_client, upstream.get("openai", talk.WHISPER_MODEL), asynchronous=True)
+    with stage("whisper"):
+        whisper_out = await client.audio.transcriptions.create(
+            model=talk.WHISPER_MODEL, file=(name, payload), response_format="text", temperature=0
+        )
+    return str(whisper_out), None
+
+
+async def transcribe_upload(upload, use_cache=True, long_mode=False, lang=None):
+    key = talk.transcript_key(upload.digest)
+    entry = json.loads(await asyncio.to_thread(talk.transcript_cache.get, key) or "{}") if use_cache else {}
+    transcript, notice = entry.get("transcript"), None
+    if transcript is None:
+        transcript = (await asyncio.to_thread(talk.stored_result, key, use_cache) or {}).get("source")
+    if transcript is None:
+        transcript, notice = await whisper_transcribe(upload, upload.kind, upload.size, long_mode)
+    enhance_key = await asyncio.to_thread(talk.agent_key, services.enhance_agent(), transcript)
+    if not lang and entry.get("enhance_key") == enhance_key and entry.get("enhanced"):
+        return transcript, entry["enhanced"], None, notice, True
+    translation = None
+    if lang:
+        enhanced, translation, failed = await enhance_and_translate(transcript, lang, use_cache=use_cache)
+    else:
+        enhanced, failed = await enhance_text(transcript, use_cache=use_cache)
+    notice = await asyncio.to_thread(talk.remember_transcript, key, entry, transcript, None if lang else enhanced,
+                                     enhance_key, notice, failed)
+    return transcript, enhanced, translation, notice, False
+
+
+async def stream_agent_response(agent, text, make_prompt, lang=None):
+    """Async version of talk.stream_agent_response. The events are an async iterator
+    kept on the response as `async_body`."""
+    key = await asyncio.to_thread(talk.agent_key, agent, text, lang)
+    use_cache = talk.wants_cache()
+    chunks = chunk_text(text, talk.LONG_TEXT_CHUNK_TOKENS)
+    user, stored = talk.history_user(), await asyncio.to_thread(talk.stored_result, key, use_cache)
+
+    async def generate_chunked():
+        tasks = run_chunks(agent, chunks, make_prompt, lang, use_cache)
+        failed, outputs = 0, []
+        try:
+            for i, (chunk, task) in enumerate(zip(chunks, tasks)):
+                try:
+                    output = await task
+                except Exception:
+                    failed += 1
+                    output = chunk.text
+                outputs.append(output + (chunk.sep if i < len(chunks) - 1 else ""))
+                yield sse("delta", text=outputs[-1])
+        finally:
+            for task in tasks:
+                task.cancel()
+        await asyncio.to_thread(talk.remember_output, user, agent, text, "".join(outputs), lang, None if failed else key)
+        if failed:
+            yield sse("error", error=f"{failed} of {len(chunks)} parts failed and are shown unchanged.")
+        yield sse("done", cached=False, chunks=len(chunks), failed=failed)
+
+    async def generate_from_memory():
+        plan = await asyncio.to_thread(talk.memory_plan, text, lang, use_cache)
+        failed, outputs = 0, []
+        async for piece, errors in memory_pieces(plan, lang):
+            failed += len(errors)
+            outputs.append(piece)
+            yield sse("delta", text=piece)
+        await asyncio.to_thread(talk.remember_output, user, agent, text, "".join(outputs), lang, None if failed else key)
+        if failed:
+            yield sse("error", error=f"{failed} of {len(plan.segments)} sentences failed and are shown unchanged.")
+        yield sse("done", cached=not plan.batches, segments=len(plan.segments), failed=failed)
+
+    async def generate():
+        cached = stored and stored[talk.HISTORY_FIELDS[talk.agent_stage(agent)]]
+        if not cached and talk.TRANSLATION_MEMORY and agent is services.translate_agent():
+            async for event in generate_from_memory():
+                yield event
+            return
+        if not cached and len(chunks) > 1:
+            async for event in generate_chunked():
+                yield event
+            return
+        if not cached and use_cache:
+            cached = await asyncio.to_thread(talk.result_cache.get, key)
+        if cached:
+            yield sse("delta", text=cached)
+            await asyncio.to_thread(talk.remember_output, user, agent, text, cached, lang, key)
+            yield sse("done", cached=True)
+            return
+        stripper = ThinkStripper()
+        parts = []
+        try:
+            async with upstream.for_agent(agent).aslot():
+                with stage(talk.agent_stage(agent)):
+                    async for piece in astream_agent(agent, await make_prompt(text)):
+                        out = stripper.feed(piece)
+                        if out:
+                            parts.append(out)
+                            yield sse("delta", text=out)
+            out = stripper.finish()
+            if out:
+                parts.append(out)
+                yield sse("delta", text=out)
+        except Exception as e:
+            yield sse("error", error=str(e))
+            return
+        if parts:
+            await asyncio.to_thread(talk.result_cache.set, key, "".join(parts))
+            await asyncio.to_thread(talk.remember_output, user, agent, text, "".join(parts), lang, key)
+        yield sse("done", cached=False)
+
+    resp = flask_app.response_class(mimetype="text/event-stream",
+                                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+    resp.automatically_set_content_length = False
+    resp.async_body = generate()
+    return resp
+
+
+# ---------- Async views (POST only; GET pages go to the Flask app) ----------
+def async_view(endpoint):
+    def register(view):
+        ASYNC_VIEWS[endpoint] = view
+        return view
+    return register
+
+
+@async_view("transcribe")
+async def transcribe():
+    transcript = enhanced = translation = notice = None
+    cached = False
+    file = request.files.get("audio")
+    lang = (request.form.get("lang") or "").strip() or None
+    error = talk.upload_error(file)
+    if not error:
+        try:
+            transcript, enhanced, translation, notice, cached = await transcribe_upload(
+                file.stream, use_cache=talk.wants_cache(), long_mode=bool(request.form.get("long")), lang=lang
+            )
+            await asyncio.to_thread(talk.remember, talk.history_user(), "transcribe", transcript, enhanced, translation,
+                                    lang, key=None if notice else talk.transcript_key(file.stream.digest))
+        except Exception as e:
+            error = f"Processing error: {e}"
+    # The page saves the enhanced text for the Translate/Speak links: SQLite, so off the loop.
+    return await asyncio.to_thread(talk.transcribe_page, transcript, enhanced, error, notice, cached, translation, lang)
+
+
+@async_view("enhance")
+async def enhance():
+    original = enhanced_text = error = None
+    text = (request.form.get("text") or "").strip()
+    if not text:
+        error = "No text provided."
+    else:
+        try:
+            key = await asyncio.to_thread(talk.agent_key, services.enhance_agent(), text)
+            stored, failed = await asyncio.to_thread(talk.stored_result, key, talk.wants_cache()), 0
+            if stored:
+                enhanced_text = stored["enhanced"]
+            else:
+                enhanced_text, failed = await enhance_text(text, use_cache=talk.wants_cache())
+            await asyncio.to_thread(talk.remember, talk.history_user(), "enhance", text, enhanced=enhanced_text,
+                                    key=None if failed else key)
+            original = text
+            if failed:
+                error = f"{failed} parts could not be enhanced and are shown unchanged."
+        except Exception as e:
+            error = f"Enhancement error: {e}"
+    return await asyncio.to_thread(talk.enhance_page, original, enhanced_text, error)
+
+
+@async_view("enhance_stream")
+async def enhance_stream():
+    text = (request.form.get("text") or "").strip()
+    if not text:
+        return "No text provided", 400
+    return await stream_agent_response(services.enhance_agent(), text, as_is)
+
+
+@async_view("translate_page")
+async def translate_page():
+    text = await asyncio.to_thread(talk.submitted_text)
+    lang = (request.form.get("lang") or "").strip() or "Spanish"
+    if not text:
+        return "No text provided", 400
+    try:
+        key = await asyncio.to_thread(talk.agent_key, services.translate_agent(), text, lang)
+        stored, failed = await asyncio.to_thread(talk.stored_result, key, talk.wants_cache()), 0
+        if stored:
+            translated = stored["translation"]
+        else:
+            translated, failed = await translate_text(text, lang, use_cache=talk.wants_cache())
+        await asyncio.to_thread(talk.remember, talk.history_user(), "translate", text, translation=translated,
+                                lang=lang, key=None if failed else key)
+        return talk.translated_page(lang, translated)
+    except Exception as e:
+        return f"Translation error: {talk.h(str(e))}", 500
+
+
+@async_view("translate_stream")
+async def translate_stream():
+    text = await asyncio.to_thread(talk.submitted_text)
+    lang = (request.form.get("lang") or "").strip() or "Spanish"
+    if not text:
+        return "No text provided", 400
+    return await stream_agent_response(services.translate_agent(), text, translating(lang), lang=lang)
+
+
+@async_view("pipeline")
+async def pipeline():
+    text = await asyncio.to_thread(talk.submitted_text)
+    lang = (request.form.get("lang") or "").strip() or "Spanish"
+    if not text:
+        return {"error": "No text provided."}, 400
+    key = await asyncio.to_thread(talk.agent_key, services.pipeline_agent(), text, lang)
+    stored, failed = await asyncio.to_thread(talk.stored_result, key, talk.wants_cache()), 0
+    if stored:
+        enhanced, translation = stored["enhanced"], stored["translation"]
+    else:
+        try:
+            enhanced, translation, failed = await enhance_and_translate(text, lang, use_cache=talk.wants_cache())
+        except Exception as e:
+            return {"error": str(e)}, 502
+    await asyncio.to_thread(talk.remember, talk.history_user(), "pipeline", text, enhanced, translation, lang,
+                            key=None if failed else key)
+    return await asyncio.to_thread(talk.pipeline_result, enhanced, translation, lang, failed)
+
+
+# ---------- ASGI <-> WSGI plumbing ----------
+async def read_body(scope, receive):
+    """Receive the request body into a spooled file, or raise RequestEntityTooLarge."""
+    limit = flask_app.config["MAX_CONTENT_LENGTH"]
+    declared = dict(scope["headers"]).get(b"content-length")
+    if limit is not None and declared and declared.isdigit() and int(declared) > limit:
+        raise RequestEntityTooLarge()
+    body = tempfile.SpooledTemporaryFile(max_size=flask_app.config["UPLOAD_SPOOL_BYTES"],
+                                         dir=flask_app.config["UPLOAD_TMP_DIR"])
+    size = 0
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            body.close()
+            return None
+        chunk = message.get("body", b"")
+        size += len(chunk)
+        if limit is not None and size > limit:
+            body.close()
+            raise RequestEntityTooLarge()
+        body.write(chunk)
+        if not message.get("more_body"):
+            break
+    body.seek(0)
+    return body
+
+
+def build_environ(scope, body):
+    server = scope.get("server") or ("localhost", 80)
+    client = scope.get("client") or ("", 0)
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", "").encode("utf-8").decode("latin-1"),
+        "PATH_INFO": scope["path"].encode("utf-8").decode("latin-1"),
+        "QUERY_STRING": scope["query_string"].decode("latin-1"),
+        "SERVER_NAME": server[0],
+        "SERVER_PORT": str(server[1]),
+        "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+        "REMOTE_ADDR": client[0],
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": body,
+        "wsgi.input_terminated": True,
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": True,
+        "wsgi.run_once": False,
+    }
+    for name, value in scope["headers"]:
+        name, value = name.decode("latin-1").upper().replace("-", "_"), value.decode("latin-1")
+        key = name if name in ("CONTENT_TYPE", "CONTENT_LENGTH") else f"HTTP_{name}"
+        environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+
+def async_endpoint(environ):
+    if environ["REQUEST_METHOD"] != "POST":
+        return None
+    try:
+        endpoint, _ = flask_app.url_map.bind_to_environ(environ).match()
+    except HTTPException:
+        return None
+    return ASYNC_VIEWS.get(endpoint)
+
+
+async def call_view(environ, view):
+    """Run an async view inside a Flask request context: before_request hooks, error
+    handlers and after_request hooks (compression, metrics) all apply."""
+    ctx = flask_app.request_context(environ)
+    ctx.push()
+    try:
+        try:
+            rv = flask_app.preprocess_request()
+            if rv is None:
+                if request.mimetype == "multipart/form-data" and view is not too_large:
+                    with stage("upload"):
+                        await asyncio.to_thread(lambda: request.files)
+                rv = await view()
+        except Exception as e:
+            rv = flask_app.handle_user_exception(e)
+        return flask_app.finalize_request(rv)
+    except Exception as e:
+        return flask_app.finalize_request(flask_app.handle_exception(e), from_error_handler=True)
+    finally:
+        ctx.pop()
+
+
+async def send_response(response, environ, send):
+    headers = response.get_wsgi_headers(environ)
+    await send({
+        "type": "http.response.start",
+        "status": response.status_code,
+        "headers": [(k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in headers.items()],
+    })
+    events = getattr(response, "async_body", None)
+    if events is not None:
+        try:
+            async for event in events:
+                await send({"type": "http.response.body", "body": event.encode("utf-8"), "more_body": True})
+        finally:
+            await events.aclose()
+    else:
+        for chunk in response.get_app_iter(environ):
+            await send({"type": "http.response.body", "body": chunk, "more_body": True})
+    await send({"type": "http.response.body", "body": b""})
+
+
+async def call_wsgi(environ, send):
+    """Run the Flask app on a worker thread, pulling the body from it chunk by chunk."""
+    started = {}
+
+    def start_response(status, headers, exc_info=None):
+        started["status"], started["headers"] = int(status.split(" ", 1)[0]), headers
+
+    result = await asyncio.to_thread(flask_app.wsgi_app, environ, start_response)
+    chunks = iter(result)
+    try:
+        await send({
+            "type": "http.response.start",
+            "status": started["status"],
+            "headers": [(k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in started["headers"]],
+        })
+        while True:
+            chunk = await asyncio.to_thread(next, chunks, None)
+            if chunk is None:
+                break
+            if chunk:
+                await send({"type": "http.response.body", "body": chunk, "more_body": True})
+        await send({"type": "http.response.body", "body": b""})
+    finally:
+        if hasattr(result, "close"):
+            await asyncio.to_thread(result.close)
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await startup()
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await shutdown()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def too_large():
+    raise RequestEntityTooLarge()
+
+
+async def app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        return await lifespan(receive, send)
+    if scope["type"] != "http":
+        return
+    await startup()
+    view = None
+    try:
+        body = await read_body(scope, receive)
+    except RequestEntityTooLarge:
+        body, view = io.BytesIO(), too_large
+    if body is None:
+        return
+    with body:
+        environ = build_environ(scope, body)
+        view = view or async_endpoint(environ)
+        if view is None:
+            return await call_wsgi(environ, send)
+        response = await call_view(environ, view)
+        await send_response(response, environ, send)
@@ -0,0 +1,72 @@
+"""Pre-built responses: bodies compressed once, ETags computed once, 304 support."""
+import gzip, hashlib, os
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only
+    brotli = None
+
+MIN_COMPRESS_BYTES = 1024
+
+
+def negotiate_encoding(accept_encoding: str) -> str:
+    """Best encoding we can produce for an Accept-Encoding header."""
+    offered = {}
+    for part in (accept_encoding or "").lower().split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        if params.strip().startswith("q="):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        if name:
+            offered[name] = q
+    if brotli is not None and offered.get("br", 0) > 0:
+        return "br"
+    if offered.get("gzip", 0) > 0:
+        return "gzip"
+    return "identity"
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=5)
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=6)
+    return body
+
+
+class Asset:
+    """A fixed body served with a content-hash ETag, in every encoding we support."""
+
+    def __init__(self, body: bytes, mimetype: str):
+        self.mimetype = mimetype
+        self.fingerprint = hashlib.sha256(body).hexdigest()[:12]
+        self.variants = {"identity": body}
+        if len(body) >= MIN_COMPRESS_BYTES:
+            self.variants["gzip"] = gzip.compress(body, compresslevel=9)
+            if brotli is not None:
+                self.variants["br"] = brotli.compress(body, quality=11)
+
+    @classmethod
+    def from_file(cls, path, mimetype):
+        with open(path, "rb") as f:
+            return cls(f.read(), mimetype)
+
+    def fingerprinted(self, path: str) -> str:
+        """'static/site.css' -> 'site.<hash>.css'"""
+        stem, ext = os.path.splitext(os.path.basename(path))
+        return f"{stem}.{self.fingerprint}{ext}"
+
+    def response(self, response_class, request, cache_control):
+        encoding = negotiate_encoding(request.headers.get("Accept-Encoding"))
+        if encoding not in self.variants:
+            encoding = "identity"
+        resp = response_class(self.variants[encoding], mimetype=self.mimetype)
+        resp.set_etag(self.fingerprint if encoding == "identity" else f"{self.fingerprint}-{encoding}")
+        resp.headers["Cache-Control"] = cache_control
+        resp.vary.add("Accept-Encoding")
+        if encoding != "identity":
+            resp.headers["Content-Encoding"] = encoding
+        return resp.make_conditional(request)
@@ -0,0 +1,219 @@
+"""PCM helpers for the audio paths. Audio is handled as 16-bit little-endian mono PCM;
+WAV files are read with the standard library, anything else is decoded with ffmpeg.
+
+Long recordings are decoded into a temporary file and mapped into memory (`decoded`),
+so a long upload does not need its whole PCM in RAM at once.
+
+WAV conversion and RMS use `audioop`, which Python 3.13 removed from the standard
+library (the `audioop-lts` package restores it). Without it, WAVs that are not
+already mono 16-bit at the wanted rate are converted by ffmpeg instead, and RMS is
+computed in pure Python."""
+import array, io, math, mmap, os, shutil, struct, subprocess, tempfile, warnings, wave
+from contextlib import contextmanager
+
+with warnings.catch_warnings():
+    warnings.simplefilter("ignore", DeprecationWarning)  # deprecated since 3.11; handled below when gone
+    try:
+        import audioop
+    except ImportError:  # Python 3.13+ without audioop-lts
+        audioop = None
+
+SAMPLE_RATE = 16000
+SAMPLE_WIDTH = 2
+# RMS below which a 20 ms frame counts as silence (about -44 dBFS): room tone, not speech.
+SILENCE_RMS = 200
+
+
+def sniff(head: bytes):
+    """Container type from the first bytes of a file ("wav", "mp3", ...), or None."""
+    if head[:4] == b"RIFF" and head[8:12] == b"WAVE":
+        return "wav"
+    if head[:4] == b"fLaC":
+        return "flac"
+    if head[:4] == b"OggS":
+        return "ogg"
+    if head[:4] == b"\x1a\x45\xdf\xa3":
+        return "webm"
+    if head[4:8] == b"ftyp":
+        return "m4a"
+    if head[:3] == b"ID3" or (len(head) > 1 and head[0] == 0xFF and head[1] & 0xE0 == 0xE0):
+        return "mp3"
+    return None
+
+
+SNIFF_BYTES = 12
+
+
+def decode(path, rate=SAMPLE_RATE) -> bytes:
+    """Decode any audio file to mono 16-bit PCM at `rate`. For short clips; see `decoded`."""
+    out = io.BytesIO()
+    decode_into(path, out, rate)
+    return out.getvalue()
+
+
+@contextmanager
+def decoded(path, rate=SAMPLE_RATE, tmp_dir=None):
+    """`path` decoded like `decode`, into a temporary file that is memory-mapped: yields
+    a read-only memoryview of the PCM. Slices of it are views too, so only the pages in
+    use are resident. The file is removed on exit."""
+    if tmp_dir:
+        os.makedirs(tmp_dir, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(suffix=".pcm", dir=tmp_dir)
+    try:
+        with os.fdopen(fd, "wb") as out:
+            decode_into(path, out, rate)
+        if os.path.getsize(tmp) == 0:
+            yield memoryview(b"")
+            return
+        with open(tmp, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(mapped)
+        try:
+            yield view
+        finally:
+            view.release()
+            try:
+                mapped.close()
+            except BufferError:  # a slice outlived the block; unmapped when it is collected
+                pass
+    finally:
+        try:
+            os.remove(tmp)
+        except OSError:  # still mapped on Windows
+            pass
+
+
+def decode_into(path, out, rate=SAMPLE_RATE):
+    """Write `path` as mono 16-bit PCM at `rate` to the binary file `out`."""
+    try:
+        read_wav(path, out, rate)
+    except (wave.Error, EOFError, RuntimeError):
+        out.seek(0)
+        out.truncate()
+        ffmpeg_decode(path, out, rate)
+
+
+def read_wav(path, out, rate=SAMPLE_RATE, chunk_s=10):
+    """Convert a WAV file to `out` in chunks of `chunk_s` seconds."""
+    with wave.open(path, "rb") as w:
+        channels, width, src_rate = w.getnchannels(), w.getsampwidth(), w.getframerate()
+        if (channels, width, src_rate) != (1, SAMPLE_WIDTH, rate):
+            if audioop is None:
+                raise RuntimeError("audioop unavailable; converting WAV needs ffmpeg")
+            if channels not in (1, 2):
+                raise RuntimeError(f"unsupported channel count: {channels}")
+        state = None
+        while True:
+            pcm = w.readframes(src_rate * chunk_s)
+            if not pcm:
+                return
+            if width != SAMPLE_WIDTH:
+                pcm = audioop.lin2lin(pcm, width, SAMPLE_WIDTH)
+            if channels == 2:
+                pcm = audioop.tomono(pcm, SAMPLE_WIDTH, 0.5, 0.5)
+            if src_rate != rate:
+                pcm, state = audioop.ratecv(pcm, SAMPLE_WIDTH, 1, src_rate, rate, state)
+            out.write(pcm)
+
+
+def ffmpeg_decode(path, out, rate=SAMPLE_RATE):
+    """Decode with ffmpeg straight into `out` (a real file, or anything with `write`)."""
+    ffmpeg = shutil.which("ffmpeg")
+    if not ffmpeg:
+        raise RuntimeError("ffmpeg is required to decode this audio format")
+    args = [ffmpeg, "-nostdin", "-loglevel", "error", "-i", path, "-f", "s16le", "-ac", "1", "-ar", str(rate), "-"]
+    try:
+        out.fileno()
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        proc = subprocess.run(args, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=False)
+        out.write(proc.stdout)
+    else:
+        out.flush()
+        proc = subprocess.run(args, stdout=out, stderr=subprocess.PIPE, check=False)
+    if proc.returncode != 0:
+        raise RuntimeError(f"ffmpeg failed: {proc.stderr.decode(errors='replace').strip()}")
+
+
+def duration_s(path):
+    """Length of an audio file in seconds, or None when it cannot be determined."""
+    try:
+        with wave.open(path, "rb") as w:
+            return w.getnframes() / float(w.getframerate())
+    except (wave.Error, EOFError, OSError):
+        pass
+    ffprobe = shutil.which("ffprobe")
+    if not ffprobe:
+        return None
+    proc = subprocess.run(
+        [ffprobe, "-v", "error", "-show_entries", "format=duration", "-of", "csv=p=0", path],
+        stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, check=False,
+    )
+    try:
+        return float(proc.stdout.decode().strip())
+    except ValueError:
+        return None
+
+
+def to_wav_bytes(pcm: bytes, rate=SAMPLE_RATE) -> bytes:
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(SAMPLE_WIDTH)
+        w.setframerate(rate)
+        w.writeframes(pcm)
+    return buf.getvalue()
+
+
+def wav_stream_header(rate=SAMPLE_RATE) -> bytes:
+    """Header of a mono 16-bit WAV whose length is not known yet, for streaming PCM
+    after it. The sizes are set to the maximum, which players read as "until the end"."""
+    return struct.pack(
+        "<4sI4s4sIHHIIHH4sI", b"RIFF", 0xFFFFFFFF, b"WAVE", b"fmt ", 16, 1, 1,
+        rate, rate * SAMPLE_WIDTH, SAMPLE_WIDTH, SAMPLE_WIDTH * 8, b"data", 0xFFFFFFFF - 36,
+    )
+
+
+def duration_ms(pcm: bytes, rate=SAMPLE_RATE) -> int:
+    return len(pcm) * 1000 // (rate * SAMPLE_WIDTH)
+
+
+def ms_to_offset(ms, rate=SAMPLE_RATE) -> int:
+    return int(ms * rate // 1000) * SAMPLE_WIDTH
+
+
+def rms(pcm: bytes) -> float:
+    if not pcm:
+        return 0.0
+    if audioop is not None:
+        return float(audioop.rms(pcm, SAMPLE_WIDTH))
+    samples = array.array("h")
+    samples.frombytes(pcm)
+    return math.sqrt(sum(s * s for s in samples) / len(samples))
+
+
+def frame_levels(pcm: bytes, rate=SAMPLE_RATE, frame_ms=20, start_ms=0, end_ms=None):
+    """RMS level of consecutive `frame_ms` frames between `start_ms` and `end_ms`."""
+    end_ms = duration_ms(pcm, rate) if end_ms is None else min(end_ms, duration_ms(pcm, rate))
+    step = ms_to_offset(frame_ms, rate)
+    levels = []
+    for ms in range(int(start_ms), int(end_ms) - frame_ms + 1, frame_ms):
+        offset = ms_to_offset(ms, rate)
+        levels.append((ms, rms(pcm[offset:offset + step])))
+    return levels
+
+
+def trim_silence(pcm: bytes, rate=SAMPLE_RATE, threshold=SILENCE_RMS, frame_ms=20, pad_ms=300) -> bytes:
+    """`pcm` without its leading and trailing silence, keeping `pad_ms` around the speech
+    so no word onset is clipped. Only the silent ends are scanned. Returns `pcm`
+    unchanged if it is all silence."""
+    step = ms_to_offset(frame_ms, rate)
+    start = 0
+    while start + step <= len(pcm) and rms(pcm[start:start + step]) < threshold:
+        start += step
+    if start + step > len(pcm):
+        return pcm
+    end = len(pcm) - (len(pcm) % step)
+    while end - step > start and rms(pcm[end - step:end]) < threshold:
+        end -= step
+    pad = ms_to_offset(pad_ms, rate)
+    return pcm[max(0, start - pad):min(len(pcm), end + pad)]
@@ -0,0 +1,60 @@
+"""One text, many target languages: concurrent fan-out or a single packed prompt."""
+import contextvars, json, re, time
+from concurrent.futures import ThreadPoolExecutor
+
+
+def fan_out(langs, translate_one, concurrency=4):
+    """Call `translate_one(lang)` for every language on a bounded pool.
+
+    Returns (results, errors): results maps lang -> {"translation", "seconds"},
+    errors maps lang -> message."""
+    results, errors = {}, {}
+
+    def run(lang):
+        started = time.perf_counter()
+        try:
+            return lang, translate_one(lang), None, time.perf_counter() - started
+        except Exception as e:
+            return lang, None, str(e), time.perf_counter() - started
+
+    if not langs:
+        return results, errors
+    with ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(langs)))) as pool:
+        futures = [pool.submit(contextvars.copy_context().run, run, lang) for lang in langs]
+        for lang, translation, error, seconds in (future.result() for future in futures):
+            if error is None:
+                results[lang] = {"translation": translation, "seconds": round(seconds, 3)}
+            else:
+                errors[lang] = error
+    return results, errors
+
+
+def packed_prompt(text: str, langs) -> str:
+    names = ", ".join(langs)
+    return (
+        f"Translate the following English text into each of these languages: {names}.\n"
+        "Return ONLY a JSON object whose keys are exactly those language names and whose "
+        "values are the translations. No commentary, no code fences.\n\n"
+        f"{text}"
+    )
+
+
+def parse_packed(output: str, langs) -> dict:
+    """Pull the per-language translations out of a packed answer; missing ones are left out."""
+    output = re.sub(r"^```(?:json)?|```$", "", output.strip(), flags=re.MULTILINE).strip()
+    start, end = output.find("{"), output.rfind("}")
+    if start == -1 or end <= start:
+        return {}
+    try:
+        data = json.loads(output[start:end + 1])
+    except ValueError:
+        return {}
+    if not isinstance(data, dict):
+        return {}
+    by_name = {str(k).strip().lower(): v for k, v in data.items()}
+    found = {}
+    for lang in langs:
+        value = by_name.get(lang.lower())
+        if isinstance(value, str) and value.strip():
+            found[lang] = value.strip()
+    return found
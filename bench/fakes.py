@@ -0,0 +1,204 @@
+"""Deterministic local stand-ins for the hosted services, for offline benchmarking."""
+import array, asyncio, json, math, random, re, threading, time, wave
+from types import SimpleNamespace
+
+WORDS_PER_SECOND = 2.5
+
+
+def script_words(start_ms, end_ms, wps=WORDS_PER_SECOND):
+    """The words a fake speaker says between two timestamps: w0, w1, w2, ..."""
+    first = int(start_ms / 1000 * wps)
+    last = int(end_ms / 1000 * wps)
+    return [f"w{i}" for i in range(first, last)]
+
+
+class Latency:
+    """Sleeps for `base` + `per_unit` * units, plus uniform jitter, from a seeded RNG."""
+
+    def __init__(self, base=0.0, per_unit=0.0, jitter=0.0, seed=0):
+        self.base, self.per_unit, self.jitter = base, per_unit, jitter
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def delay(self, units=0.0):
+        with self._lock:
+            noise = self._rng.uniform(-self.jitter, self.jitter) if self.jitter else 0.0
+        return max(0.0, self.base + self.per_unit * units + noise)
+
+    def wait(self, units=0.0):
+        time.sleep(self.delay(units))
+
+    async def sleep(self, units=0.0):
+        await asyncio.sleep(self.delay(units))
+
+
+class FakeWhisperClient:
+    """Mimics `openai_client.audio.transcriptions.create`.
+
+    Segment uploads named `segment-<i>-<start_ms>-<end_ms>.wav` are answered with the
+    matching slice of a synthetic script, so stitching can be checked for lost or doubled
+    words. Any other upload gets `default_text`."""
+
+    def __init__(self, latency=None, failure_rate=0.0, seed=0, default_text="hello from the fake whisper client"):
+        self.latency = latency or Latency()
+        self.failure_rate = failure_rate
+        self.default_text = default_text
+        self.calls = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.audio = SimpleNamespace(transcriptions=SimpleNamespace(create=self.create))
+
+    def _prepare(self, file):
+        name, payload = file if isinstance(file, tuple) else (getattr(file, "name", ""), file)
+        if hasattr(payload, "read"):
+            payload = payload.read()
+        with self._lock:
+            self.calls += 1
+            fail = self._rng.random() < self.failure_rate
+        match = re.search(r"segment-\d+-(\d+)-(\d+)", str(name))
+        seconds = (int(match.group(2)) - int(match.group(1))) / 1000 if match else len(payload) / 32000
+        return match, seconds, fail
+
+    def _answer(self, match, fail):
+        if fail:
+            raise RuntimeError("fake whisper: injected failure")
+        if match:
+            return " ".join(script_words(int(match.group(1)), int(match.group(2))))
+        return self.default_text
+
+    def create(self, model=None, file=None, **kwargs):
+        match, seconds, fail = self._prepare(file)
+        self.latency.wait(seconds)
+        return self._answer(match, fail)
+
+
+class AsyncFakeWhisperClient(FakeWhisperClient):
+    """Mimics `AsyncOpenAI().audio.transcriptions.create`."""
+
+    async def create(self, model=None, file=None, **kwargs):
+        match, seconds, fail = self._prepare(file)
+        await self.latency.sleep(seconds)
+        return self._answer(match, fail)
+
+
+class FakeAgent:
+    """Mimics an agno Agent: answers with the prompt's last line wrapped in a <think>
+    block (as JSON for combined enhance+translate prompts, and as a JSON array of the
+    numbered lines for talk.segments_prompt), after a delay proportional to the
+    prompt's length (about four chars/token)."""
+
+    def __init__(self, name="Fake Agent", latency=None, model_id="fake-model", instructions=("fake",)):
+        self.name = name
+        self.model = SimpleNamespace(id=model_id, provider="fake")
+        self.instructions = list(instructions)
+        self.latency = latency or Latency()
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def answer(self, prompt):
+        text = prompt.strip().splitlines()[-1]
+        if '"enhanced"' in prompt and '"translation"' in prompt:  # talk.combined_prompt
+            text = json.dumps({"enhanced": text, "translation": text})
+        elif "JSON array" in prompt:  # talk.segments_prompt
+            text = json.dumps(re.findall(r"^\d+\. (.*)$", prompt, flags=re.MULTILINE))
+        return "<think>fake reasoning</think>" + text
+
+    def run(self, prompt, stream=False, **kwargs):
+        with self._lock:
+            self.calls += 1
+        if stream:
+            return self._stream(prompt)
+        self.latency.wait(len(prompt) / 4)
+        return SimpleNamespace(content=self.answer(prompt))
+
+    def _stream(self, prompt):
+        out = self.answer(prompt)
+        pieces = [out[i:i + 16] for i in range(0, len(out), 16)]
+        for piece in pieces:
+            self.latency.wait(len(prompt) / 4 / len(pieces))
+            yield SimpleNamespace(content=piece)
+
+    def arun(self, prompt, stream=False, **kwargs):
+        """Like agno's `arun`: a coroutine, or an async iterator when streaming."""
+        with self._lock:
+            self.calls += 1
+        return self._astream(prompt) if stream else self._arun(prompt)
+
+    async def _arun(self, prompt):
+        await self.latency.sleep(len(prompt) / 4)
+        return SimpleNamespace(content=self.answer(prompt))
+
+    async def _astream(self, prompt):
+        out = self.answer(prompt)
+        pieces = [out[i:i + 16] for i in range(0, len(out), 16)]
+        for piece in pieces:
+            await self.latency.sleep(len(prompt) / 4 / len(pieces))
+            yield SimpleNamespace(content=piece)
+
+
+class _Voice:
+    def __init__(self, id, name):
+        self.id, self.name = id, name
+
+
+def _voice_like(rate=16000, seconds=1.0, seed=0):
+    """One repeating stretch of 16-bit PCM that encoders find about as hard as speech:
+    a gliding pitch with harmonics, in syllable-long bursts, over a little noise."""
+    rng = random.Random(seed)
+    samples = array.array("h")
+    phase = 0.0
+    for i in range(int(rate * seconds)):
+        t = i / rate
+        pitch = 120 + 40 * math.sin(2 * math.pi * 0.7 * t)
+        phase += 2 * math.pi * pitch / rate
+        envelope = max(0.0, math.sin(2 * math.pi * 4 * t)) ** 0.5
+        voiced = sum(math.sin(k * phase) / k for k in range(1, 6))
+        samples.append(int(6000 * envelope * voiced + rng.uniform(-300, 300)))
+    return samples.tobytes()
+
+
+class FakeEngine:
+    """A pyttsx3-like engine that writes voice-like 16 kHz WAVs, 10 ms of audio per character."""
+
+    SIGNAL = None
+
+    def __init__(self, base=0.0, per_char=0.0, jitter=0.0, seed=0):
+        self.latency = Latency(base, per_char, jitter, seed)
+        self.props = {"voices": [_Voice("fake-male", "Fake David male")], "voice": None, "rate": 200, "volume": 1.0}
+        self.queue = []
+
+    def getProperty(self, name):
+        return self.props[name]
+
+    def setProperty(self, name, value):
+        self.props[name] = value
+
+    def save_to_file(self, text, path):
+        self.queue.append((text, path))
+
+    def runAndWait(self):
+        for text, path in self.queue:
+            self.latency.wait(len(text))
+            with wave.open(path, "wb") as w:
+                w.setnchannels(1)
+                w.setsampwidth(2)
+                w.setframerate(16000)
+                w.writeframes(self._frames(160 * len(text)))
+        self.queue = []
+
+    @classmethod
+    def _frames(cls, count):
+        if cls.SIGNAL is None:
+            cls.SIGNAL = _voice_like()
+        size = count * 2
+        return (cls.SIGNAL * (size // len(cls.SIGNAL) + 1))[:size]
+
+
+class FakeEngineFactory:
+    """Picklable `engine_factory` for TTSPool; each worker builds its own FakeEngine."""
+
+    def __init__(self, base=0.0, per_char=0.0, jitter=0.0, seed=0):
+        self.args = (base, per_char, jitter, seed)
+
+    def __call__(self):
+        return FakeEngine(*self.args)
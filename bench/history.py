@@ -0,0 +1,80 @@
+"""History page and search latency over a large store: one user's newest page and a
+deep page, fetched by keyset (`id < before`, what /history does) and by OFFSET, plus
+full-text search.
+
+    python -m bench.history --rows 300000 --users 100
+
+Each timing is the median of `--repeat` runs, in milliseconds.
+"""
+import argparse, os, random, statistics, tempfile, time
+
+from history import HistoryStore
+
+WORDS = ("photosynthesis plants light energy water carbon oxygen sugar leaves roots cell "
+         "the a of and is are makes turns into from with students lesson teacher class").split()
+
+
+def fill(store, rows, users, seed=0):
+    rng = random.Random(seed)
+    db = store._db()
+    batch = []
+    for i in range(rows):
+        source = " ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 40)))
+        batch.append((f"user{i % users}", "enhance", time.time(), None, None, source, source.capitalize() + ".", None))
+        if len(batch) == 10000:
+            db.executemany("INSERT INTO entries (user, kind, created, lang, key, source, enhanced, translation) "
+                           "VALUES (?, ?, ?, ?, ?, ?, ?, ?)", batch)
+            batch = []
+    if batch:
+        db.executemany("INSERT INTO entries (user, kind, created, lang, key, source, enhanced, translation) "
+                       "VALUES (?, ?, ?, ?, ?, ?, ?, ?)", batch)
+    db.commit()
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=300000)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = HistoryStore(os.path.join(tmp, "history.db"))
+        started = time.perf_counter()
+        fill(store, args.rows, args.users)
+        print(f"{args.rows} rows for {args.users} users in {time.perf_counter() - started:.1f}s "
+              f"(search: {'FTS5' if store.fts else 'LIKE'})")
+
+        user, limit = "user0", args.limit
+        ids = [row[0] for row in store._db().execute("SELECT id FROM entries WHERE user = ? ORDER BY id DESC", (user,))]
+        depth = len(ids) - limit
+        offset_sql = "SELECT * FROM entries WHERE user = ? ORDER BY id DESC LIMIT ? OFFSET ?"
+
+        def offset(skip):
+            return lambda: store._db().execute(offset_sql, (user, limit, skip)).fetchall()
+
+        print(f"{'query':<28} {'ms':>8}")
+        rows = [
+            ("keyset, first page", lambda: store.page(user, limit=limit)),
+            (f"keyset, page at {depth}", lambda: store.page(user, before=ids[depth - 1], limit=limit)),
+            ("OFFSET, first page", offset(0)),
+            (f"OFFSET, page at {depth}", offset(depth)),
+            ("search 'photosynthesis'", lambda: store.page(user, limit=limit, query="photosynthesis")),
+            ("search 'oxygen sug'", lambda: store.page(user, limit=limit, query="oxygen sug")),
+        ]
+        for name, fn in rows:
+            print(f"{name:<28} {timed(fn, args.repeat):>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+"""Load test /transcribe, /enhance, /translate and /speak over real HTTP, with fake
+Whisper, Groq and TTS backends, at several concurrency levels.
+
+    python -m bench.load --concurrency 1 4 16 --requests 200 --out results.json
+    python -m bench.load --out after.json --compare results.json
+
+Every request carries a distinct payload, so caches miss and the fakes are exercised,
+unless --distinct limits the number of different payloads. Results (throughput,
+p50/p95/p99 latency, peak RSS) are printed and written as JSON for later comparison.
+"""
+import argparse, datetime, json, logging, os, platform, shutil, socket, sys, tempfile, threading, time, uuid
+import urllib.error, urllib.parse, urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+# The TTS worker processes re-import this module; they share the parent's folder.
+CACHE_DIR = os.environ.get("EDUSPEAK_BENCH_DIR") or tempfile.mkdtemp(prefix="eduspeak-bench-")
+os.environ["EDUSPEAK_BENCH_DIR"] = CACHE_DIR
+os.environ.setdefault("OPENAI_API_KEY", "bench-not-used")
+os.environ["TRANSCRIPT_CACHE_DIR"] = os.path.join(CACHE_DIR, "transcripts")
+os.environ["TTS_CACHE_DIR"] = os.path.join(CACHE_DIR, "speech")
+os.environ["HISTORY_DB"] = os.path.join(CACHE_DIR, "history.db")
+os.environ["TRANSLATION_MEMORY_DB"] = os.path.join(CACHE_DIR, "translation-memory.db")
+os.environ["TEXT_STORE_DIR"] = os.path.join(CACHE_DIR, "texts")
+os.environ["JOBS_DIR"] = os.path.join(CACHE_DIR, "jobs")
+os.environ.pop("RESULT_CACHE_DB", None)
+# Measure the app, not the upstream rate limits (override these to load test the limiter),
+# and skip the warm-up: the fakes have no connections to open.
+for name, value in (("OPENAI_RPM", "1e9"), ("FAKE_RPM", "1e9"), ("UPSTREAM_CONCURRENCY", "1000"), ("WARM_UP", "0")):
+    os.environ.setdefault(name, value)
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+from werkzeug.serving import make_server
+
+import audio
+import services
+import talk
+from bench.fakes import AsyncFakeWhisperClient, FakeAgent, FakeEngineFactory, FakeWhisperClient, Latency
+from metrics import percentile
+
+ENDPOINTS = ("transcribe", "enhance", "translate", "speak")
+SENTENCE = "the students listened carefully while the teacher explained how plants make food from sunlight"
+
+
+def peak_rss_mb(who="self"):
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_SELF if who == "self" else resource.RUSAGE_CHILDREN)
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS.
+    return usage.ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def multipart(fields, files):
+    boundary = uuid.uuid4().hex
+    parts = []
+    for name, value in fields.items():
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode())
+    for name, (filename, data) in files.items():
+        parts.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+            f"Content-Type: application/octet-stream\r\n\r\n".encode() + data + b"\r\n"
+        )
+    parts.append(f"--{boundary}--\r\n".encode())
+    return b"".join(parts), f"multipart/form-data; boundary={boundary}"
+
+
+def form(fields):
+    return urllib.parse.urlencode(fields).encode(), "application/x-www-form-urlencoded"
+
+
+def build_request(endpoint, n, run_id):
+    """(path, body, content type) for the n-th distinct payload of `endpoint`."""
+    text = f"{SENTENCE} ({run_id} {n})"
+    if endpoint == "transcribe":
+        # One second of quiet noise whose first samples encode n, so each upload is new.
+        pcm = n.to_bytes(8, "little") + run_id.encode() + bytes((i * 7) % 16 for i in range(audio.SAMPLE_RATE * 2))
+        body, ctype = multipart({}, {"audio": ("clip.wav", audio.to_wav_bytes(pcm[:audio.SAMPLE_RATE * 2]))})
+        return "/transcribe", body, ctype
+    if endpoint == "translate":
+        return ("/translate",) + form({"text": text, "lang": "French"})
+    return (f"/{endpoint}",) + form({"text": text})
+
+
+# The pages answer 200 with the failure rendered in them; these mark such a page.
+ERROR_MARKERS = (b"Processing error:", b"Enhancement error:", b"Translation error:", b"could not be enhanced")
+
+
+def send(base_url, path, body, ctype):
+    req = urllib.request.Request(base_url + path, data=body, headers={"Content-Type": ctype}, method="POST")
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(req, timeout=300) as resp:
+            page = resp.read()
+            ok = 200 <= resp.status < 300 and not any(marker in page for marker in ERROR_MARKERS)
+    except (urllib.error.URLError, OSError):
+        ok = False
+    return time.perf_counter() - started, ok
+
+
+def run_level(base_url, endpoint, concurrency, requests, distinct, run_id):
+    tag = f"{run_id}-{concurrency}"  # earlier levels must not warm this level's caches
+    payloads = [build_request(endpoint, n, tag) for n in range(min(distinct or requests, requests))]
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        outcomes = list(pool.map(lambda i: send(base_url, *payloads[i % len(payloads)]), range(requests)))
+    elapsed = time.perf_counter() - started
+    latencies = [seconds for seconds, _ in outcomes]
+    return {
+        "endpoint": endpoint,
+        "concurrency": concurrency,
+        "requests": requests,
+        "errors": sum(1 for _, ok in outcomes if not ok),
+        "seconds": elapsed,
+        "rps": requests / elapsed,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def serve(use_asgi):
+    """Start the app on a free local port; returns (base URL, stop function)."""
+    if use_asgi:
+        import uvicorn
+        import asgi
+        sock = socket.socket()
+        sock.bind(("127.0.0.1", 0))
+        server = uvicorn.Server(uvicorn.Config(asgi.app, log_level="warning", lifespan="on"))
+        threading.Thread(target=server.run, kwargs={"sockets": [sock]}, daemon=True).start()
+        while not server.started:
+            time.sleep(0.05)
+        return f"http://127.0.0.1:{sock.getsockname()[1]}", lambda: setattr(server, "should_exit", True)
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    server = make_server("127.0.0.1", 0, talk.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}", server.shutdown
+
+
+def compare(results, previous):
+    before = {(r["endpoint"], r["concurrency"]): r for r in previous["results"]}
+    print(f"\ncompared with {previous['created']}:")
+    print(f"{'endpoint':<11} {'conc':>5} {'req/s':>16} {'p95 ms':>18}")
+    for r in results:
+        old = before.get((r["endpoint"], r["concurrency"]))
+        if old:
+            print(f"{r['endpoint']:<11} {r['concurrency']:>5} "
+                  f"{old['rps']:>7.1f} → {r['rps']:<7.1f} {old['p95_ms']:>8.1f} → {r['p95_ms']:<8.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--endpoints", nargs="+", choices=ENDPOINTS, default=list(ENDPOINTS))
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--requests", type=int, default=100, help="requests per endpoint and concurrency level")
+    parser.add_argument("--distinct", type=int, default=0, help="distinct payloads per level (0: all distinct)")
+    parser.add_argument("--whisper-latency", type=float, default=0.2, help="fake seconds per audio second")
+    parser.add_argument("--llm-latency", type=float, default=0.002, help="fake seconds per prompt token")
+    parser.add_argument("--tts-latency", type=float, default=0.0005, help="fake seconds per character")
+    parser.add_argument("--base-latency", type=float, default=0.05, help="fixed fake seconds per upstream call")
+    parser.add_argument("--jitter", type=float, default=0.02)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--asgi", action="store_true", help="serve asgi:app with uvicorn instead of threaded WSGI")
+    parser.add_argument("--out", help="write results as JSON to this file")
+    parser.add_argument("--compare", help="earlier --out file to compare against")
+    args = parser.parse_args()
+
+    def latency(per_unit, offset):
+        return Latency(args.base_latency, per_unit, args.jitter, args.seed + offset)
+
+    talk.configure(
+        openai_client=FakeWhisperClient(latency(args.whisper_latency, 1), seed=args.seed),
+        enhance_agent=FakeAgent("Language Enhancement Agent", latency(args.llm_latency, 2)),
+        translate_agent=FakeAgent("Translator", latency(args.llm_latency, 3)),
+        pipeline_agent=FakeAgent("Enhancer and Translator", latency(args.llm_latency, 4)),
+        tts_engine_factory=FakeEngineFactory(args.base_latency, args.tts_latency, args.jitter, args.seed),
+    )
+    if args.asgi:
+        import asgi
+        asgi.configure(AsyncFakeWhisperClient(latency(args.whisper_latency, 1), seed=args.seed))
+    base_url, stop = serve(args.asgi)
+    run_id = uuid.uuid4().hex[:8]
+
+    results = []
+    print(f"{'endpoint':<11} {'conc':>5} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7} {'rss MB':>7}")
+    try:
+        for endpoint in args.endpoints:
+            for concurrency in args.concurrency:
+                r = run_level(base_url, endpoint, concurrency, args.requests, args.distinct, run_id)
+                results.append(r)
+                rss = f"{r['peak_rss_mb']:.0f}" if r["peak_rss_mb"] is not None else "-"
+                print(f"{endpoint:<11} {concurrency:>5} {r['rps']:>8.1f} {r['p50_ms']:>8.1f} {r['p95_ms']:>8.1f} "
+                      f"{r['p99_ms']:>8.1f} {r['errors']:>7} {rss:>7}")
+    finally:
+        stop()
+        services.shutdown()
+        shutil.rmtree(CACHE_DIR, ignore_errors=True)
+
+    report = {
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": vars(args),
+        "results": results,
+        "tts_workers_peak_rss_mb": peak_rss_mb("children"),
+    }
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(results, json.load(f))
+    errors = sum(r["errors"] for r in results)
+    if errors:
+        sys.exit(f"{errors} requests failed; the timings above do not measure working requests")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""Benchmark chunked transcription against a fake Whisper client.
+
+    python -m bench.longaudio --minutes 60 --workers 1 2 4 8
+"""
+import argparse, time
+
+import audio
+from bench.fakes import FakeWhisperClient, Latency, script_words
+from longaudio import transcribe_long
+
+
+def synthetic_lecture(minutes, rate=audio.SAMPLE_RATE):
+    """Alternating 4 s of loud noise-like signal and 0.6 s of silence."""
+    loud = bytes((i * 37) % 256 for i in range(rate * 2 * 4))
+    quiet = bytes(rate * 2 * 6 // 10)
+    block = loud + quiet
+    need = rate * 2 * 60 * minutes
+    return (block * (need // len(block) + 1))[:need]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--minutes", type=int, default=60)
+    parser.add_argument("--segment", type=float, default=300, help="segment length in seconds")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--latency", type=float, default=0.01, help="fake seconds per audio second")
+    parser.add_argument("--failure-rate", type=float, default=0.1)
+    args = parser.parse_args()
+
+    pcm = synthetic_lecture(args.minutes)
+    expected = script_words(0, audio.duration_ms(pcm))
+    baseline = None
+    print(f"{'workers':>8} {'seconds':>8} {'speedup':>8} {'segments':>9} {'failed':>7} {'exact':>6}")
+    for workers in args.workers:
+        client = FakeWhisperClient(Latency(base=0.05, per_unit=args.latency, jitter=0.02), failure_rate=args.failure_rate)
+        started = time.perf_counter()
+        result = transcribe_long(client, pcm, workers=workers, segment_s=args.segment, backoff=0.01)
+        elapsed = time.perf_counter() - started
+        baseline = baseline or elapsed
+        exact = "yes" if result.text.split() == expected else "no"
+        print(f"{workers:>8} {elapsed:>8.2f} {baseline / elapsed:>7.2f}x {len(result.segments):>9} {result.failed:>7} {exact:>6}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""Requests/sec for page rendering: the old per-request `render_template_string` with
+the stylesheet inlined, against the compiled shell, cached home page and compression.
+
+    python -m bench.pages --requests 2000
+"""
+import argparse, os, time
+
+os.environ.setdefault("OPENAI_API_KEY", "bench-not-used")
+
+import flask
+import talk
+
+with open(talk.CSS_PATH, encoding="utf-8") as f:
+    LEGACY_SHELL = talk.PAGE_SHELL.replace(
+        '<link href="{{ css_url }}" rel="stylesheet">', "<style>\n" + f.read() + "</style>"
+    )
+
+
+def legacy_render_page(content, title, active_page, **kwargs):
+    return flask.render_template_string(LEGACY_SHELL, title=title, active_page=active_page, content=content, **kwargs)
+
+
+def legacy_home():
+    return legacy_render_page(talk.HOME_CONTENT, "Home", "home")
+
+
+def measure(client, path, requests, headers):
+    total = 0
+    started = time.perf_counter()
+    for _ in range(requests):
+        resp = client.get(path, headers=headers)
+        assert resp.status_code in (200, 304), resp.status_code
+        total += len(resp.get_data())
+    elapsed = time.perf_counter() - started
+    return requests / elapsed, total / requests
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+    client = talk.app.test_client()
+    gzip = {"Accept-Encoding": "gzip, br"}
+    rows = []
+
+    after_funcs = talk.app.after_request_funcs.setdefault(None, [])
+    view, render = talk.app.view_functions["home"], talk.render_page
+    after_funcs.remove(talk.compress_html)
+    talk.app.view_functions["home"], talk.render_page = legacy_home, legacy_render_page
+    try:
+        for path in ("/", "/enhance"):
+            rows.append(("before", path, "") + measure(client, path, args.requests, gzip))
+    finally:
+        talk.app.view_functions["home"], talk.render_page = view, render
+        after_funcs.append(talk.compress_html)
+
+    for path in ("/", "/enhance"):
+        rows.append(("after", path, "first visit") + measure(client, path, args.requests, gzip))
+    etag = client.get("/", headers=gzip).headers["ETag"]
+    rows.append(("after", "/", "revalidate (304)") + measure(client, "/", args.requests, dict(gzip, **{"If-None-Match": etag})))
+
+    print(f"{'':<7} {'path':<9} {'case':<17} {'req/s':>9} {'bytes/resp':>11}")
+    for label, path, case, rate, size in rows:
+        print(f"{label:<7} {path:<9} {case:<17} {rate:>9.0f} {size:>11.0f}")
+
+
+if __name__ == "__main__":
+    main()
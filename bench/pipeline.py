@@ -0,0 +1,86 @@
+"""Enhance then translate: the two-call path against `talk.enhance_and_translate`.
+
+    python -m bench.pipeline --words 150 600 2000 --base-latency 0.3
+
+For each text size, both paths run against fake agents whose delay is a fixed round
+trip plus a cost per prompt token. Tokens are estimated as the agent sees them:
+instructions and prompt in, answer out. Both paths generate the same two texts, so
+the saving is one round trip per chunk plus the enhanced text that is no longer sent
+back as the second prompt.
+"""
+import argparse, os, time
+
+os.environ.setdefault("OPENAI_API_KEY", "bench-not-used")
+os.environ.setdefault("FAKE_RPM", "1e9")
+os.environ.setdefault("WARM_UP", "0")
+# Both paths translate whole chunks; sentences served from the translation memory would hide the difference.
+os.environ.setdefault("TRANSLATION_MEMORY", "0")
+
+import services
+import talk
+from bench.fakes import FakeAgent, Latency
+from segment import estimate_tokens
+
+SENTENCE = "the students was listening careful while the teacher explain how plants makes food from sunlight."
+
+
+class CountingAgent(FakeAgent):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.tokens_in = self.tokens_out = 0
+
+    def run(self, prompt, stream=False, **kwargs):
+        response = super().run(prompt, stream=stream, **kwargs)
+        with self._lock:
+            self.tokens_in += estimate_tokens("\n".join(self.instructions)) + estimate_tokens(prompt)
+            self.tokens_out += estimate_tokens(response.content)
+        return response
+
+
+def measure(run, agents):
+    for agent in agents:
+        agent.calls = agent.tokens_in = agent.tokens_out = 0
+    started = time.perf_counter()
+    run()
+    return {
+        "seconds": time.perf_counter() - started,
+        "calls": sum(agent.calls for agent in agents),
+        "tokens_in": sum(agent.tokens_in for agent in agents),
+        "tokens_out": sum(agent.tokens_out for agent in agents),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--words", type=int, nargs="+", default=[150, 600, 2000], help="text sizes to try")
+    parser.add_argument("--lang", default="French")
+    parser.add_argument("--base-latency", type=float, default=0.3, help="fake seconds per model round trip")
+    parser.add_argument("--token-latency", type=float, default=0.0005, help="fake seconds per prompt token")
+    args = parser.parse_args()
+
+    latency = Latency(args.base_latency, args.token_latency)
+    enhance = CountingAgent("Language Enhancement Agent", latency, instructions=services.ENHANCE_INSTRUCTIONS)
+    translate = CountingAgent("Translator", latency, instructions=services.TRANSLATE_INSTRUCTIONS)
+    combined = CountingAgent("Enhancer and Translator", latency, instructions=services.PIPELINE_INSTRUCTIONS)
+    talk.configure(enhance_agent=enhance, translate_agent=translate, pipeline_agent=combined)
+
+    def two_calls(text):
+        enhanced, _ = talk.enhance_text(text, use_cache=False)
+        talk.translate_text(enhanced, args.lang, use_cache=False)
+
+    print(f"{'words':>6} {'path':<9} {'calls':>6} {'tokens in':>10} {'tokens out':>11} {'seconds':>8}")
+    for words in args.words:
+        sentence_words = len(SENTENCE.split())
+        text = " ".join([SENTENCE] * max(1, words // sentence_words))
+        before = measure(lambda: two_calls(text), (enhance, translate))
+        after = measure(lambda: talk.enhance_and_translate(text, args.lang, use_cache=False), (combined, enhance, translate))
+        for name, r in (("two-call", before), ("combined", after)):
+            print(f"{words:>6} {name:<9} {r['calls']:>6} {r['tokens_in']:>10} {r['tokens_out']:>11} {r['seconds']:>8.2f}")
+        saved = {key: before[key] - after[key] for key in ("calls", "tokens_in", "tokens_out")}
+        print(f"{'':>6} {'saved':<9} {saved['calls']:>6} {saved['tokens_in']:>10} {saved['tokens_out']:>11} "
+              f"{(1 - after['seconds'] / before['seconds']) * 100:>7.0f}%")
+    services.shutdown()
+
+
+if __name__ == "__main__":
+    main()
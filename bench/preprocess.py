@@ -0,0 +1,57 @@
+"""What pre-processing saves on a Whisper upload: a classroom-style recording (44.1 kHz
+stereo WAV with silence at both ends) sent as it is, and shrunk to each upload format.
+
+    python -m bench.preprocess --minutes 1 5 15 --mbps 10
+
+"seconds" is pre-processing plus the upload at `--mbps`; Whisper's own time is the same
+for every row, since it resamples to 16 kHz mono anyway.
+"""
+import argparse, array, os, tempfile, time, wave
+
+import audio
+import preprocess
+import transcode
+from bench.fakes import _voice_like
+
+
+def recording(path, minutes, rate=44100, lead_s=20, tail_s=30):
+    """Write `minutes` of voice-like stereo audio between silent stretches to `path`."""
+    voice = array.array("h", _voice_like(rate, 1.0))
+    stereo = array.array("h", (s for s in voice for _ in (0, 1))).tobytes()
+    with wave.open(path, "wb") as w:
+        w.setnchannels(2)
+        w.setsampwidth(2)
+        w.setframerate(rate)
+        w.writeframes(bytes(rate * 4 * lead_s))
+        for _ in range(int(minutes * 60)):
+            w.writeframes(stereo)
+        w.writeframes(bytes(rate * 4 * tail_s))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--minutes", type=float, nargs="+", default=[1, 5, 15])
+    parser.add_argument("--mbps", type=float, default=10.0, help="upload link speed")
+    args = parser.parse_args()
+
+    link = args.mbps * 1e6 / 8
+    names = ["wav"] + (["ogg", "mp3"] if transcode.available() else [])
+    print(f"{'minutes':>7} {'upload':<9} {'MB':>8} {'smaller':>8} {'prep s':>7} {'seconds':>8}")
+    for minutes in args.minutes:
+        with tempfile.NamedTemporaryFile(suffix=".wav") as tmp:
+            recording(tmp.name, minutes)
+            size = os.path.getsize(tmp.name)
+            print(f"{minutes:>7g} {'original':<9} {size / 1e6:>8.2f} {'':>8} {0:>7.2f} {size / link:>8.2f}")
+            for name in names:
+                started = time.perf_counter()
+                pcm = preprocess.trim(audio.decode(tmp.name))
+                payload, _ = preprocess.encode(pcm, name=name)
+                prep = time.perf_counter() - started
+                print(f"{'':>7} {name:<9} {len(payload) / 1e6:>8.2f} {size / len(payload):>7.1f}x "
+                      f"{prep:>7.2f} {prep + len(payload) / link:>8.2f}")
+    if len(names) == 1:
+        print("ffmpeg not found: only the 16 kHz WAV fallback was measured")
+
+
+if __name__ == "__main__":
+    main()
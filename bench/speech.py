@@ -0,0 +1,99 @@
+"""Time to first audio: POST /speak (one WAV for the whole text) against /speak/stream
+(sentence by sentence), with a fake speech engine.
+
+    python -m bench.speech --sentences 5 20 60 --workers 2
+
+A second document that repeats half of the first one's sentences shows how much of
+it the sentence cache serves.
+
+With ffmpeg on the PATH, a second table compares the download formats for the longest
+document, once it has been rendered: server time (transcoding), file size, the time to
+fetch it over a `--mbps` link, and the time until a player that streams the file with
+Range requests has its first second of audio.
+"""
+import argparse, os, tempfile, time
+
+os.environ["TTS_CACHE_DIR"] = tempfile.mkdtemp(prefix="eduspeak-bench-speech-")
+os.environ.setdefault("OPENAI_API_KEY", "bench-not-used")
+os.environ.setdefault("WARM_UP", "0")
+
+import services
+import talk
+import transcode
+from bench.fakes import FakeEngineFactory
+
+SENTENCE = "Sentence {n} of the {doc} lesson explains how plants turn sunlight into food."
+
+
+def document(doc, sentences, shared=0):
+    """`sentences` sentences, the first `shared` of which also appear in every other document."""
+    return " ".join(SENTENCE.format(n=n, doc="shared" if n < shared else doc) for n in range(sentences))
+
+
+def timed(client, path, text):
+    """(seconds to the first audio bytes, seconds to the end of the body)."""
+    started = time.perf_counter()
+    resp = client.post(path, data={"text": text}, buffered=False)
+    chunks = iter(resp.response)
+    next(chunks)
+    first = time.perf_counter() - started
+    for _ in chunks:
+        pass
+    resp.close()
+    return first, time.perf_counter() - started
+
+
+def formats(client, text, mbps):
+    """Yields (format, server seconds, bytes, download seconds, playable seconds); the
+    first row is the render itself."""
+    link = mbps * 1e6 / 8
+    seconds_of_audio = None
+    for name in ("render", *transcode.FORMATS):
+        started = time.perf_counter()
+        resp = client.post("/speak", data={"text": text, "format": name.replace("render", "wav")},
+                           headers={"Accept": "application/json"})
+        server = time.perf_counter() - started
+        size = resp.get_json()["bytes"]
+        if name == "render":
+            seconds_of_audio = (size - 44) / 32000
+        first_second = min(size, size / seconds_of_audio + 4096)
+        yield name, server, size, size / link, server + first_second / link
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sentences", type=int, nargs="+", default=[5, 20, 60])
+    parser.add_argument("--workers", type=int, default=2, help="TTS worker processes")
+    parser.add_argument("--per-char", type=float, default=0.002, help="fake seconds of synthesis per character")
+    parser.add_argument("--mbps", type=float, default=2.0, help="client link speed for the format table")
+    args = parser.parse_args()
+
+    os.environ["TTS_WORKERS"] = str(args.workers)
+    talk.configure(tts_engine_factory=FakeEngineFactory(0.05, args.per_char, 0.0, 0))
+    talk.tts_pool().start()
+    client = talk.app.test_client()
+
+    print(f"{'sentences':>9} {'endpoint':<13} {'first audio s':>14} {'total s':>8}")
+    try:
+        for count in args.sentences:
+            for path, doc in (("/speak", "whole"), ("/speak/stream", "streamed")):
+                first, total = timed(client, path, document(f"{doc}-{count}", count))
+                print(f"{count:>9} {path:<13} {first:>14.2f} {total:>8.2f}")
+            timed(client, "/speak/stream", document(f"first-{count}", count, shared=count // 2))
+            hits = talk.tts_pool().cache.hits
+            first, total = timed(client, "/speak/stream", document(f"second-{count}", count, shared=count // 2))
+            print(f"{count:>9} {'(half shared)':<13} {first:>14.2f} {total:>8.2f}  "
+                  f"{talk.tts_pool().cache.hits - hits} of {count} sentences from cache")
+        if not transcode.available():
+            print("\nffmpeg not found: skipping the format comparison")
+            return
+        print(f"\n{max(args.sentences)} sentences over {args.mbps:g} Mbit/s")
+        print(f"{'format':<7} {'server s':>9} {'KB':>8} {'download s':>11} {'playable s':>11}")
+        for name, server, size, download, playable in formats(client, document("formats", max(args.sentences)), args.mbps):
+            print(f"{name:<7} {server:>9.2f} {size / 1024:>8.0f} {download:>11.2f} {playable:>11.2f}")
+    finally:
+        services.shutdown()
+
+
+if __name__ == "__main__":
+    main()
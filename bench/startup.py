@@ -0,0 +1,63 @@
+"""Cold start: how long a fresh process takes to import the app, serve its first page,
+and build the OpenAI client and Groq agents that the first model call needs.
+
+    python -m bench.startup --runs 5
+    python -m bench.startup --network      # also time warm_up(), which connects to OpenAI and Groq
+
+Without warm-up the first /transcribe or /enhance pays "clients" (and the connection
+setup); serve.py, asgi.py and help.py do both while the worker starts instead.
+"""
+import argparse, json, os, subprocess, sys
+
+from metrics import percentile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ("openai", "groq", "agno", "pyttsx3")
+CHILD = r"""
+import json, os, sys, time
+started = time.perf_counter()
+import talk, services
+result = {"import": time.perf_counter() - started}
+result["loaded"] = [name for name in %r if name in sys.modules]
+client = talk.app.test_client()
+started = time.perf_counter()
+client.get("/")
+result["first_page"] = time.perf_counter() - started
+started = time.perf_counter()
+try:
+    services.openai_client(), services.enhance_agent(), services.translate_agent()
+    result["clients"] = time.perf_counter() - started
+except Exception as e:
+    result["error"] = f"{type(e).__name__}: {e}"
+if os.environ.get("BENCH_NETWORK") == "1":
+    result["warm_up"] = services.warm_up()
+print(json.dumps(result))
+""" % (HEAVY_MODULES,)
+
+
+def run_once(network):
+    env = dict(os.environ, BENCH_NETWORK="1" if network else "0")
+    env.setdefault("OPENAI_API_KEY", "bench-not-used")
+    out = subprocess.run([sys.executable, "-c", CHILD], cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters to start")
+    parser.add_argument("--network", action="store_true", help="also connect to the real APIs (needs keys)")
+    args = parser.parse_args()
+
+    runs = [run_once(args.network) for _ in range(args.runs)]
+    print(f"{'phase':<12} {'p50 ms':>8} {'max ms':>8}")
+    for phase in ("import", "first_page", "clients", "warm_up"):
+        values = [r[phase] for r in runs if phase in r]
+        if values:
+            print(f"{phase:<12} {percentile(values, 50) * 1000:>8.1f} {max(values) * 1000:>8.1f}")
+    print("SDKs loaded by `import talk`:", ", ".join(runs[0]["loaded"]) or "none")
+    for error in sorted({r["error"] for r in runs if "error" in r}):
+        print("could not build the clients:", error)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Translation memory as it fills up: a term of classroom texts translated lesson by
+lesson, with the memory on and off.
+
+    python -m bench.transmem --lessons 40 --langs French Spanish
+
+Lessons are drawn from a pool of recurring sentences (instructions, definitions,
+routines) plus new ones; a few recurring ones carry a spelling slip, which makes
+them new sentences too. For every block of lessons it
+reports model calls, prompt tokens, seconds and the memory's hit ratio. The fake
+translator's delay is a fixed round trip plus a cost per prompt token.
+"""
+import argparse, os, random, tempfile, time
+
+os.environ.setdefault("OPENAI_API_KEY", "bench-not-used")
+os.environ.setdefault("FAKE_RPM", "1e9")
+os.environ.setdefault("WARM_UP", "0")
+os.environ["TRANSLATION_MEMORY_DB"] = os.path.join(tempfile.mkdtemp(prefix="eduspeak-bench-"), "translation-memory.db")
+
+import services
+import talk
+from bench.fakes import FakeAgent, Latency
+from bench.pipeline import CountingAgent
+
+RECURRING = [
+    "Open your books to the chapter on photosynthesis.",
+    "Plants use sunlight, water and carbon dioxide to make glucose.",
+    "The chloroplasts in the leaves capture the light energy.",
+    "Write the answer in your notebook before we check it together.",
+    "Raise your hand if you have a question about the experiment.",
+    "Oxygen is released into the air as a by-product.",
+    "Remember to label every part of the diagram clearly.",
+    "Homework is due at the start of the next lesson.",
+    "Work with your partner and compare your results.",
+    "The roots take in water and minerals from the soil.",
+]
+SLIPS = {"photosynthesis": "photosynthsis", "chloroplasts": "chloroplats", "notebook": "notebok", "experiment": "experimant"}
+GLOSSARY = {"photosynthesis": {"French": "photosynthèse", "Spanish": "fotosíntesis"},
+            "chloroplasts": {"French": "chloroplastes", "Spanish": "cloroplastos"}}
+
+
+def lesson(rng, n, new, recurring=6):
+    sentences = [f"Today in lesson {n} we look at example {n}.{i} of how living things use energy." for i in range(new)]
+    for sentence in rng.sample(RECURRING, recurring):
+        if rng.random() < 0.15:
+            word = rng.choice([word for word in SLIPS if word in sentence] or [None])
+            sentence = sentence.replace(word, SLIPS[word]) if word else sentence
+        sentences.append(sentence)
+    rng.shuffle(sentences)
+    return " ".join(sentences)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lessons", type=int, default=40)
+    parser.add_argument("--block", type=int, default=10, help="lessons per reported row")
+    parser.add_argument("--new", type=int, default=3, help="sentences per lesson not seen before")
+    parser.add_argument("--langs", nargs="+", default=["French", "Spanish"])
+    parser.add_argument("--base-latency", type=float, default=0.3, help="fake seconds per model round trip")
+    parser.add_argument("--token-latency", type=float, default=0.0005, help="fake seconds per prompt token")
+    args = parser.parse_args()
+
+    translate = CountingAgent("Translator", Latency(args.base_latency, args.token_latency),
+                              instructions=services.TRANSLATE_INSTRUCTIONS)
+    talk.configure(enhance_agent=FakeAgent(), translate_agent=translate, pipeline_agent=FakeAgent())
+    for term, translations in GLOSSARY.items():
+        for lang, translation in translations.items():
+            talk.translation_memory.set_term(lang, term, translation)
+
+    print(f"{'memory':<7} {'lang':<9} {'lessons':>8} {'calls':>6} {'tokens in':>10} {'seconds':>8} {'hit ratio':>10}")
+    for memory in (False, True):
+        talk.TRANSLATION_MEMORY = memory
+        for lang in args.langs:
+            rng = random.Random(0)
+            for start in range(0, args.lessons, args.block):
+                lessons = [lesson(rng, n, args.new) for n in range(start, min(start + args.block, args.lessons))]
+                translate.calls = translate.tokens_in = 0
+                before = talk.translation_memory.stats().get(lang.casefold(), {})
+                started = time.perf_counter()
+                for text in lessons:
+                    talk.translate_text(text, lang, use_cache=memory)
+                seconds = time.perf_counter() - started
+                after = talk.translation_memory.stats().get(lang.casefold(), {})
+                looked_up = {key: after.get(key, 0) - before.get(key, 0) for key in ("hits", "misses")}
+                total = sum(looked_up.values())
+                ratio = f"{looked_up['hits'] / total:.0%}" if total else "–"
+                print(f"{'on' if memory else 'off':<7} {lang:<9} {f'{start + 1}-{start + len(lessons)}':>8} "
+                      f"{translate.calls:>6} {translate.tokens_in:>10} {seconds:>8.2f} {ratio:>10}")
+    services.shutdown()
+
+
+if __name__ == "__main__":
+    main()
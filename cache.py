@@ -0,0 +1,325 @@
+import asyncio, hashlib, json, os, re, sqlite3, threading, time
+from collections import OrderedDict
+
+
+def normalize_text(text: str) -> str:
+    """Collapse whitespace so trivially different pastes share a cache entry."""
+    return re.sub(r"\s+", " ", text or "").strip()
+
+
+def cache_key(agent_name, model_id, instructions, text, lang=None) -> str:
+    payload = json.dumps(
+        [agent_name or "", model_id or "", list(instructions or []), normalize_text(text), lang or ""],
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LRUCache:
+    """In-process tier: bounded by entry count, entries expire after `ttl` seconds."""
+
+    def __init__(self, max_entries=1024, ttl=3600.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, expires = item
+            if expires < time.time():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        expires = time.time() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (value, expires)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class SQLiteCache:
+    """On-disk tier shared by every worker process that points at the same file."""
+
+    def __init__(self, path, ttl=86400.0, max_entries=100_000):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._writes = 0
+        db = self._db()
+        db.execute("CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL NOT NULL)")
+        db.execute("CREATE INDEX IF NOT EXISTS results_expires ON results(expires)")
+        db.commit()
+
+    def _db(self):
+        db = getattr(self._local, "db", None)
+        if db is None:
+            folder = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(folder, exist_ok=True)
+            db = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    def get(self, key):
+        row = self._db().execute(
+            "SELECT value FROM results WHERE key = ? AND expires >= ?", (key, time.time())
+        ).fetchone()
+        return row[0] if row else None
+
+    def set(self, key, value, ttl=None):
+        expires = time.time() + (self.ttl if ttl is None else ttl)
+        db = self._db()
+        db.execute("INSERT OR REPLACE INTO results (key, value, expires) VALUES (?, ?, ?)", (key, value, expires))
+        db.commit()
+        self._writes += 1
+        if self._writes % 256 == 0:
+            self.prune()
+
+    def prune(self):
+        db = self._db()
+        db.execute("DELETE FROM results WHERE expires < ?", (time.time(),))
+        db.execute(
+            "DELETE FROM results WHERE key IN (SELECT key FROM results ORDER BY expires DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        )
+        db.commit()
+
+    def __len__(self):
+        return self._db().execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+
+class ResultCache:
+    """Two-tier cache for model outputs: LRU in memory, optionally backed by SQLite."""
+
+    def __init__(self, max_entries=1024, ttl=86400.0, path=None):
+        self.memory = LRUCache(max_entries=max_entries, ttl=ttl)
+        self.disk = SQLiteCache(path, ttl=ttl) if path else None
+        self.hits = self.misses = self.disk_hits = self.bypassed = 0
+        self._lock = threading.Lock()
+
+    def _count(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def get(self, key):
+        value = self.memory.get(key)
+        if value is None and self.disk is not None:
+            value = self.disk.get(key)
+            if value is not None:
+                self.memory.set(key, value)
+                self._count("disk_hits")
+        self._count("hits" if value is not None else "misses")
+        return value
+
+    def set(self, key, value):
+        self.memory.set(key, value)
+        if self.disk is not None:
+            self.disk.set(key, value)
+
+    def get_or_compute(self, key, compute, use_cache=True):
+        if use_cache:
+            value = self.get(key)
+            if value is not None:
+                return value
+        else:
+            self._count("bypassed")
+        value = compute()
+        if value:
+            self.set(key, value)
+        return value
+
+    async def get_or_compute_async(self, key, compute, use_cache=True):
+        """`get_or_compute` for a `compute` that returns an awaitable. The SQLite tier,
+        when there is one, is read and written on a worker thread."""
+        offload = self.disk is not None
+        if use_cache:
+            value = await asyncio.to_thread(self.get, key) if offload else self.get(key)
+            if value is not None:
+                return value
+        else:
+            self._count("bypassed")
+        value = await compute()
+        if value:
+            if offload:
+                await asyncio.to_thread(self.set, key, value)
+            else:
+                self.set(key, value)
+        return value
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "disk_hits": self.disk_hits,
+            "bypassed": self.bypassed,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "memory_entries": len(self.memory),
+            "disk_entries": len(self.disk) if self.disk is not None else None,
+        }
+
+
+class BlobCache:
+    """Content-addressed files on disk with an SQLite index; least recently used
+    entries are evicted once the folder grows past `max_bytes`.
+
+    Triggers keep the folder's total size in a one-row table, so a write need not sum
+    the index. Hits record their access time in memory and write it out every
+    `touch_batch` hits, or after `touch_interval` seconds."""
+
+    def __init__(self, folder, max_bytes=512 * 1024 * 1024, touch_batch=64, touch_interval=5.0):
+        self.folder = folder
+        self.max_bytes = max_bytes
+        self.touch_batch = touch_batch
+        self.touch_interval = touch_interval
+        self.hits = self.misses = 0
+        self._touched, self._unflushed = {}, 0
+        self._flushed = time.monotonic()
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        os.makedirs(folder, exist_ok=True)
+        db = self._db()
+        db.execute("BEGIN IMMEDIATE")
+        db.execute("CREATE TABLE IF NOT EXISTS blobs (key TEXT PRIMARY KEY, size INTEGER NOT NULL, used REAL NOT NULL)")
+        db.execute("CREATE INDEX IF NOT EXISTS blobs_used ON blobs(used)")
+        db.execute("CREATE TABLE IF NOT EXISTS total (id INTEGER PRIMARY KEY CHECK (id = 0), bytes INTEGER NOT NULL)")
+        db.execute("INSERT OR IGNORE INTO total (id, bytes) SELECT 0, COALESCE(SUM(size), 0) FROM blobs")
+        db.execute("CREATE TRIGGER IF NOT EXISTS blobs_added AFTER INSERT ON blobs "
+                   "BEGIN UPDATE total SET bytes = bytes + new.size; END")
+        db.execute("CREATE TRIGGER IF NOT EXISTS blobs_removed AFTER DELETE ON blobs "
+                   "BEGIN UPDATE total SET bytes = bytes - old.size; END")
+        db.execute("CREATE TRIGGER IF NOT EXISTS blobs_resized AFTER UPDATE OF size ON blobs "
+                   "BEGIN UPDATE total SET bytes = bytes + new.size - old.size; END")
+        db.commit()
+
+    def _db(self):
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(os.path.join(self.folder, "index.db"), timeout=10, check_same_thread=False)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    def path(self, key) -> str:
+        return os.path.join(self.folder, key[:2], key)
+
+    def _count(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def lookup(self, key):
+        """Like `get` but returns the cached file's path instead of its bytes (or None)."""
+        path = self.path(key)
+        db = self._db()
+        if not os.path.exists(path) or db.execute("SELECT 1 FROM blobs WHERE key = ?", (key,)).fetchone() is None:
+            self._count("misses")
+            return None
+        with self._lock:
+            self.hits += 1
+            self._touched[key] = time.time()
+            self._unflushed += 1
+            due = self._unflushed >= self.touch_batch or time.monotonic() - self._flushed >= self.touch_interval
+        if due:
+            self.flush()
+        return path
+
+    def flush(self):
+        """Write the access times of recent hits to the index."""
+        with self._lock:
+            touched, self._touched, self._unflushed = self._touched, {}, 0
+            self._flushed = time.monotonic()
+        if touched:
+            db = self._db()
+            db.executemany("UPDATE blobs SET used = MAX(used, ?) WHERE key = ?",
+                           [(used, key) for key, used in touched.items()])
+            db.commit()
+
+    def get(self, key):
+        path = self.lookup(key)
+        if path is None:
+            return None
+        try:
+            with open(path, "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def set(self, key, data: bytes):
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+        self._index(key, len(data))
+        return path
+
+    def set_file(self, key, src):
+        """Move an already-written file at `src` into the cache."""
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(src, path)
+        self._index(key, os.path.getsize(path))
+        return path
+
+    def _index(self, key, size):
+        db = self._db()
+        # An upsert, not INSERT OR REPLACE: a replaced row would not fire the delete trigger.
+        db.execute("INSERT INTO blobs (key, size, used) VALUES (?, ?, ?) "
+                   "ON CONFLICT (key) DO UPDATE SET size = excluded.size, used = excluded.used", (key, size, time.time()))
+        db.commit()
+        self.evict()
+
+    def total_bytes(self) -> int:
+        return self._db().execute("SELECT bytes FROM total").fetchone()[0]
+
+    def evict(self):
+        excess = self.total_bytes() - self.max_bytes
+        if excess <= 0:
+            return
+        self.flush()  # so recently read entries are not taken for stale ones
+        db = self._db()
+        while excess > 0:
+            oldest = db.execute("SELECT key, size FROM blobs ORDER BY used LIMIT 64").fetchall()
+            if not oldest:
+                break
+            for key, size in oldest:
+                if excess <= 0:
+                    break
+                try:
+                    os.remove(self.path(key))
+                except OSError:
+                    pass
+                db.execute("DELETE FROM blobs WHERE key = ?", (key,))
+                excess -= size
+        db.commit()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        db = self._db()
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "entries": db.execute("SELECT COUNT(*) FROM blobs").fetchone()[0],
+            "bytes": self.total_bytes(),
+            "max_bytes": self.max_bytes,
+        }
@@ -1,102 +1,223 @@
-from openai import OpenAI
-import os
-from dotenv import load_dotenv
-from agno.agent import Agent
-from agno.models.groq import Groq
+"""Bulk transcription: Whisper + enhancement (+ optional translation) for a folder
+or manifest of recordings, written as JSONL.
 
+    python help.py recordings/ --out results.jsonl --lang French --workers 4
 
-load_dotenv()
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+Interrupted runs resume from the checkpoint file and skip recordings already done."""
+import argparse, json, os, sys, time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dotenv import load_dotenv
 
+import audio
+import metrics
+import preprocess
+import services
+import upstream
+from longaudio import transcribe_long
+from metrics import percentile, stage
 
-audio_path = "new.m4a"
 
+load_dotenv()
 
-with open(audio_path, "rb") as f:
-    t = client.audio.transcriptions.create(
-        model="whisper-1",
-        file=f,
-        response_format="text",
-        temperature=0
-    )
+AUDIO_EXTENSIONS = (".wav", ".mp3", ".m4a", ".flac", ".ogg", ".webm", ".mp4")
+STAGES = ("transcribe", "enhance", "translate")
 
-print("Raw Whisper Output:", t)
-print("=" * 50)
 
 def trans(text,lang):
     """Give a translation of the word or sentence to the specified language asked"""
     return f"Translate the following text to {lang}:\n\n{text}"
 
-help=Agent(
-    role="You are a translator and you translate english into any language asked",
-    model=Groq(id=os.getenv("GROQ_MODEL", "llama-3.1-70b-versatile")),
-    instructions=[
-        "You are a helpful assistant that translates English text into any language specified by the user.",
-        "When given a piece of text and a target language, provide an accurate translation in that language.",
-        "If the target language is not specified, default to translating into Spanish.",
-        "Ensure the translation maintains the original meaning and context of the text.",
-        "Respond only with the translated text, without any additional commentary or formatting."   
-    ],
-    show_tool_calls=False,
-    markdown=False,
-    stream=False
-)
-
-
-voice = Agent(
-    name="Language Enhancement Agent",
-    role="Text Refiner and Grammar Corrector",
-    model=Groq(id=os.getenv("GROQ_MODEL", "llama-3.1-70b-versatile")),
-    instructions=[
-        "You are an expert language enhancement specialist. Your task is to improve the given text in the following ways:",
-        "",
-        "1. GRAMMAR & TENSE CORRECTION:",
-        "- Fix all grammatical errors including verb tenses, subject-verb agreement, and sentence structure",
-        "- Ensure proper punctuation and capitalization",
-        "",
-        "2. VOCABULARY ENHANCEMENT:",
-        "- Replace simple words with more sophisticated alternatives (e.g., 'good' → 'excellent', 'bad' → 'inadequate')", 
-        "- Use more precise and descriptive language",
-        "- Replace casual expressions with formal equivalents (e.g., 'a lot of' → 'numerous', 'really' → 'considerably')",
-        "",
-        "3. SENTENCE STRUCTURE IMPROVEMENT:",
-        "- Combine choppy sentences into more fluid, complex sentences where appropriate",
-        "- Use varied sentence structures for better flow",
-        "- Add transitional phrases for better coherence",
-        "",
-        "4. FORMAL REGISTER:",
-        "- Convert casual speech patterns to formal written English",
-        "- Remove filler words and redundancies",
-        "- Maintain the original meaning while elevating the language level",
-        "",
-        "IMPORTANT: Return ONLY the enhanced text without any explanations, comments, or additional formatting.",
-        "The output should be ready to use as polished, professional text."
-    ],
-    show_tool_calls=False,
-    markdown=False,
-    stream=False
-)
-
-
-response = voice.run(t)
-
-
-if hasattr(response, 'content'):
-    enhanced_text = response.content
-elif hasattr(response, 'text'):
-    enhanced_text = response.text  
-elif hasattr(response, 'response'):
-    enhanced_text = response.response
-else:
-    enhanced_text = str(response)
-
-print("Enhanced Output:")
-print(enhanced_text)
-
-
-print("\n" + "=" * 80)
-print("COMPARISON:")
-print("=" * 80)
-print(f"ORIGINAL: {t}")
-print("-" * 40)
-print(f"ENHANCED: {enhanced_text}")
\ No newline at end of file
+
+def response_text(response):
+    if hasattr(response, 'content'):
+        return response.content
+    elif hasattr(response, 'text'):
+        return response.text
+    elif hasattr(response, 'response'):
+        return response.response
+    return str(response)
+
+
+def find_recordings(source):
+    """Audio files under a folder, or the entries of a manifest.
+
+    A manifest is either a text file with one path per line or JSONL with a `path` and
+    optional `lang` per line; relative paths are resolved against the manifest."""
+    if os.path.isdir(source):
+        found = []
+        for root, _, files in os.walk(source):
+            found.extend(
+                {"path": os.path.join(root, name)} for name in files if name.lower().endswith(AUDIO_EXTENSIONS)
+            )
+        return sorted(found, key=lambda item: item["path"])
+    base = os.path.dirname(os.path.abspath(source))
+    items = []
+    with open(source, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            item = json.loads(line) if line.startswith("{") else {"path": line}
+            item["path"] = os.path.join(base, item["path"])
+            items.append(item)
+    return items
+
+
+def checkpoint_key(path):
+    """Identifies a recording by path, size and mtime, so edited files are redone."""
+    st = os.stat(path)
+    return f"{os.path.abspath(path)}:{st.st_size}:{st.st_mtime_ns}"
+
+
+def load_checkpoint(path):
+    if not os.path.exists(path):
+        return set()
+    with open(path, encoding="utf-8") as f:
+        return {line.rstrip("\n") for line in f if line.strip()}
+
+
+def whisper_client():
+    return upstream.scheduled_client(services.openai_client(), upstream.get("openai", "whisper-1"))
+
+
+def transcribe_file(path, long_mode=False):
+    client = whisper_client()
+    if long_mode:
+        with audio.decoded(path) as pcm:
+            return transcribe_long(client, preprocess.trim(pcm), retries=0, encode=preprocess.encode).text
+    shrunk = preprocess.shrink(path, os.path.getsize(path))
+    with open(path, "rb") as f:
+        return str(client.audio.transcriptions.create(
+            model="whisper-1",
+            file=(f"upload.{shrunk.kind}", shrunk.payload) if shrunk else f,
+            response_format="text",
+            temperature=0
+        ))
+
+
+def process(item, lang=None, long_mode=False):
+    """Run every stage for one recording; returns the JSONL record."""
+    record = {"path": item["path"], "seconds": {}}
+    lang = item.get("lang") or lang
+    try:
+        with stage("transcribe") as timer:
+            record["transcript"] = transcribe_file(item["path"], long_mode)
+        record["seconds"]["transcribe"] = timer.seconds
+
+        with stage("enhance") as timer:
+            voice = services.bulk_enhance_agent()
+            record["enhanced"] = response_text(upstream.for_agent(voice).call(voice.run, record["transcript"]))
+        record["seconds"]["enhance"] = timer.seconds
+
+        if lang:
+            record["lang"] = lang
+            with stage("translate") as timer:
+                translator = services.bulk_translate_agent()
+                record["translation"] = response_text(
+                    upstream.for_agent(translator).call(translator.run, trans(record["enhanced"], lang)))
+            record["seconds"]["translate"] = timer.seconds
+        record["status"] = "ok"
+    except Exception as e:
+        record["status"] = "error"
+        record["error"] = str(e)
+    record["audio_seconds"] = audio.duration_s(item["path"])
+    return record
+
+
+def summarize(records, elapsed):
+    done = [r for r in records if r["status"] == "ok"]
+    audio_seconds = sum(r["audio_seconds"] or 0 for r in done)
+    lines = [
+        f"files: {len(records)} processed, {len(done)} ok, {len(records) - len(done)} failed in {elapsed:.1f}s",
+        f"throughput: {len(records) / elapsed * 60 if elapsed else 0:.2f} files/min, "
+        f"{audio_seconds / elapsed if elapsed else 0:.2f} audio-seconds/sec",
+    ]
+    for name in STAGES:
+        values = [r["seconds"][name] for r in records if name in r["seconds"]]
+        if values:
+            lines.append(
+                f"{name:>10}: p50 {percentile(values, 50):.2f}s  p90 {percentile(values, 90):.2f}s  "
+                f"p99 {percentile(values, 99):.2f}s  max {max(values):.2f}s  (n={len(values)})"
+            )
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("source", help="folder of recordings, or a manifest (.txt paths or .jsonl)")
+    parser.add_argument("--out", default="-", help="JSONL output file, appended to (default: stdout)")
+    parser.add_argument("--checkpoint", help="file of finished recordings (default: <out>.checkpoint)")
+    parser.add_argument("--lang", help="also translate the enhanced text into this language")
+    parser.add_argument("--workers", type=int, default=4, help="recordings processed concurrently")
+    parser.add_argument("--long", action="store_true", help="use chunked transcription for every file")
+    parser.add_argument("--metrics", help="write Prometheus-format stage metrics to this file at the end")
+    args = parser.parse_args(argv)
+    if services.warm_up_enabled():
+        # Connect to OpenAI and Groq while the recordings are being listed.
+        services.start_warm_up(agents=("bulk_enhance_agent", "bulk_translate_agent"))
+
+    checkpoint = args.checkpoint or (f"{args.out}.checkpoint" if args.out != "-" else "bulk.checkpoint")
+    done = load_checkpoint(checkpoint)
+    found = find_recordings(args.source)
+    items, unreadable = [], []
+    for item in found:
+        try:
+            key = checkpoint_key(item["path"])
+        except OSError as e:
+            # A missing or unreadable entry fails on its own, like any other recording.
+            unreadable.append({"path": item["path"], "seconds": {}, "status": "error", "error": str(e),
+                               "audio_seconds": None})
+            continue
+        if key not in done:
+            items.append((item, key))
+    skipped = len(found) - len(items) - len(unreadable)
+    print(f"{len(items)} recordings to process, {skipped} already done, {len(unreadable)} unreadable", file=sys.stderr)
+
+    out = sys.stdout if args.out == "-" else open(args.out, "a", encoding="utf-8")
+    records = []
+    started = time.perf_counter()
+    try:
+        with open(checkpoint, "a", encoding="utf-8") as ckpt, ThreadPoolExecutor(max_workers=max(1, args.workers)) as pool:
+            def write(record, key=None):
+                records.append(record)
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                out.flush()
+                # Output first, checkpoint second: a crash in between repeats one
+                # record on resume rather than losing it. Failed files are not
+                # checkpointed, so a rerun retries them.
+                if record["status"] == "ok":
+                    ckpt.write(key + "\n")
+                    ckpt.flush()
+
+            for record in unreadable:
+                write(record)
+            futures = {pool.submit(process, item, args.lang, args.long): key for item, key in items}
+            written = set()
+            try:
+                for future in as_completed(futures):
+                    written.add(future)
+                    write(future.result(), futures[future])
+            except KeyboardInterrupt:
+                # Drop the queued recordings at once, but keep what is already running.
+                pool.shutdown(wait=False, cancel_futures=True)
+                running = [f for f in futures if f not in written and not f.cancelled()]
+                print(f"interrupted; saving the {len(running)} recordings in progress (Ctrl+C again to stop now), "
+                      "then rerun the same command to resume", file=sys.stderr)
+                try:
+                    for future in as_completed(running):
+                        write(future.result(), futures[future])
+                except KeyboardInterrupt:
+                    pass
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    if records:
+        print(summarize(records, time.perf_counter() - started), file=sys.stderr)
+    if args.metrics:
+        with open(args.metrics, "w", encoding="utf-8") as f:
+            f.write(metrics.REGISTRY.exposition())
+    return 0 if all(r["status"] == "ok" for r in records) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
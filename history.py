@@ -0,0 +1,129 @@
+"""Saved results: every transcription, enhancement, translation and pipeline run,
+per user, in SQLite (WAL mode, so readers never wait on the writer).
+
+Pages are keyset-paginated on the row id (`before`), which costs the same on the
+last page of a long history as on the first. Search uses an FTS5 index over the
+texts, or LIKE when SQLite was built without FTS5. `lookup` finds a result by the
+agent cache key it was made with, so a repeated request can reuse it instead of
+calling the model again."""
+import os, re, sqlite3, threading, time
+
+KINDS = ("transcribe", "enhance", "translate", "pipeline")
+FIELDS = ("id", "user", "kind", "created", "lang", "key", "source", "enhanced", "translation")
+# Marks around search matches in snippets; callers escape the text, then swap these for tags.
+MARK, END_MARK = "\x02", "\x03"
+
+
+def fts_query(text):
+    """A user's search box text as an FTS5 query: every word must appear, the last as
+    a prefix. Quoting each word keeps FTS5 syntax characters from being parsed."""
+    words = re.findall(r"\w+", text or "")
+    if not words:
+        return None
+    return " ".join(f'"{word}"' for word in words) + "*"
+
+
+class HistoryStore:
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        db = self._db()
+        db.executescript("""
+            CREATE TABLE IF NOT EXISTS entries (
+                id INTEGER PRIMARY KEY, user TEXT NOT NULL, kind TEXT NOT NULL, created REAL NOT NULL,
+                lang TEXT, key TEXT, source TEXT NOT NULL, enhanced TEXT, translation TEXT
+            );
+            CREATE INDEX IF NOT EXISTS entries_user ON entries(user, id);
+            CREATE INDEX IF NOT EXISTS entries_key ON entries(key, id) WHERE key IS NOT NULL;
+        """)
+        try:
+            db.executescript("""
+                CREATE VIRTUAL TABLE IF NOT EXISTS entries_fts USING fts5(
+                    source, enhanced, translation, content='entries', content_rowid='id',
+                    tokenize='unicode61 remove_diacritics 2'
+                );
+                CREATE TRIGGER IF NOT EXISTS entries_ai AFTER INSERT ON entries BEGIN
+                    INSERT INTO entries_fts(rowid, source, enhanced, translation)
+                    VALUES (new.id, new.source, new.enhanced, new.translation);
+                END;
+                CREATE TRIGGER IF NOT EXISTS entries_ad AFTER DELETE ON entries BEGIN
+                    INSERT INTO entries_fts(entries_fts, rowid, source, enhanced, translation)
+                    VALUES ('delete', old.id, old.source, old.enhanced, old.translation);
+                END;
+            """)
+            self.fts = True
+        except sqlite3.OperationalError:  # no FTS5 in this SQLite build
+            self.fts = False
+        db.commit()
+
+    def _db(self):
+        db = getattr(self._local, "db", None)
+        if db is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            db = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    def add(self, user, kind, source, enhanced=None, translation=None, lang=None, key=None) -> int:
+        db = self._db()
+        cursor = db.execute(
+            "INSERT INTO entries (user, kind, created, lang, key, source, enhanced, translation) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (user, kind, time.time(), lang, key, source, enhanced, translation),
+        )
+        db.commit()
+        return cursor.lastrowid
+
+    def get(self, user, entry_id):
+        row = self._db().execute(
+            f"SELECT {', '.join(FIELDS)} FROM entries WHERE id = ? AND user = ?", (entry_id, user)
+        ).fetchone()
+        return dict(zip(FIELDS, row)) if row else None
+
+    def lookup(self, key):
+        """The newest entry of any user made with agent cache key `key`, or None."""
+        row = self._db().execute(
+            f"SELECT {', '.join(FIELDS)} FROM entries WHERE key = ? ORDER BY id DESC LIMIT 1", (key,)
+        ).fetchone()
+        return dict(zip(FIELDS, row)) if row else None
+
+    def page(self, user, before=None, limit=20, query=None):
+        """(entries newest first, `before` for the next page or None). Each entry has a
+        `snippet`; for searches it shows the match between MARK and END_MARK."""
+        before = before or 2 ** 63 - 1
+        columns = ", ".join(f"e.{name}" for name in FIELDS)
+        match = fts_query(query) if query else None
+        if match and self.fts:
+            rows = self._db().execute(
+                f"SELECT {columns}, snippet(entries_fts, -1, ?, ?, '…', 16) FROM entries_fts "
+                "JOIN entries e ON e.id = entries_fts.rowid "
+                "WHERE entries_fts MATCH ? AND entries_fts.rowid < ? AND e.user = ? "
+                "ORDER BY entries_fts.rowid DESC LIMIT ?",
+                (MARK, END_MARK, match, before, user, limit + 1),
+            ).fetchall()
+        elif query and query.strip():
+            like = "%" + query.strip().replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+            rows = self._db().execute(
+                f"SELECT {columns}, substr(e.source, 1, 160) FROM entries e WHERE e.user = ? AND e.id < ? "
+                "AND (e.source LIKE ? ESCAPE '\\' OR e.enhanced LIKE ? ESCAPE '\\' OR e.translation LIKE ? ESCAPE '\\') "
+                "ORDER BY e.id DESC LIMIT ?",
+                (user, before, like, like, like, limit + 1),
+            ).fetchall()
+        else:
+            rows = self._db().execute(
+                f"SELECT {columns}, substr(e.source, 1, 160) FROM entries e WHERE e.user = ? AND e.id < ? "
+                "ORDER BY e.id DESC LIMIT ?",
+                (user, before, limit + 1),
+            ).fetchall()
+        entries = [dict(zip(FIELDS + ("snippet",), row)) for row in rows[:limit]]
+        return entries, (entries[-1]["id"] if len(rows) > limit else None)
+
+    def delete(self, user, entry_id) -> bool:
+        db = self._db()
+        deleted = db.execute("DELETE FROM entries WHERE id = ? AND user = ?", (entry_id, user)).rowcount
+        db.commit()
+        return bool(deleted)
+
+    def __len__(self):
+        return self._db().execute("SELECT COUNT(*) FROM entries").fetchone()[0]
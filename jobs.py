@@ -0,0 +1,214 @@
+"""Background jobs for the transcribe → enhance → translate → speak pipeline.
+
+Each job is a folder holding `job.json` plus one file per finished stage, so a later
+job can start from an earlier job's outputs instead of redoing them."""
+import json, os, shutil, threading, time, uuid
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows
+    fcntl = None
+
+STAGES = ("transcribe", "enhance", "translate", "speak")
+OUTPUTS = {
+    "transcribe": "transcript.txt",
+    "enhance": "enhanced.txt",
+    "translate": "translation.txt",
+    "speak": "speech.wav",
+}
+FINISHED = ("done", "failed")
+
+
+class JobStore:
+    """Job folders under `folder`; finished jobs are deleted `ttl` seconds after they
+    finished (checked on startup and every 64 new jobs)."""
+
+    def __init__(self, folder, ttl=7 * 86400.0):
+        self.folder = folder
+        self.ttl = ttl
+        self._created = 0
+        self._lock_file = None
+        os.makedirs(folder, exist_ok=True)
+
+    def dir(self, job_id) -> str:
+        if not job_id or not all(c in "0123456789abcdef-" for c in job_id):
+            raise ValueError("invalid job id")
+        return os.path.join(self.folder, job_id)
+
+    def create(self, stages, params=None) -> dict:
+        now = time.time()
+        job = {
+            "id": uuid.uuid4().hex,
+            "status": "queued",
+            "stage": None,
+            "stages": [s for s in STAGES if s in stages],
+            "params": params or {},
+            "reused": [],
+            "error": None,
+            "created": now,
+            "updated": now,
+        }
+        os.makedirs(self.dir(job["id"]))
+        self.save(job)
+        self._created += 1
+        if self._created % 64 == 0:
+            self.prune()
+        return job
+
+    def save(self, job):
+        job["updated"] = time.time()
+        path = os.path.join(self.dir(job["id"]), "job.json")
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(job, f)
+        os.replace(tmp, path)
+
+    def load(self, job_id):
+        try:
+            with open(os.path.join(self.dir(job_id), "job.json"), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def jobs(self):
+        """Every readable job in the store."""
+        for name in os.listdir(self.folder):
+            try:
+                job = self.load(name)
+            except ValueError:  # not a job folder
+                continue
+            if job is not None:
+                yield job
+
+    def finish(self, job, status, error=None):
+        """Mark `job` done or failed; its uploaded audio is no longer needed."""
+        job["status"] = status
+        job["error"] = error
+        self.save(job)
+        try:
+            os.remove(self.input_path(job["id"]))
+        except OSError:
+            pass
+
+    def prune(self):
+        """Delete jobs that finished more than `ttl` seconds ago, and folders a crash
+        left without a job.json."""
+        cutoff = time.time() - self.ttl
+        for name in os.listdir(self.folder):
+            try:
+                path = self.dir(name)
+            except ValueError:
+                continue
+            job = self.load(name)
+            if job is None and os.path.getmtime(path) < cutoff or \
+                    job is not None and job["status"] in FINISHED and job["updated"] < cutoff:
+                shutil.rmtree(path, ignore_errors=True)
+
+    def orphaned(self) -> list:
+        """Unfinished jobs that no running process will finish. Every process using the
+        store holds a shared lock on it; the first one to open a store nobody holds gets
+        the unfinished jobs, later ones get none. Call once per process."""
+        if fcntl is None:
+            return [job for job in self.jobs() if job["status"] not in FINISHED]
+        # Processes starting together take turns, so only one of them sees the store unheld.
+        with open(os.path.join(self.folder, ".startup.lock"), "a") as startup:
+            fcntl.flock(startup, fcntl.LOCK_EX)
+            self._lock_file = open(os.path.join(self.folder, ".lock"), "a")
+            try:
+                fcntl.flock(self._lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:  # other processes are running the jobs
+                fcntl.flock(self._lock_file, fcntl.LOCK_SH)
+                return []
+            try:
+                return [job for job in self.jobs() if job["status"] not in FINISHED]
+            finally:
+                fcntl.flock(self._lock_file, fcntl.LOCK_SH)
+
+    def output_path(self, job_id, stage) -> str:
+        return os.path.join(self.dir(job_id), OUTPUTS[stage])
+
+    def has_output(self, job_id, stage) -> bool:
+        return os.path.exists(self.output_path(job_id, stage))
+
+    def read_output(self, job_id, stage):
+        path = self.output_path(job_id, stage)
+        if stage == "speak" or not os.path.exists(path):
+            return None
+        with open(path, encoding="utf-8") as f:
+            return f.read()
+
+    def write_output(self, job_id, stage, data):
+        path = self.output_path(job_id, stage)
+        tmp = path + ".tmp"
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    def input_path(self, job_id) -> str:
+        return os.path.join(self.dir(job_id), "input.audio")
+
+    def copy_outputs(self, src_id, dst_id, stages):
+        """Seed `dst_id` with the outputs `src_id` already has for `stages`."""
+        copied = []
+        for stage in stages:
+            if self.has_output(src_id, stage):
+                shutil.copyfile(self.output_path(src_id, stage), self.output_path(dst_id, stage))
+                copied.append(stage)
+        return copied
+
+
+class JobRunner:
+    """Runs a job's stages in order. `handlers` maps a stage name to a callable that takes
+    the job dict and returns the stage output (str, or bytes for audio)."""
+
+    def __init__(self, store, handlers):
+        self.store = store
+        self.handlers = handlers
+
+    def run(self, job_id):
+        job = self.store.load(job_id)
+        if job is None:
+            return
+        job["status"] = "running"
+        self.store.save(job)
+        for stage in job["stages"]:
+            if self.store.has_output(job_id, stage):
+                if stage not in job["reused"]:
+                    job["reused"].append(stage)
+                continue
+            job["stage"] = stage
+            self.store.save(job)
+            try:
+                self.store.write_output(job_id, stage, self.handlers[stage](job))
+            except Exception as e:
+                self.store.finish(job, "failed", f"{stage} failed: {e}")
+                return
+        job["stage"] = None
+        self.store.finish(job, "done")
+
+
+class InProcessBackend:
+    """Runs jobs on a thread pool inside the web process; needs no external broker."""
+
+    def __init__(self, runner, workers=2):
+        self.runner = runner
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="job")
+
+    def submit(self, job_id):
+        self._pool.submit(self.runner.run, job_id)
+
+    def shutdown(self, wait=True):
+        self._pool.shutdown(wait=wait)
+
+
+BACKENDS = {"inprocess": InProcessBackend}
+
+
+def make_backend(name, runner, **options):
+    try:
+        return BACKENDS[name](runner, **options)
+    except KeyError:
+        raise ValueError(f"unknown job backend {name!r}; choose from {', '.join(BACKENDS)}") from None
@@ -0,0 +1,146 @@
+"""Long-recording transcription: split on silence, transcribe segments concurrently,
+stitch the texts back together with the overlapping words removed."""
+import contextvars, re, time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from difflib import SequenceMatcher
+
+import audio
+
+GAP_MARKER = "[…]"
+# Upper end of speaking rate; sizes the stretch of words compared across an overlap.
+WORDS_PER_SECOND = 3.0
+
+
+@dataclass
+class Segment:
+    index: int
+    start_ms: int
+    end_ms: int
+    pcm: bytes = field(repr=False)
+
+
+@dataclass
+class LongTranscript:
+    text: str
+    segments: list
+    failed: int = 0
+
+
+def quietest_point(pcm, rate, start_ms, end_ms, window_ms=300, frame_ms=20) -> int:
+    """Centre of the quietest `window_ms` stretch between `start_ms` and `end_ms`."""
+    levels = audio.frame_levels(pcm, rate, frame_ms, start_ms, end_ms)
+    span = max(1, window_ms // frame_ms)
+    if len(levels) <= span:
+        return int(end_ms)
+    running = sum(level for _, level in levels[:span])
+    best, best_at = running, 0
+    for i in range(span, len(levels)):
+        running += levels[i][1] - levels[i - span][1]
+        if running < best:
+            best, best_at = running, i - span + 1
+    return levels[best_at][0] + window_ms // 2
+
+
+def plan_segments(pcm, rate=audio.SAMPLE_RATE, segment_s=300, overlap_s=2.0, search_s=20):
+    """Cut `pcm` into segments of at most `segment_s` seconds, each ending on the quietest
+    point of the last `search_s` seconds, and starting `overlap_s` before the previous cut."""
+    total = audio.duration_ms(pcm, rate)
+    segment_ms, overlap_ms, search_ms = int(segment_s * 1000), int(overlap_s * 1000), int(search_s * 1000)
+    segments, start, cut_from = [], 0, 0
+    while True:
+        if total - start <= segment_ms:
+            end = total
+        else:
+            target = start + segment_ms
+            end = quietest_point(pcm, rate, max(cut_from + overlap_ms, target - search_ms), target)
+        segments.append(Segment(
+            len(segments), start, end, pcm[audio.ms_to_offset(start, rate):audio.ms_to_offset(end, rate)]
+        ))
+        if end >= total:
+            return segments
+        cut_from = end
+        start = max(0, end - overlap_ms)
+
+
+def wav(pcm, rate):
+    return audio.to_wav_bytes(pcm, rate), "wav"
+
+
+def transcribe_segment(client, segment, rate=audio.SAMPLE_RATE, model="whisper-1", retries=3, backoff=1.0, encode=wav):
+    """Transcribe one segment, retrying on its own so one failure does not sink the job.
+    `encode(pcm, rate)` gives the (file contents, extension) to upload.
+    Returns (text, attempts, bytes uploaded)."""
+    payload, ext = encode(segment.pcm, rate)
+    name = f"segment-{segment.index:04d}-{segment.start_ms}-{segment.end_ms}.{ext}"
+    for attempt in range(retries + 1):
+        try:
+            out = client.audio.transcriptions.create(
+                model=model, file=(name, payload), response_format="text", temperature=0
+            )
+            return str(out).strip(), attempt + 1, len(payload)
+        except Exception:
+            if attempt == retries:
+                raise
+            time.sleep(backoff * (2 ** attempt))
+
+
+def _words(text):
+    return text.split()
+
+
+def _norm(word):
+    return re.sub(r"[^\w']", "", word.lower())
+
+
+def stitch(texts, overlap_s=2.0, words_per_second=WORDS_PER_SECOND, min_match=4, slack=1) -> str:
+    """Join segment texts, dropping the words repeated across each overlap.
+
+    Only the last and first ~`overlap_s` seconds of words are compared, and the repeat
+    must end the earlier text and start the later one (give or take `slack` words cut
+    in half at the boundary). Without such a match the texts are simply joined, so a
+    phrase that recurs elsewhere never swallows the words in between."""
+    window = int(overlap_s * words_per_second) + 2 * slack + 1
+    words = []
+    for text in texts:
+        if text is None:
+            words.append(GAP_MARKER)
+            continue
+        new = _words(text)
+        if words and words[-1] != GAP_MARKER and new:
+            tail = words[-window:]
+            head = new[:window]
+            match = SequenceMatcher(None, [_norm(w) for w in tail], [_norm(w) for w in head], autojunk=False) \
+                .find_longest_match(0, len(tail), 0, len(head))
+            anchored = match.a + match.size >= len(tail) - slack and match.b <= slack
+            if match.size >= min_match and anchored:
+                words = words[:len(words) - len(tail) + match.a + match.size]
+                new = new[match.b + match.size:]
+        words.extend(new)
+    return " ".join(words)
+
+
+def transcribe_long(client, pcm, rate=audio.SAMPLE_RATE, workers=4, model="whisper-1", retries=3,
+                    backoff=1.0, segment_s=300, overlap_s=2.0, encode=wav) -> LongTranscript:
+    segments = plan_segments(pcm, rate, segment_s=segment_s, overlap_s=overlap_s)
+
+    def run(segment):
+        started = time.perf_counter()
+        info = {"index": segment.index, "start_ms": segment.start_ms, "end_ms": segment.end_ms}
+        try:
+            info["text"], info["attempts"], info["bytes"] = transcribe_segment(
+                client, segment, rate, model, retries, backoff, encode
+            )
+        except Exception as e:
+            info["text"], info["attempts"], info["bytes"], info["error"] = None, retries + 1, 0, str(e)
+        info["seconds"] = round(time.perf_counter() - started, 3)
+        return info
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = [pool.submit(contextvars.copy_context().run, run, segment) for segment in segments]
+        results = [future.result() for future in futures]
+    return LongTranscript(
+        text=stitch([r["text"] for r in results], overlap_s=overlap_s),
+        segments=results,
+        failed=sum(1 for r in results if r["text"] is None),
+    )
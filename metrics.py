@@ -0,0 +1,162 @@
+"""In-process metrics with Prometheus text exposition.
+
+`stage(name)` times a block into a latency histogram, counts its errors and adds it to
+the current request's Server-Timing breakdown. Recording is a lock plus a bisect."""
+import contextvars, threading, time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+_timings = contextvars.ContextVar("server_timings", default=None)
+
+
+def percentile(values, q):
+    """Nearest-rank percentile of `values` (0 < q <= 100); None for no values."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * q // 100))
+    return ordered[int(rank) - 1]
+
+
+def _labels(labels) -> str:
+    if not labels:
+        return ""
+    parts = []
+    for k, v in labels:
+        v = str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        parts.append(f'{k}="{v}"')
+    return "{" + ",".join(parts) + "}"
+
+
+class Counter:
+    def __init__(self, name, help):
+        self.name, self.help, self.kind = name, help, "counter"
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1.0, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels):
+        return self._values.get(tuple(sorted(labels.items())), 0.0)
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, key, value) for key, value in self._values.items()]
+
+
+class Histogram:
+    def __init__(self, name, help, buckets=BUCKETS):
+        self.name, self.help, self.kind = name, help, "histogram"
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def samples(self):
+        out = []
+        with self._lock:
+            for key, (counts, total, count) in self._series.items():
+                running = 0
+                for bound, n in zip(self.buckets + (float("inf"),), counts):
+                    running += n
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    out.append((self.name + "_bucket", key + (("le", le),), running))
+                out.append((self.name + "_sum", key, total))
+                out.append((self.name + "_count", key, count))
+        return out
+
+
+class GaugeCallback:
+    """A gauge read at scrape time; `fn` returns {labels tuple: value}."""
+
+    def __init__(self, name, help, fn):
+        self.name, self.help, self.kind = name, help, "gauge"
+        self.fn = fn
+
+    def samples(self):
+        try:
+            return [(self.name, tuple(key), value) for key, value in self.fn().items() if value is not None]
+        except Exception:
+            return []
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _add(self, metric):
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name, help):
+        return self._add(Counter(name, help))
+
+    def histogram(self, name, help, buckets=BUCKETS):
+        return self._add(Histogram(name, help, buckets))
+
+    def gauge_callback(self, name, help, fn):
+        with self._lock:
+            self._metrics[name] = GaugeCallback(name, help, fn)
+            return self._metrics[name]
+
+    def exposition(self) -> str:
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{_labels(labels)} {value:g}" if isinstance(value, float) else f"{name}{_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+STAGE_SECONDS = REGISTRY.histogram("eduspeak_stage_seconds", "Latency of pipeline stages.")
+STAGE_ERRORS = REGISTRY.counter("eduspeak_stage_errors_total", "Pipeline stages that raised.")
+
+
+class _Timer:
+    seconds = 0.0
+
+
+@contextmanager
+def stage(name):
+    """Time a block as pipeline stage `name`; the timer's `.seconds` is set on exit."""
+    timer = _Timer()
+    started = time.perf_counter()
+    try:
+        yield timer
+    except BaseException:
+        STAGE_ERRORS.inc(stage=name)
+        raise
+    finally:
+        timer.seconds = time.perf_counter() - started
+        STAGE_SECONDS.observe(timer.seconds, stage=name)
+        timings = _timings.get()
+        if timings is not None:
+            timings[name] = timings.get(name, 0.0) + timer.seconds
+
+
+def start_request():
+    """Begin collecting Server-Timing entries for the current request/context."""
+    _timings.set({})
+
+
+def server_timing() -> str:
+    timings = _timings.get() or {}
+    return ", ".join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in timings.items())
@@ -0,0 +1,79 @@
+"""Shrink recordings before they are sent to Whisper.
+
+Whisper resamples everything to 16 kHz mono, so a 44.1 kHz stereo WAV carries about
+five times more data than the model uses. Here audio is decoded to 16 kHz mono, its
+leading and trailing silence is trimmed, and it is re-encoded as Ogg/Opus. Without
+ffmpeg it is sent as a 16 kHz WAV instead."""
+import logging, os
+from dataclasses import dataclass
+
+import audio
+import transcode
+
+log = logging.getLogger(__name__)
+ENABLED = os.getenv("WHISPER_PREPROCESS", "1") != "0"
+FORMAT = os.getenv("WHISPER_UPLOAD_FORMAT", "ogg")
+# Opus at 24 kbps keeps wideband speech intact, so transcripts do not change.
+KBPS = int(os.getenv("WHISPER_UPLOAD_KBPS", "24"))
+# Uploads are encoded once and thrown away, so trade a few percent of size for speed:
+# Opus at complexity 5 encodes twice as fast as at its default of 10.
+FAST = {"ogg": ("-compression_level", "5")}
+
+
+def trim(pcm: bytes) -> bytes:
+    return audio.trim_silence(pcm) if ENABLED else pcm
+
+
+def encode(pcm: bytes, rate=audio.SAMPLE_RATE, name=FORMAT, bitrate=KBPS):
+    """(file contents, extension) of `pcm` in the upload format; for longaudio's `encode`."""
+    if not ENABLED or name == "wav" or not transcode.available():
+        return audio.to_wav_bytes(pcm, rate), "wav"
+    return transcode.encode_pcm(pcm, rate, name, bitrate, FAST.get(name, ())), name
+
+
+@dataclass
+class Shrunk:
+    payload: bytes
+    kind: str
+    original_bytes: int
+    original_ms: int
+    sent_ms: int
+
+    @property
+    def sent_bytes(self) -> int:
+        return len(self.payload)
+
+
+def shrink(path, size):
+    """The audio file at `path` (`size` bytes) decoded, trimmed and re-encoded, or None
+    when pre-processing is off, the file cannot be decoded here (an M4A without ffmpeg),
+    or the result would not be smaller. The PCM is decoded to disk, not held in memory."""
+    if not ENABLED:
+        return None
+    try:
+        with audio.decoded(path) as pcm:
+            trimmed = trim(pcm)
+            if len(trimmed) + 44 >= size and not (FORMAT != "wav" and transcode.available()):
+                return None  # a WAV of it would be no smaller; don't build one
+            payload, kind = encode(trimmed)
+            shrunk = Shrunk(payload, kind, size, audio.duration_ms(pcm), audio.duration_ms(trimmed))
+            del trimmed
+    except Exception as e:
+        log.warning("pre-processing skipped: %s", e)
+        return None
+    return shrunk if shrunk.sent_bytes < size else None
+
+
+def summary(original_bytes, sent_bytes, trimmed_ms=0, client_bytes=None) -> str:
+    """One line for the page, e.g. "Sent 0.41 MB to Whisper instead of 5.20 MB (12.7× smaller)."
+    The ratio is left out unless the audio actually shrank."""
+    before = max(original_bytes, client_bytes or 0)
+    text = f"Sent {sent_bytes / 1e6:.2f} MB to Whisper instead of {before / 1e6:.2f} MB"
+    details = []
+    if 0 < sent_bytes < before:
+        details.append(f"{before / sent_bytes:.1f}× smaller")
+    if client_bytes and client_bytes > original_bytes:
+        details.append(f"{original_bytes / 1e6:.2f} MB after shrinking in the browser")
+    if trimmed_ms >= 1000:
+        details.append(f"{trimmed_ms / 1000:.1f} s of silence trimmed")
+    return text + (f" ({'; '.join(details)})." if details else ".")
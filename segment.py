@@ -0,0 +1,96 @@
+"""Split long text into paragraph/sentence-aligned chunks under a token budget, process
+the chunks concurrently and put the results back together in order."""
+import contextvars, re
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+PARAGRAPH_RE = re.compile(r"\n\s*\n")
+SENTENCE_END_RE = re.compile(r"(?<=[.!?…。！？])[\"'”’)\]]*\s+")
+ABBREVIATIONS = {"mr.", "mrs.", "ms.", "dr.", "prof.", "st.", "vs.", "etc.", "e.g.", "i.e.", "no.", "fig."}
+
+
+@dataclass
+class Chunk:
+    text: str
+    sep: str  # what follows the chunk when reassembling: "\n\n" between paragraphs, " " inside one
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about four characters per token for English)."""
+    return max(1, len(text) // 4)
+
+
+def split_sentences(text: str):
+    sentences, start = [], 0
+    for match in SENTENCE_END_RE.finditer(text):
+        candidate = text[start:match.start()].strip()
+        last_word = candidate.rsplit(None, 1)[-1].lower() if candidate else ""
+        if last_word in ABBREVIATIONS or re.fullmatch(r"[a-z]\.", last_word):
+            continue
+        sentences.append(text[start:match.end()].strip())
+        start = match.end()
+    tail = text[start:].strip()
+    if tail:
+        sentences.append(tail)
+    return sentences
+
+
+def _split_words(sentence: str, max_tokens: int):
+    pieces, current = [], []
+    for word in sentence.split():
+        if current and estimate_tokens(" ".join(current + [word])) > max_tokens:
+            pieces.append(" ".join(current))
+            current = []
+        current.append(word)
+    if current:
+        pieces.append(" ".join(current))
+    return pieces
+
+
+def chunk_text(text: str, max_tokens: int = 800):
+    """Chunks never span paragraphs, so editing one paragraph only changes that
+    paragraph's chunks and every other chunk stays a cache hit. Paragraphs over the
+    budget are split into runs of whole sentences (or words, for a giant sentence)."""
+    chunks = []
+    for paragraph in PARAGRAPH_RE.split(text.strip()):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if estimate_tokens(paragraph) <= max_tokens:
+            chunks.append(Chunk(paragraph, "\n\n"))
+            continue
+        pieces = []
+        for sentence in split_sentences(paragraph):
+            if estimate_tokens(sentence) > max_tokens:
+                pieces.extend(_split_words(sentence, max_tokens))
+            else:
+                pieces.append(sentence)
+        current = ""
+        for piece in pieces:
+            if current and estimate_tokens(current + " " + piece) > max_tokens:
+                chunks.append(Chunk(current, " "))
+                current = piece
+            else:
+                current = f"{current} {piece}" if current else piece
+        chunks.append(Chunk(current, "\n\n"))
+    return chunks
+
+
+def iter_chunks(chunks, process, workers=4):
+    """Run `process(chunk.text)` on a bounded pool; yields (chunk, output, error) in
+    input order as soon as each result and all earlier ones are ready. Workers run in a
+    copy of the caller's context (request timings, upstream priority)."""
+    if not chunks:
+        return
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(chunks)))) as pool:
+        futures = [pool.submit(contextvars.copy_context().run, process, chunk.text) for chunk in chunks]
+        for chunk, future in zip(chunks, futures):
+            try:
+                yield chunk, future.result(), None
+            except Exception as e:
+                yield chunk, None, e
+
+
+def join_chunks(parts) -> str:
+    """`parts` is a list of (chunk, output) pairs."""
+    return "".join(output + chunk.sep for chunk, output in parts).strip()
@@ -0,0 +1,45 @@
+"""Production launcher: several worker processes instead of the Flask debug server.
+
+    python serve.py                    # WSGI: gunicorn, threaded workers running talk:app
+    python serve.py --async            # ASGI: uvicorn workers running asgi:app
+    python serve.py --bind 0.0.0.0:8080 --workers 8
+
+Sync workers hold one thread per in-flight request, so size --threads for the
+expected number of concurrent uploads and model calls. In async mode a worker holds
+hundreds of in-flight Whisper/Groq calls on its event loop. Either way each worker
+opens its upstream connections as it starts, unless WARM_UP=0.
+"""
+import argparse, os
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--bind", default=os.getenv("BIND", "0.0.0.0:8000"), help="host:port")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", str(min(os.cpu_count() or 1, 4)))))
+    parser.add_argument("--threads", type=int, default=int(os.getenv("WEB_THREADS", "16")), help="threads per sync worker")
+    parser.add_argument("--async", dest="use_async", action="store_true", help="serve asgi:app with uvicorn")
+    args = parser.parse_args()
+    host, _, port = args.bind.rpartition(":")
+
+    if args.use_async:
+        import uvicorn
+        uvicorn.run("asgi:app", host=host or "0.0.0.0", port=int(port), workers=args.workers,
+                    lifespan="on", timeout_keep_alive=30, log_level="info")
+        return
+    # Long uploads and model calls: the default 30 s worker timeout is far too short.
+    os.execvp("gunicorn", [
+        "gunicorn", "talk:app", "--bind", args.bind, "--workers", str(args.workers),
+        "--worker-class", "gthread", "--threads", str(args.threads), "--timeout", "600",
+        "--config", "python:serve",
+    ])
+
+
+def post_worker_init(worker):
+    """gunicorn hook (this module is also its config): warm up each worker's clients."""
+    import services
+    if services.warm_up_enabled():
+        services.start_warm_up()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+"""Process-wide clients and agents, built on first use.
+
+Importing this module imports neither openai nor agno, and opens no connections.
+Each service is created once per process, under a lock. `warm_up()` builds them all
+and opens the upstream connections before the first request needs them."""
+import logging, os, threading, time
+
+log = logging.getLogger(__name__)
+
+ENHANCE_INSTRUCTIONS = [
+    "Fix grammar/tense, punctuation, and clarity. Keep meaning.",
+    "Return ONLY the improved text (no explanations).",
+]
+TRANSLATE_INSTRUCTIONS = [
+    "Translate English to the requested language.",
+    "If none specified, default to Spanish.",
+    "Return ONLY the translation.",
+]
+# One call that does both, for the transcribe → enhance → translate flow (talk.enhance_and_translate).
+PIPELINE_INSTRUCTIONS = [
+    "Fix grammar/tense, punctuation, and clarity of the English text. Keep meaning.",
+    "Then translate the improved text to the requested language.",
+    'Return ONLY a JSON object with the keys "enhanced" and "translation" (no explanations).',
+]
+# help.py's bulk pipeline asks for a more formal rewrite than the web app.
+BULK_ENHANCE_INSTRUCTIONS = [
+    "You are an expert language enhancement specialist. Your task is to improve the given text in the following ways:",
+    "",
+    "1. GRAMMAR & TENSE CORRECTION:",
+    "- Fix all grammatical errors including verb tenses, subject-verb agreement, and sentence structure",
+    "- Ensure proper punctuation and capitalization",
+    "",
+    "2. VOCABULARY ENHANCEMENT:",
+    "- Replace simple words with more sophisticated alternatives (e.g., 'good' → 'excellent', 'bad' → 'inadequate')",
+    "- Use more precise and descriptive language",
+    "- Replace casual expressions with formal equivalents (e.g., 'a lot of' → 'numerous', 'really' → 'considerably')",
+    "",
+    "3. SENTENCE STRUCTURE IMPROVEMENT:",
+    "- Combine choppy sentences into more fluid, complex sentences where appropriate",
+    "- Use varied sentence structures for better flow",
+    "- Add transitional phrases for better coherence",
+    "",
+    "4. FORMAL REGISTER:",
+    "- Convert casual speech patterns to formal written English",
+    "- Remove filler words and redundancies",
+    "- Maintain the original meaning while elevating the language level",
+    "",
+    "IMPORTANT: Return ONLY the enhanced text without any explanations, comments, or additional formatting.",
+    "The output should be ready to use as polished, professional text.",
+]
+BULK_TRANSLATE_INSTRUCTIONS = [
+    "You are a helpful assistant that translates English text into any language specified by the user.",
+    "When given a piece of text and a target language, provide an accurate translation in that language.",
+    "If the target language is not specified, default to translating into Spanish.",
+    "Ensure the translation maintains the original meaning and context of the text.",
+    "Respond only with the translated text, without any additional commentary or formatting.",
+]
+
+_lock = threading.RLock()
+_instances = {}
+
+
+def service(factory):
+    """Make `factory` a process-wide singleton named after it; returns its getter."""
+    name = factory.__name__
+
+    def get():
+        instance = _instances.get(name)
+        if instance is None:
+            with _lock:
+                instance = _instances.get(name)
+                if instance is None:
+                    instance = _instances[name] = factory()
+        return instance
+
+    get.__name__, get.__doc__ = name, factory.__doc__
+    return get
+
+
+def override(**instances):
+    """Use the given objects instead of building services, e.g. fakes for benchmarks."""
+    with _lock:
+        _instances.update({name: value for name, value in instances.items() if value is not None})
+
+
+def created(name):
+    """The service if it has been built, without building it."""
+    return _instances.get(name)
+
+
+def _agent(**kwargs):
+    from agno.agent import Agent
+    from agno.models.groq import Groq
+    # Retries are left to the upstream scheduler (upstream.py), not the SDK.
+    model = Groq(id=os.getenv("GROQ_MODEL", "llama-3.1-70b-versatile"), max_retries=0)
+    return Agent(model=model, show_tool_calls=False, markdown=False, stream=False, **kwargs)
+
+
+@service
+def openai_client():
+    from openai import OpenAI
+    return OpenAI(api_key=os.getenv("OPENAI_API_KEY"), max_retries=0)
+
+
+@service
+def enhance_agent():
+    return _agent(name="Language Enhancement Agent", role="Text Refiner and Grammar Corrector",
+                  instructions=ENHANCE_INSTRUCTIONS)
+
+
+@service
+def translate_agent():
+    return _agent(name="Translator", role="Translate English to requested language",
+                  instructions=TRANSLATE_INSTRUCTIONS)
+
+
+@service
+def pipeline_agent():
+    return _agent(name="Enhancer and Translator", role="Text Refiner and Translator",
+                  instructions=PIPELINE_INSTRUCTIONS)
+
+
+@service
+def bulk_enhance_agent():
+    return _agent(name="Language Enhancement Agent", role="Text Refiner and Grammar Corrector",
+                  instructions=BULK_ENHANCE_INSTRUCTIONS)
+
+
+@service
+def bulk_translate_agent():
+    return _agent(role="You are a translator and you translate english into any language asked",
+                  instructions=BULK_TRANSLATE_INSTRUCTIONS)
+
+
+def make_tts_pool(engine_factory=None):
+    from cache import BlobCache
+    from tts import TTSPool
+    return TTSPool(
+        BlobCache(
+            os.getenv("TTS_CACHE_DIR", os.path.join(".cache", "speech")),
+            max_bytes=int(os.getenv("TTS_CACHE_MAX_MB", "512")) * 1024 * 1024,
+        ),
+        workers=int(os.getenv("TTS_WORKERS", "2")),
+        engine_factory=engine_factory,
+    )
+
+
+@service
+def tts_pool():
+    return make_tts_pool()
+
+
+@service
+def transcoder():
+    from transcode import Transcoder
+    return Transcoder(tts_pool().cache, workers=int(os.getenv("TRANSCODE_WORKERS", "2")))
+
+
+def warm_up(agents=("enhance_agent", "translate_agent", "pipeline_agent"), whisper_model="whisper-1", tts=False):
+    """Build the OpenAI client and `agents`, and open a connection to each provider with
+    a cheap request. With `tts`, also start the speech workers. Failures are logged,
+    not raised; the first real request then pays the cost instead."""
+    started = time.perf_counter()
+    try:
+        openai_client().models.retrieve(whisper_model)
+    except Exception as e:
+        log.warning("warm-up: OpenAI: %s", e)
+    for name in agents:
+        try:
+            agent = globals()[name]()
+            get_client = getattr(getattr(agent, "model", None), "get_client", None)
+            if get_client is not None:
+                get_client().models.list()
+        except Exception as e:
+            log.warning("warm-up: %s: %s", name, e)
+    if tts:
+        try:
+            tts_pool().start()
+        except Exception as e:
+            log.warning("warm-up: TTS: %s", e)
+    seconds = time.perf_counter() - started
+    log.info("warm-up finished in %.2fs", seconds)
+    return seconds
+
+
+def warm_up_enabled():
+    return os.getenv("WARM_UP", "1") != "0"
+
+
+def start_warm_up(**kwargs):
+    """`warm_up` on a background thread, so startup is not delayed by it."""
+    thread = threading.Thread(target=warm_up, kwargs=kwargs, name="warm-up", daemon=True)
+    thread.start()
+    return thread
+
+
+def shutdown():
+    for name in ("transcoder", "tts_pool"):
+        instance = created(name)
+        if instance is not None:
+            instance.shutdown()
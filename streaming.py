@@ -0,0 +1,92 @@
+"""Helpers for streaming model output to the browser as Server-Sent Events."""
+import inspect, json
+
+OPEN, CLOSE = "<think>", "</think>"
+
+
+def _partial_suffix(text: str, tag: str) -> int:
+    """Length of the longest suffix of `text` that could be the start of `tag`."""
+    for k in range(min(len(tag) - 1, len(text)), 0, -1):
+        if text.endswith(tag[:k]):
+            return k
+    return 0
+
+
+class ThinkStripper:
+    """Incremental version of `clean_output`: drops <think>...</think> blocks and the
+    surrounding leading/trailing whitespace while text is still arriving. Only an open
+    think block or a possibly-partial tag is held back, never the whole response."""
+
+    def __init__(self):
+        self._buf = ""
+        self._think = None
+        self._started = False
+        self._ws = ""
+
+    def feed(self, chunk: str) -> str:
+        self._buf += chunk
+        out = []
+        while self._buf:
+            if self._think is None:
+                i = self._buf.find(OPEN)
+                if i == -1:
+                    keep = _partial_suffix(self._buf, OPEN)
+                    out.append(self._buf[:len(self._buf) - keep])
+                    self._buf = self._buf[len(self._buf) - keep:]
+                    break
+                out.append(self._buf[:i])
+                self._buf = self._buf[i + len(OPEN):]
+                self._think = OPEN
+            else:
+                j = self._buf.find(CLOSE)
+                if j == -1:
+                    keep = _partial_suffix(self._buf, CLOSE)
+                    self._think += self._buf[:len(self._buf) - keep]
+                    self._buf = self._buf[len(self._buf) - keep:]
+                    break
+                self._buf = self._buf[j + len(CLOSE):]
+                self._think = None
+        return self._emit("".join(out))
+
+    def finish(self) -> str:
+        """Flush what is left; an unclosed <think> block is kept, as `clean_output` does."""
+        rest = (self._think or "") + self._buf
+        self._think, self._buf = None, ""
+        out = self._emit(rest)
+        self._ws = ""
+        return out
+
+    def _emit(self, text: str) -> str:
+        if not self._started:
+            text = text.lstrip()
+            if not text:
+                return ""
+            self._started = True
+        text = self._ws + text
+        kept = text.rstrip()
+        self._ws = text[len(kept):]
+        return kept
+
+
+def sse(event: str, **data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def stream_agent(agent, prompt):
+    """Yield the text deltas of a streaming agent run."""
+    for chunk in agent.run(prompt, stream=True):
+        piece = getattr(chunk, "content", None)
+        if isinstance(piece, str) and piece:
+            yield piece
+
+
+async def astream_agent(agent, prompt):
+    """`stream_agent` over `agent.arun`, which returns the async iterator either directly
+    or from a coroutine depending on the agno version."""
+    chunks = agent.arun(prompt, stream=True)
+    if inspect.isawaitable(chunks):
+        chunks = await chunks
+    async for chunk in chunks:
+        piece = getattr(chunk, "content", None)
+        if isinstance(piece, str) and piece:
+            yield piece
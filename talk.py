@@ -1,47 +1,418 @@
 
 
-from flask import Flask, request, render_template_string, send_file, after_this_request
-from openai import OpenAI
-import os, re, uuid, tempfile
+from flask import Flask, Response, g, has_request_context, redirect, request, send_file, jsonify, stream_with_context
+import contextvars, os, re, hashlib, json, secrets, shutil, sqlite3, tempfile, time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from urllib.parse import urlencode
 from dotenv import load_dotenv
-from agno.agent import Agent
-from agno.models.groq import Groq
+from cache import ResultCache, BlobCache, cache_key
+from history import END_MARK, MARK, HistoryStore
+from transmem import TranslationMemory, parse_list
+import audio
+from longaudio import transcribe_long
+from jobs import STAGES, JobStore, JobRunner, make_backend
+from streaming import ThinkStripper, sse, stream_agent
+from batch import fan_out, packed_prompt, parse_packed
+from segment import chunk_text, iter_chunks, join_chunks, split_sentences
+from assets import Asset, MIN_COMPRESS_BYTES, compress, negotiate_encoding
+from uploads import UploadRequest, on_disk
+from werkzeug.exceptions import RequestEntityTooLarge, UnsupportedMediaType
+import metrics
+import preprocess
+import services
+import transcode
+import upstream
+from metrics import REGISTRY, stage
+from services import enhance_agent, openai_client, pipeline_agent, transcoder, translate_agent, tts_pool
 
 
 
 app = Flask(__name__)
 load_dotenv()
-openai_client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-
-
-enhance_agent = Agent(
-    name="Language Enhancement Agent",
-    role="Text Refiner and Grammar Corrector",
-    model=Groq(id=os.getenv("GROQ_MODEL", "llama-3.1-70b-versatile")),
-    instructions=[
-        "Fix grammar/tense, punctuation, and clarity. Keep meaning.",
-        "Return ONLY the improved text (no explanations)."
-    ],
-    show_tool_calls=False, markdown=False, stream=False
+# Uploads are streamed into a bounded buffer (see uploads.py) instead of being saved
+# under their user-supplied name in the working directory.
+app.request_class = UploadRequest
+app.config["MAX_CONTENT_LENGTH"] = int(float(os.getenv("MAX_UPLOAD_MB", "200")) * 1024 * 1024)
+app.config["UPLOAD_SPOOL_BYTES"] = int(float(os.getenv("UPLOAD_SPOOL_MB", "4")) * 1024 * 1024)
+app.config["UPLOAD_TMP_DIR"] = os.getenv("UPLOAD_TMP_DIR") or os.path.join(tempfile.gettempdir(), "eduspeak-uploads")
+os.makedirs(app.config["UPLOAD_TMP_DIR"], exist_ok=True)
+result_cache = ResultCache(
+    max_entries=int(os.getenv("RESULT_CACHE_SIZE", "1024")),
+    ttl=float(os.getenv("RESULT_CACHE_TTL", "86400")),
+    path=os.getenv("RESULT_CACHE_DB") or None,
 )
-
-translate_agent = Agent(
-    name="Translator",
-    role="Translate English to requested language",
-    model=Groq(id=os.getenv("GROQ_MODEL", "llama-3.1-70b-versatile")),
-    instructions=[
-        "Translate English to the requested language.",
-        "If none specified, default to Spanish.",
-        "Return ONLY the translation."
-    ],
-    show_tool_calls=False, markdown=False, stream=False
+transcript_cache = BlobCache(
+    os.getenv("TRANSCRIPT_CACHE_DIR", os.path.join(".cache", "transcripts")),
+    max_bytes=int(os.getenv("TRANSCRIPT_CACHE_MAX_MB", "256")) * 1024 * 1024,
+)
+# Results handed from one page to the next (e.g. enhanced text to /translate) by id.
+text_store = BlobCache(
+    os.getenv("TEXT_STORE_DIR", os.path.join(".cache", "texts")),
+    max_bytes=int(os.getenv("TEXT_STORE_MAX_MB", "64")) * 1024 * 1024,
 )
+# Every result shown to a user, kept for their history page and for reuse.
+history = HistoryStore(os.getenv("HISTORY_DB", os.path.join(".cache", "history.db")))
+HISTORY_PAGE_SIZE = int(os.getenv("HISTORY_PAGE_SIZE", "20"))
+USER_COOKIE = "eduspeak_user"
+# Sentence translations per language, served again for repeated sentences (transmem.py).
+TRANSLATION_MEMORY = os.getenv("TRANSLATION_MEMORY", "1") != "0"
+translation_memory = TranslationMemory(os.getenv("TRANSLATION_MEMORY_DB", os.path.join(".cache", "translation-memory.db")))
+if os.getenv("GLOSSARY_FILE"):
+    translation_memory.load_glossary(os.getenv("GLOSSARY_FILE"))
+
+def configure(openai_client=None, enhance_agent=None, translate_agent=None, pipeline_agent=None,
+              tts_engine_factory=None):
+    """Swap in other implementations of the hosted services, e.g. the fakes in bench/.
+    Agents need `.name`, `.model.id`, `.instructions` and `.run(prompt, stream=False)`;
+    `tts_engine_factory` must be picklable (it runs in the TTS worker processes)."""
+    services.override(openai_client=openai_client, enhance_agent=enhance_agent, translate_agent=translate_agent,
+                      pipeline_agent=pipeline_agent)
+    if tts_engine_factory is not None:
+        if services.created("tts_pool") is not None:
+            tts_pool().shutdown()
+        services.override(tts_pool=services.make_tts_pool(tts_engine_factory))
+
+WHISPER_MODEL = "whisper-1"
+LANGUAGES = [
+    "Spanish", "French", "German", "Hindi", "Urdu", "Bengali", "Punjabi", "Arabic", "Turkish",
+    "Portuguese", "Chinese (Simplified)", "Tamil", "Gujarati", "Polish", "Ukrainian", "Swahili",
+]
+BATCH_TRANSLATE_CONCURRENCY = int(os.getenv("BATCH_TRANSLATE_CONCURRENCY", "4"))
+BATCH_PACK_MAX_CHARS = int(os.getenv("BATCH_PACK_MAX_CHARS", "2000"))
+BATCH_MAX_LANGS = 20
+LONG_TEXT_CHUNK_TOKENS = int(os.getenv("LONG_TEXT_CHUNK_TOKENS", "800"))
+LONG_TEXT_WORKERS = int(os.getenv("LONG_TEXT_WORKERS", "4"))
+LONG_AUDIO_MIN_MB = float(os.getenv("LONG_AUDIO_MIN_MB", "20"))
+LONG_AUDIO_WORKERS = int(os.getenv("LONG_AUDIO_WORKERS", "4"))
+LONG_AUDIO_SEGMENT_S = float(os.getenv("LONG_AUDIO_SEGMENT_S", "300"))
+SPEECH_STREAM_RATE = int(os.getenv("SPEECH_STREAM_RATE", "22050"))
 
 def clean_output(text: str) -> str:
     if not isinstance(text, str):
         text = str(text)
     return re.sub(r"<think>.*?</think>", "", text, flags=re.DOTALL).strip()
 
+def wants_cache() -> bool:
+    """Requests can skip cached results with ?nocache=1 or Cache-Control: no-cache."""
+    if (request.values.get("nocache") or "").lower() in ("1", "true", "yes", "on"):
+        return False
+    return "no-cache" not in (request.headers.get("Cache-Control") or "").lower()
+
+def save_text(text: str) -> str:
+    """Keep `text` server-side; returns the id a later step can post as `result`."""
+    result_id = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    if text_store.lookup(result_id) is None:
+        text_store.set(result_id, text.encode("utf-8"))
+    return result_id
+
+def load_text(result_id):
+    if not re.fullmatch(r"[0-9a-f]{64}", result_id or ""):
+        return None
+    data = text_store.get(result_id)
+    return data.decode("utf-8") if data is not None else None
+
+def submitted_text() -> str:
+    """The posted `text`, or else the text saved earlier under the posted `result` id."""
+    text = (request.form.get("text") or "").strip()
+    if not text and request.values.get("result"):
+        text = load_text(request.values["result"]) or ""
+    return text
+
+def history_user() -> str:
+    """This browser's anonymous history id; a new one goes out as a cookie with the response."""
+    user = request.cookies.get(USER_COOKIE, "")
+    if re.fullmatch(r"[0-9a-f]{32}", user):
+        return user
+    if "new_user" not in g:
+        g.new_user = secrets.token_hex(16)
+    return g.new_user
+
+@app.after_request
+def set_user_cookie(resp):
+    if g.get("new_user"):
+        resp.set_cookie(USER_COOKIE, g.new_user, max_age=2 * 365 * 24 * 3600, httponly=True, samesite="Lax")
+    return resp
+
+def stored_result(key, use_cache=True):
+    """The newest history entry made under `key` (an agent or transcript key), so a
+    repeated request needs no model call; None if there is none."""
+    entry = history.lookup(key) if use_cache else None
+    if entry:
+        HISTORY_REUSED.inc(kind=entry["kind"])
+    return entry
+
+def remember(user, kind, source, enhanced=None, translation=None, lang=None, key=None):
+    """Add a result to `user`'s history. Pass `key` only for complete results, as those
+    are reused. Saving never fails the request; errors are logged."""
+    try:
+        return history.add(user, kind, source, enhanced, translation, lang, key)
+    except sqlite3.Error as e:
+        app.logger.warning("history: could not save %s result: %s", kind, e)
+        return None
+
+# The history field that holds each agent's output, by agent_stage.
+HISTORY_FIELDS = {"enhance": "enhanced", "translate": "translation"}
+
+def remember_output(user, agent, text, output, lang=None, key=None):
+    """`remember` for an output of the enhance or translate agent."""
+    kind = agent_stage(agent)
+    return remember(user, kind, text, lang=lang, key=key, **{HISTORY_FIELDS[kind]: output})
+
+def agent_key(agent, text, lang=None) -> str:
+    """Cache and history key of `agent`'s answer for `text`. The language's glossary
+    version is part of it, so changing a term retires the answers made before."""
+    glossary = translation_memory.glossary_version(lang) if lang else ""
+    return cache_key(agent.name, getattr(agent.model, "id", None), agent.instructions, text,
+                     f"{lang} [glossary {glossary}]" if glossary else lang)
+
+AGENT_STAGES = {"enhance_agent": "enhance", "translate_agent": "translate", "pipeline_agent": "enhance_translate"}
+
+def agent_stage(agent) -> str:
+    """The metrics stage of `agent`, found among the agents already built (building none)."""
+    for name, stage_name in AGENT_STAGES.items():
+        if services.created(name) is agent:
+            return stage_name
+    return "agent"
+
+def agent_output(agent, prompt) -> str:
+    with stage(agent_stage(agent)):
+        raw = upstream.for_agent(agent).call(agent.run, prompt)
+    with stage("clean_output"):
+        return clean_output(getattr(raw, "content", None) or getattr(raw, "text", None) or str(raw))
+
+def run_agent(agent, prompt, text, lang=None, use_cache=True) -> str:
+    """Run `agent` on `prompt`, reusing an earlier answer for the same text/language."""
+    key = agent_key(agent, text, lang)
+    return result_cache.get_or_compute(key, lambda: agent_output(agent, prompt), use_cache=use_cache)
+
+def process_text(agent, text, make_prompt, lang=None, use_cache=True):
+    """Run `agent` over `text`. Input over LONG_TEXT_CHUNK_TOKENS is split into
+    paragraph/sentence chunks that run concurrently and are cached one by one.
+    Returns (output, failed chunk count); failed chunks keep their original text."""
+    chunks = chunk_text(text, LONG_TEXT_CHUNK_TOKENS)
+    if len(chunks) <= 1:
+        return run_agent(agent, make_prompt(text), text, lang=lang, use_cache=use_cache), 0
+    parts, errors = [], []
+    process = lambda part: run_agent(agent, make_prompt(part), part, lang=lang, use_cache=use_cache)
+    for chunk, output, error in iter_chunks(chunks, process, LONG_TEXT_WORKERS):
+        if error is not None:
+            errors.append(error)
+            output = chunk.text
+        parts.append((chunk, output))
+    if len(errors) == len(chunks):
+        raise errors[0]
+    return join_chunks(parts), len(errors)
+
+def enhance_text(text, use_cache=True):
+    return process_text(enhance_agent(), text, lambda part: part, use_cache=use_cache)
+
+def translate_text(text, lang, use_cache=True):
+    """Translate `text`, through the translation memory when it is on. Returns
+    (translation, failed part count); failed parts keep their original text."""
+    if not TRANSLATION_MEMORY:
+        return process_text(translate_agent(), text, lambda part: translate_prompt(part, lang), lang=lang, use_cache=use_cache)
+    plan = memory_plan(text, lang, use_cache)
+    pieces, errors = [], []
+    for piece, piece_errors in memory_pieces(plan, lang):
+        pieces.append(piece)
+        errors.extend(piece_errors)
+    if errors and len(errors) == len(plan.segments):
+        raise errors[0]
+    return "".join(pieces).strip(), len(errors)
+
+def memory_plan(text, lang, use_cache=True):
+    """translation_memory.plan, timed and counted in the metrics."""
+    with stage("translation_memory"):
+        plan = translation_memory.plan(lang, text, LONG_TEXT_CHUNK_TOKENS, use_memory=use_cache)
+    if use_cache:
+        label = lang if lang in LANGUAGES else "other"
+        for match, count in (("hit", plan.hits), ("miss", sum(map(len, plan.batches)))):
+            if count:
+                MEMORY_SEGMENTS.inc(count, lang=label, match=match)
+    return plan
+
+def translate_segments(sources, lang, terms=()):
+    """Translations of `sources`, from one model call; one call each if the answer
+    does not list them all."""
+    agent = translate_agent()
+    if len(sources) > 1:
+        found = parse_list(agent_output(agent, segments_prompt(sources, lang, terms)), len(sources))
+        if found:
+            return found
+        MEMORY_FALLBACKS.inc()
+    return [agent_output(agent, translate_prompt(source, lang, terms)) for source in sources]
+
+def learn_translations(lang, sources, translations):
+    try:
+        translation_memory.learn(lang, zip(sources, translations))
+    except sqlite3.Error as e:
+        app.logger.warning("translation memory: could not save %d segments: %s", len(sources), e)
+    return dict(zip(sources, translations))
+
+def memory_pieces(plan, lang):
+    """Yield (text, errors) pieces of the translation in order. Known segments come
+    at once; unseen ones are translated in concurrent batches, and each piece ends
+    where the next segment's batch is still running."""
+    def process(sources):
+        return learn_translations(lang, sources, translate_segments(sources, lang, plan.terms))
+
+    with ThreadPoolExecutor(max_workers=max(1, min(LONG_TEXT_WORKERS, len(plan.batches)))) as pool:
+        futures = {}
+        for batch in plan.batches:
+            future = pool.submit(contextvars.copy_context().run, process, batch)
+            futures.update((source, future) for source in batch)
+        piece, errors = "", []
+        for segment in plan.segments:
+            if segment.source in plan.known:
+                out = plan.known[segment.source]
+            else:
+                future = futures[segment.source]
+                if piece and not future.done():
+                    yield piece, errors
+                    piece, errors = "", []
+                try:
+                    out = future.result()[segment.source]
+                except Exception as e:
+                    out = segment.source
+                    errors.append(e)
+            piece += out + segment.sep
+        if piece:
+            yield piece, errors
+
+def enhance_translate_part(text, lang, use_cache=True):
+    """(enhanced, translation) of one chunk from a single model call. An answer without
+    both fields is not cached, and the chunk falls back to the enhance and translate agents."""
+    agent = pipeline_agent()
+
+    def compute():
+        found = parse_packed(agent_output(agent, combined_prompt(text, lang)), COMBINED_KEYS)
+        return json.dumps(found) if len(found) == len(COMBINED_KEYS) else None
+
+    found = result_cache.get_or_compute(agent_key(agent, text, lang), compute, use_cache=use_cache)
+    if found:
+        found = json.loads(found)
+        return found["enhanced"], found["translation"]
+    PIPELINE_FALLBACKS.inc()
+    enhanced = run_agent(enhance_agent(), text, text, use_cache=use_cache)
+    return enhanced, run_agent(translate_agent(), translate_prompt(enhanced, lang), enhanced, lang=lang, use_cache=use_cache)
+
+def enhance_and_translate(text, lang, use_cache=True):
+    """Enhance `text` and translate the result with one model call per chunk, not two.
+    Returns (enhanced, translation, failed chunk count); failed chunks keep their
+    original text in both."""
+    chunks = chunk_text(text, LONG_TEXT_CHUNK_TOKENS)
+    if len(chunks) <= 1:
+        return (*enhance_translate_part(text, lang, use_cache), 0)
+    enhanced, translated, errors = [], [], []
+    process = lambda part: enhance_translate_part(part, lang, use_cache)
+    for chunk, output, error in iter_chunks(chunks, process, LONG_TEXT_WORKERS):
+        if error is not None:
+            errors.append(error)
+            output = (chunk.text, chunk.text)
+        enhanced.append((chunk, output[0]))
+        translated.append((chunk, output[1]))
+    if len(errors) == len(chunks):
+        raise errors[0]
+    return join_chunks(enhanced), join_chunks(translated), len(errors)
+
+def save_upload(file, path):
+    """Copy an upload to `path`; returns (sha256, size, container kind) as measured
+    while the upload was received."""
+    file.stream.seek(0)
+    with open(path, "wb") as out:
+        shutil.copyfileobj(file.stream, out, 1024 * 1024)
+    return file.stream.digest, file.stream.size, file.stream.kind
+
+def transcript_key(digest: str) -> str:
+    return hashlib.sha256(f"{WHISPER_MODEL}:{digest}".encode()).hexdigest()
+
+def whisper_client():
+    """openai_client with transcriptions rate limited, retried and circuit broken."""
+    return upstream.scheduled_client(openai_client(), upstream.get("openai", WHISPER_MODEL))
+
+def report_upload(received, sent, trimmed_ms=0):
+    """Count the bytes sent to Whisper for `received` bytes of upload, and keep a line
+    about it for the page that shows the transcript."""
+    WHISPER_AUDIO_BYTES.inc(received, side="received")
+    WHISPER_AUDIO_BYTES.inc(sent, side="sent")
+    if has_request_context():
+        try:
+            client_bytes = int(request.form.get("client_original_bytes") or 0)
+        except ValueError:
+            client_bytes = 0
+        g.upload_report = preprocess.summary(received, sent, trimmed_ms, client_bytes)
+
+def whisper_upload(stream, kind, size):
+    """(file name, contents) to send to Whisper for an upload: shrunk by preprocess.py
+    when that makes it smaller, otherwise the upload as it is."""
+    with stage("preprocess"), on_disk(stream, app.config["UPLOAD_TMP_DIR"], f".{kind}") as path:
+        shrunk = preprocess.shrink(path, size)
+    if shrunk is not None:
+        report_upload(size, shrunk.sent_bytes, shrunk.original_ms - shrunk.sent_ms)
+        return f"upload.{shrunk.kind}", shrunk.payload
+    report_upload(size, size)
+    stream.seek(0)
+    return f"upload.{kind or 'wav'}", stream
+
+def whisper_transcribe(stream, kind, size, long_mode=False):
+    """Transcribe an open audio file of container `kind`; returns (transcript, notice about gaps or None)."""
+    if long_mode or size > LONG_AUDIO_MIN_MB * 1024 * 1024:
+        # The PCM of a long upload is decoded to a memory-mapped temporary file, not into RAM.
+        with ExitStack() as files:
+            with stage("decode"):
+                path = files.enter_context(on_disk(stream, app.config["UPLOAD_TMP_DIR"], f".{kind}"))
+                pcm = files.enter_context(audio.decoded(path, tmp_dir=app.config["UPLOAD_TMP_DIR"]))
+                trimmed = preprocess.trim(pcm)
+            with stage("whisper"):
+                result = transcribe_long(
+                    whisper_client(), trimmed, workers=LONG_AUDIO_WORKERS, model=WHISPER_MODEL, retries=0,
+                    segment_s=LONG_AUDIO_SEGMENT_S, encode=preprocess.encode
+                )
+            trimmed_ms = audio.duration_ms(pcm) - audio.duration_ms(trimmed)
+            del trimmed
+        report_upload(size, sum(s["bytes"] for s in result.segments), trimmed_ms)
+        notice = None
+        if result.failed:
+            notice = f"{result.failed} of {len(result.segments)} segments could not be transcribed; gaps are marked […]."
+        return result.text, notice
+    name, payload = whisper_upload(stream, kind, size)
+    with stage("whisper"):
+        whisper_out = whisper_client().audio.transcriptions.create(
+            model=WHISPER_MODEL, file=(name, payload), response_format="text", temperature=0
+        )
+    return str(whisper_out), None
+
+def glossary_prompt(terms) -> str:
+    if not terms:
+        return ""
+    return "Use these translations for these terms:\n" + "".join(f"- {term} → {translation}\n" for term, translation in terms) + "\n"
+
+def translate_prompt(text: str, lang: str, terms=None) -> str:
+    """`terms` are the glossary entries to spell out; by default those found in `text`."""
+    if terms is None:
+        terms = translation_memory.terms_in(lang, [text])
+    return f"{glossary_prompt(terms)}Translate the following English text to {lang}:\n\n{text}"
+
+def segments_prompt(sources, lang: str, terms=()) -> str:
+    numbered = "".join(f"{i}. {source}\n" for i, source in enumerate(sources, 1))
+    return (
+        f"Translate each numbered English sentence below to {lang}.\n"
+        f"Return ONLY a JSON array of the {len(sources)} translations, in the same order. "
+        "No numbers, commentary or code fences.\n\n"
+        f"{glossary_prompt(terms)}{numbered}"
+    )
+
+COMBINED_KEYS = ("enhanced", "translation")
+
+def combined_prompt(text: str, lang: str) -> str:
+    return glossary_prompt(translation_memory.terms_in(lang, [text])) + (
+        f"Improve the following English text, then translate the improved text to {lang}.\n"
+        'Return ONLY a JSON object {"enhanced": "<improved English>", "translation": "<translation>"}. '
+        "No commentary, no code fences.\n\n"
+        f"{text}"
+    )
+
 def h(text: str) -> str:
     """Basic HTML escape for safe rendering inside <div>."""
     text = text or ""
@@ -54,8 +425,72 @@ def h(text: str) -> str:
     )
 
 
-def render_page(content, title, active_page, **kwargs):
-    template = """
+# ---------- Metrics ----------
+HTTP_SECONDS = REGISTRY.histogram("eduspeak_http_request_seconds", "Time to produce a response (excludes streamed bodies).")
+HTTP_REQUESTS = REGISTRY.counter("eduspeak_http_requests_total", "Requests by endpoint and status code.")
+HTTP_BYTES_IN = REGISTRY.counter("eduspeak_http_request_bytes_total", "Request body bytes received.")
+HTTP_BYTES_OUT = REGISTRY.counter("eduspeak_http_response_bytes_total", "Response body bytes sent (after compression).")
+TTS_FIRST_AUDIO = REGISTRY.histogram(
+    "eduspeak_tts_first_audio_seconds", "Time from a /speak/stream request to its first sentence of audio."
+)
+WHISPER_AUDIO_BYTES = REGISTRY.counter(
+    "eduspeak_whisper_audio_bytes_total", "Audio bytes received in uploads and sent to Whisper after pre-processing."
+)
+HISTORY_REUSED = REGISTRY.counter(
+    "eduspeak_history_reused_total", "Requests answered from a result saved in the history, by the kind of entry."
+)
+MEMORY_SEGMENTS = REGISTRY.counter(
+    "eduspeak_translation_memory_segments_total", "Sentences looked up in the translation memory, by language and match (hit, miss)."
+)
+MEMORY_FALLBACKS = REGISTRY.counter(
+    "eduspeak_translation_memory_fallbacks_total", "Batched sentence translations that could not be parsed and were redone one by one."
+)
+PIPELINE_FALLBACKS = REGISTRY.counter(
+    "eduspeak_pipeline_fallbacks_total", "Combined enhance+translate answers that could not be parsed and were redone as two calls."
+)
+
+def cache_gauge(field):
+    def read():
+        caches = {"results": result_cache.stats(), "transcripts": transcript_cache.stats(), "speech": tts_pool().cache.stats()}
+        return {(("cache", name),): stats[field] for name, stats in caches.items()}
+    return read
+
+REGISTRY.gauge_callback("eduspeak_cache_hit_ratio", "Cache hits / lookups since start.", cache_gauge("hit_ratio"))
+REGISTRY.gauge_callback("eduspeak_cache_hits", "Cache hits since start.", cache_gauge("hits"))
+REGISTRY.gauge_callback("eduspeak_cache_misses", "Cache misses since start.", cache_gauge("misses"))
+
+@app.before_request
+def start_timing():
+    g.started = time.perf_counter()
+    metrics.start_request()
+
+# Registered before compress_html, so it runs after it and sees the final body size.
+@app.after_request
+def record_request(resp):
+    endpoint = request.endpoint or "unknown"
+    HTTP_SECONDS.observe(time.perf_counter() - g.get("started", time.perf_counter()), endpoint=endpoint)
+    HTTP_REQUESTS.inc(endpoint=endpoint, status=resp.status_code)
+    if request.content_length:
+        HTTP_BYTES_IN.inc(request.content_length, endpoint=endpoint)
+    if resp.content_length:
+        HTTP_BYTES_OUT.inc(resp.content_length, endpoint=endpoint)
+    timing = metrics.server_timing()
+    if timing:
+        resp.headers["Server-Timing"] = timing
+    return resp
+
+@app.route("/metrics")
+def metrics_endpoint():
+    return Response(REGISTRY.exposition(), mimetype="text/plain; version=0.0.4")
+
+# Page shell: compiled once at import; the stylesheet is a fingerprinted static asset
+# so browsers cache it for good instead of receiving it inline with every page.
+CSS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static", "eduspeak.css")
+CSS_ASSET = Asset.from_file(CSS_PATH, "text/css")
+ASSETS = {CSS_ASSET.fingerprinted(CSS_PATH): CSS_ASSET}
+CSS_URL = "/assets/" + CSS_ASSET.fingerprinted(CSS_PATH)
+
+PAGE_SHELL = """
 <!DOCTYPE html>
 <html lang="en">
 <head>
@@ -64,70 +499,7 @@ def render_page(content, title, active_page, **kwargs):
 <title>{{ title }} | EduSpeak AI</title>
 <link href="https://fonts.googleapis.com/css2?family=Plus+Jakarta+Sans:wght@400;600;800&display=swap" rel="stylesheet">
 <link href="https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.5.0/css/all.min.css" rel="stylesheet">
-<style>
-:root{
-  --bg:#f6f8ff;              /* light background */
-  --ink:#0f172a;             /* dark text */
-  --muted:#4b5563;           /* secondary text */
-  --card:#ffffff;            /* card surface */
-  --line:#e5e7eb;            /* hairline */
-  --primary:#6366f1;         /* indigo */
-  --accent:#10b981;          /* green */
-  --grad:linear-gradient(135deg, #7c8cfb, #6ee7b7);
-  --shadow:0 8px 30px rgba(17,24,39,.08);
-}
-*{box-sizing:border-box}
-html,body{height:100%}
-body{
-  margin:0; color:var(--ink); background:
-    radial-gradient(1200px 600px at 10% 10%,rgba(124,140,251,.15),transparent 60%),
-    radial-gradient(800px 500px at 90% 0%,rgba(110,231,183,.10),transparent 60%),
-    var(--bg);
-  font-family:'Plus Jakarta Sans', system-ui, -apple-system, Segoe UI, Roboto, Arial, sans-serif;
-}
-/* NAV */
-.nav{position:fixed; inset:0 0 auto 0; z-index:50; background:rgba(255,255,255,.85); backdrop-filter:blur(12px); border-bottom:1px solid var(--line)}
-.wrap{max-width:1100px; margin:0 auto; display:flex; align-items:center; justify-content:space-between; padding:12px 18px}
-.brand{display:flex; gap:.7rem; align-items:center; text-decoration:none; color:var(--ink); font-weight:800}
-.badge{width:38px; height:38px; border-radius:12px; background:var(--grad); display:grid; place-items:center; color:white; box-shadow:var(--shadow)}
-.links a{color:var(--muted); text-decoration:none; padding:.55rem .9rem; border-radius:12px}
-.links a:hover, .links a.active{background:#eef2ff; color:#3730a3}
-/* MAIN */
-main{padding:92px 16px 40px}
-.container{max-width:1100px; margin:0 auto}
-.card{background:var(--card); border:1px solid var(--line); border-radius:16px; box-shadow:var(--shadow); padding:22px}
-.btn{border:0; border-radius:12px; padding:.9rem 1.2rem; font-weight:700; cursor:pointer; display:inline-flex; gap:.6rem; align-items:center; transition:.2s}
-.btn-primary{background:var(--grad); color:#fff; box-shadow:0 8px 24px rgba(99,102,241,.25)}
-.btn-outline{background:#fff; color:#3730a3; border:2px solid #e0e7ff}
-.btn-success{background:linear-gradient(135deg,#22c55e,#60a5fa); color:#fff}
-.btn:active{transform:translateY(1px)}
-/* HERO (simplified, no code window) */
-.hero{display:grid; grid-template-columns:1.2fr .8fr; gap:22px; align-items:center}
-.hero .left{padding:8px}
-.kicker{display:inline-flex; gap:.5rem; align-items:center; color:#2563eb; background:#e0f2fe; border:1px solid #bfdbfe; padding:.35rem .65rem; border-radius:999px; font-weight:700; font-size:.85rem}
-.title{font-size:clamp(34px,6vw,56px); line-height:1.05; margin:.3rem 0; color:#0f172a}
-.subtitle{color:var(--muted); font-size:1.05rem; max-width:55ch}
-.hero .right{display:grid; gap:14px}
-.snapshot{background:var(--card); border:1px solid var(--line); border-radius:16px; padding:18px; box-shadow:var(--shadow)}
-.snapshot h4{margin:0 0 8px 0}
-.statgrid{display:grid; grid-template-columns:repeat(4,1fr); gap:12px; margin:18px 0}
-.stat{background:#fff; border:1px solid var(--line); border-radius:14px; padding:16px; text-align:center; box-shadow:var(--shadow)}
-.stat .num{font-weight:800; font-size:1.6rem}
-/* Features */
-.features{display:grid; grid-template-columns:repeat(auto-fit,minmax(240px,1fr)); gap:14px}
-.feature{background:#fff; border:1px solid var(--line); border-radius:14px; padding:16px; box-shadow:var(--shadow)}
-.iconbox{width:44px; height:44px; border-radius:10px; background:var(--grad); display:grid; place-items:center; color:#fff}
-/* Forms */
-.input, textarea, select{width:100%; background:#fff; border:1px solid var(--line); color:var(--ink); border-radius:12px; padding:12px; font-family:inherit}
-textarea{min-height:110px}
-.textbox{white-space:pre-wrap; background:#fff; border:1px solid var(--line); border-radius:12px; padding:12px; font-family:ui-monospace, SFMono-Regular, Menlo, Monaco, "JetBrains Mono", monospace; max-height:380px; overflow:auto}
-.textbox.ok{border-color:#86efac; background:#f0fdf4}
-.grid{display:grid; gap:14px}
-.grid-2{grid-template-columns:repeat(auto-fit,minmax(360px,1fr))}
-.err{background:#fef2f2; border:1px solid #fecaca; padding:10px 12px; border-radius:12px; color:#991b1b}
-.footer{margin-top:30px; color:var(--muted); text-align:center}
-@media (max-width:980px){ .hero{grid-template-columns:1fr} .statgrid{grid-template-columns:repeat(2,1fr)} }
-</style>
+<link href="{{ css_url }}" rel="stylesheet">
 </head>
 <body>
   <nav class="nav">
@@ -142,6 +514,7 @@ textarea{min-height:110px}
         <a href="/enhance" class="{{ 'active' if active_page=='enhance' else '' }}">Enhance</a>
         <a href="/translate" class="{{ 'active' if active_page=='translate' else '' }}">Translate</a>
         <a href="/speak" class="{{ 'active' if active_page=='speak' else '' }}">Speech</a>
+        <a href="/history" class="{{ 'active' if active_page=='history' else '' }}">History</a>
       </div>
     </div>
   </nav>
@@ -151,18 +524,158 @@ textarea{min-height:110px}
 </body>
 </html>
 """
-    return render_template_string(
-        template,
-        title=title,
-        active_page=active_page,
-        content=content,
-        **kwargs
+PAGE_TEMPLATE = app.jinja_env.from_string(PAGE_SHELL)
+
+def render_page(content, title, active_page, **kwargs):
+    with stage("render_page"):
+        return PAGE_TEMPLATE.render(
+            title=title,
+            active_page=active_page,
+            content=content,
+            css_url=CSS_URL,
+            **kwargs
+        )
+
+@app.route("/assets/<name>")
+def asset(name):
+    found = ASSETS.get(name)
+    if found is None:
+        return "Not found", 404
+    return found.response(app.response_class, request, "public, max-age=31536000, immutable")
+
+@app.after_request
+def compress_html(resp):
+    """gzip/brotli for dynamic HTML; pre-built assets and streams are left alone."""
+    if (
+        resp.mimetype != "text/html" or resp.status_code != 200 or resp.is_streamed
+        or resp.direct_passthrough or "Content-Encoding" in resp.headers
+    ):
+        return resp
+    body = resp.get_data()
+    encoding = negotiate_encoding(request.headers.get("Accept-Encoding"))
+    resp.vary.add("Accept-Encoding")
+    if encoding == "identity" or len(body) < MIN_COMPRESS_BYTES:
+        return resp
+    resp.set_data(compress(body, encoding))
+    resp.headers["Content-Encoding"] = encoding
+    return resp
+
+# Progressive enhancement for forms with data-stream: POST to the SSE endpoint and
+# append text to the #live box as it arrives. Without JS the form posts normally.
+STREAM_JS = r"""
+<script>
+document.querySelectorAll('form[data-stream]').forEach(function(form){
+  form.addEventListener('submit', async function(ev){
+    if(!window.fetch || !window.TextDecoder) return;
+    ev.preventDefault();
+    var live = document.getElementById('live'), out = document.getElementById('live-text'), err = document.getElementById('live-err');
+    live.style.display = ''; out.textContent = ''; err.style.display = 'none';
+    var btn = form.querySelector('button[type=submit], button:not([type])'); if(btn) btn.disabled = true;
+    try {
+      var resp = await fetch(form.dataset.stream, {method:'POST', body:new FormData(form)});
+      if(!resp.ok) throw new Error(await resp.text());
+      var reader = resp.body.getReader(), dec = new TextDecoder(), buf = '';
+      while(true){
+        var r = await reader.read(); if(r.done) break;
+        buf += dec.decode(r.value, {stream:true});
+        var frames = buf.split('\n\n'); buf = frames.pop();
+        frames.forEach(function(frame){
+          var ev = 'message', data = '';
+          frame.split('\n').forEach(function(line){
+            if(line.indexOf('event: ') === 0) ev = line.slice(7);
+            else if(line.indexOf('data: ') === 0) data += line.slice(6);
+          });
+          var msg = data ? JSON.parse(data) : {};
+          if(ev === 'delta') out.textContent += msg.text;
+          else if(ev === 'error'){ err.textContent = msg.error; err.style.display = ''; }
+        });
+      }
+    } catch(e) { err.textContent = String(e.message || e); err.style.display = ''; }
+    if(btn) btn.disabled = false;
+  });
+});
+</script>
+"""
+
+def stream_agent_response(agent, text, make_prompt, lang=None):
+    """SSE response that forwards the agent's cleaned output as `delta` events. Long
+    input is processed in concurrent chunks, each sent as soon as it and all
+    earlier chunks are done."""
+    key = agent_key(agent, text, lang)
+    use_cache = wants_cache()
+    prompt = make_prompt(text)
+    chunks = chunk_text(text, LONG_TEXT_CHUNK_TOKENS)
+    user, stored = history_user(), stored_result(key, use_cache)
+
+    def generate_chunked():
+        process = lambda part: run_agent(agent, make_prompt(part), part, lang=lang, use_cache=use_cache)
+        failed, outputs = 0, []
+        for i, (chunk, output, error) in enumerate(iter_chunks(chunks, process, LONG_TEXT_WORKERS)):
+            if error is not None:
+                failed += 1
+                output = chunk.text
+            outputs.append(output + (chunk.sep if i < len(chunks) - 1 else ""))
+            yield sse("delta", text=outputs[-1])
+        remember_output(user, agent, text, "".join(outputs), lang, None if failed else key)
+        if failed:
+            yield sse("error", error=f"{failed} of {len(chunks)} parts failed and are shown unchanged.")
+        yield sse("done", cached=False, chunks=len(chunks), failed=failed)
+
+    def generate_from_memory():
+        plan = memory_plan(text, lang, use_cache)
+        failed, outputs = 0, []
+        for piece, errors in memory_pieces(plan, lang):
+            failed += len(errors)
+            outputs.append(piece)
+            yield sse("delta", text=piece)
+        remember_output(user, agent, text, "".join(outputs), lang, None if failed else key)
+        if failed:
+            yield sse("error", error=f"{failed} of {len(plan.segments)} sentences failed and are shown unchanged.")
+        yield sse("done", cached=not plan.batches, segments=len(plan.segments), failed=failed)
+
+    def generate():
+        cached = stored and stored[HISTORY_FIELDS[agent_stage(agent)]]
+        if not cached and TRANSLATION_MEMORY and agent is translate_agent():
+            yield from generate_from_memory()
+            return
+        if not cached and len(chunks) > 1:
+            yield from generate_chunked()
+            return
+        if not cached and use_cache:
+            cached = result_cache.get(key)
+        if cached:
+            yield sse("delta", text=cached)
+            remember_output(user, agent, text, cached, lang, key)
+            yield sse("done", cached=True)
+            return
+        stripper = ThinkStripper()
+        parts = []
+        try:
+            with stage(agent_stage(agent)), upstream.for_agent(agent).slot():
+                for piece in stream_agent(agent, prompt):
+                    out = stripper.feed(piece)
+                    if out:
+                        parts.append(out)
+                        yield sse("delta", text=out)
+            out = stripper.finish()
+            if out:
+                parts.append(out)
+                yield sse("delta", text=out)
+        except Exception as e:
+            yield sse("error", error=str(e))
+            return
+        if parts:
+            result_cache.set(key, "".join(parts))
+            remember_output(user, agent, text, "".join(parts), lang, key)
+        yield sse("done", cached=False)
+
+    return Response(
+        stream_with_context(generate()), mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
 
 # ---------- Home (clean + minimal, no code window) ----------
-@app.route("/")
-def home():
-    content = """
+HOME_CONTENT = """
 <section class="hero">
   <div class="left">
     <span class="kicker"><i class="fas fa-sparkles"></i> New • Classroom-friendly</span>
@@ -228,35 +741,81 @@ def home():
 
 <p class="footer">Built with love for teachers & learners · OpenAI Whisper · Groq LLM · Flask</p>
 """
-    return render_page(content, "Home", "home")
+home_page = None
+
+@app.route("/")
+def home():
+    # The home page never changes while the process runs: render it once and answer
+    # repeat visits with 304 Not Modified.
+    global home_page
+    if home_page is None:
+        home_page = Asset(render_page(HOME_CONTENT, "Home", "home").encode("utf-8"), "text/html")
+    return home_page.response(app.response_class, request, "no-cache")
 
 # ---------- Transcribe ----------
+def upload_error(file):
+    if not file or file.filename.strip() == "":
+        return "No audio file uploaded. Ensure input name='audio' and multipart/form-data."
+    if file.stream.kind is None:
+        return "The uploaded file is too short to be audio."
+    return None
+
+def transcribe_upload(upload, use_cache=True, long_mode=False, lang=None):
+    """Transcribe and enhance a received upload, reusing both results for a file seen
+    before. With `lang` the enhanced text is also translated, in the same model call.
+    Returns (transcript, enhanced, translation or None, notice or None, served from cache)."""
+    key = transcript_key(upload.digest)
+    entry = json.loads(transcript_cache.get(key) or "{}") if use_cache else {}
+    transcript, notice = entry.get("transcript"), None
+    if transcript is None:
+        transcript = (stored_result(key, use_cache) or {}).get("source")
+    if transcript is None:
+        transcript, notice = whisper_transcribe(upload, upload.kind, upload.size, long_mode)
+    enhance_key = agent_key(enhance_agent(), transcript)
+    if not lang and entry.get("enhance_key") == enhance_key and entry.get("enhanced"):
+        return transcript, entry["enhanced"], None, notice, True
+    translation = None
+    if lang:
+        enhanced, translation, failed = enhance_and_translate(transcript, lang, use_cache=use_cache)
+    else:
+        enhanced, failed = enhance_text(transcript, use_cache=use_cache)
+    notice = remember_transcript(key, entry, transcript, None if lang else enhanced, enhance_key, notice, failed)
+    return transcript, enhanced, translation, notice, False
+
+def remember_transcript(key, entry, transcript, enhanced, enhance_key, notice, failed):
+    """Cache a complete transcript, with `enhanced` if given (the enhance agent's output).
+    Returns `notice`, extended when some chunks failed."""
+    if failed:
+        return (notice + " " if notice else "") + f"{failed} parts could not be enhanced and are shown unchanged."
+    if notice:
+        return notice
+    if enhanced:
+        transcript_cache.set(key, json.dumps({"transcript": transcript, "enhance_key": enhance_key, "enhanced": enhanced}).encode("utf-8"))
+    elif "transcript" not in entry:
+        transcript_cache.set(key, json.dumps({"transcript": transcript}).encode("utf-8"))
+    return None
+
 @app.route("/transcribe", methods=["GET","POST"])
 def transcribe():
-    transcript = enhanced = error = None
+    transcript = enhanced = translation = lang = error = notice = None
+    cached = False
     if request.method == "POST":
-        file = request.files.get("audio")
-        if not file or file.filename.strip() == "":
-            error = "No audio file uploaded. Ensure input name='audio' and multipart/form-data."
-        else:
-            tmpname = f"{uuid.uuid4()}_{file.filename}"
+        with stage("upload"):
+            file = request.files.get("audio")
+        lang = (request.form.get("lang") or "").strip() or None
+        error = upload_error(file)
+        if not error:
             try:
-                file.save(tmpname)
-                with open(tmpname, "rb") as af:
-                    whisper_out = openai_client.audio.transcriptions.create(
-                        model="whisper-1", file=af, response_format="text", temperature=0
-                    )
-                transcript = str(whisper_out)
-                raw = enhance_agent.run(transcript)
-                enhanced = clean_output(getattr(raw, "content", None) or getattr(raw, "text", None) or str(raw))
+                transcript, enhanced, translation, notice, cached = transcribe_upload(
+                    file.stream, use_cache=wants_cache(), long_mode=bool(request.form.get("long")), lang=lang
+                )
+                remember(history_user(), "transcribe", transcript, enhanced, translation, lang,
+                         key=None if notice else transcript_key(file.stream.digest))
             except Exception as e:
                 error = f"Processing error: {e}"
-            finally:
-                try:
-                    os.remove(tmpname)
-                except:
-                    pass
+    return transcribe_page(transcript, enhanced, error, notice, cached, translation, lang)
 
+def transcribe_page(transcript=None, enhanced=None, error=None, notice=None, cached=False, translation=None, lang=None):
     base = """
 <div class="card" style="margin-top:6px">
   <h2 style="margin:0 0 8px 0"><i class="fas fa-microphone"></i> Transcribe Audio</h2>
@@ -266,6 +825,20 @@ def transcribe():
       <div id="pick" style="text-align:center; margin-top:6px">Click to choose a file (WAV / MP3 / M4A / FLAC)</div>
       <input type="file" name="audio" id="audio" accept=".wav,.mp3,.m4a,.flac" style="display:none"/>
     </label>
+    <label style="display:block; text-align:center; margin-top:10px; color:var(--muted)">
+      <input type="checkbox" name="long" value="1"/> Long recording (split into segments and transcribe in parallel)
+    </label>
+    <label style="display:block; text-align:center; margin-top:6px; color:var(--muted)">
+      <input type="checkbox" name="shrink" value="1" checked/> Shrink before upload (mono, 16 kHz, silent ends trimmed)
+    </label>
+    <input type="hidden" name="client_original_bytes" value=""/>
+    <div style="max-width:320px; margin:10px auto 0 auto">
+      <select name="lang" class="input">
+        <option value="">Enhance only</option>
+        LANG_OPTIONS
+      </select>
+      <small style="color:var(--muted)">Pick a language to enhance and translate in one step.</small>
+    </div>
     <div style="text-align:center; margin-top:10px">
       <button class="btn btn-primary" type="submit"><i class="fas fa-bolt"></i> Upload & Transcribe</button>
     </div>
@@ -276,10 +849,68 @@ document.getElementById('audio').addEventListener('change', function(e){
   var f = e.target.files[0]; if(!f) return;
   document.getElementById('pick').textContent = 'Ready: ' + f.name + ' (' + (f.size/1024/1024).toFixed(2) + ' MB)';
 });
+// Whisper only uses 16 kHz mono, so the browser downmixes, resamples and trims the file
+// and uploads that as a 16-bit WAV when it is smaller. The server shrinks it further.
+document.getElementById('up').addEventListener('submit', async function(ev){
+  var form = this, input = document.getElementById('audio'), f = input.files[0];
+  if(!f || !form.shrink.checked || form.dataset.shrunk || f.size > 150 * 1048576
+     || !window.OfflineAudioContext || !window.DataTransfer) return;
+  ev.preventDefault();
+  var pick = document.getElementById('pick');
+  pick.textContent = 'Preparing ' + f.name + '…';
+  try {
+    var decoded = await new OfflineAudioContext(1, 1, 16000).decodeAudioData(await f.arrayBuffer());
+    var mono = new Float32Array(decoded.length);
+    for(var c = 0; c < decoded.numberOfChannels; c++){
+      var data = decoded.getChannelData(c);
+      for(var i = 0; i < data.length; i++) mono[i] += data[i] / decoded.numberOfChannels;
+    }
+    var wav = wavBlob(trimSilence(mono, 16000), 16000);
+    if(wav.size < f.size){
+      var dt = new DataTransfer();
+      dt.items.add(new File([wav], f.name.replace(/[.][^.]*$/, '') + '.wav', {type:'audio/wav'}));
+      input.files = dt.files;
+      form.client_original_bytes.value = f.size;
+      pick.textContent = 'Uploading ' + (wav.size/1048576).toFixed(2) + ' MB instead of ' + (f.size/1048576).toFixed(2) + ' MB';
+    }
+  } catch(e) { /* not decodable here: the server pre-processes it instead */ }
+  form.dataset.shrunk = '1';
+  form.submit();
+});
+// Same rule as audio.trim_silence: 20 ms frames under RMS 200/32768 at either end go,
+// keeping 300 ms around the speech.
+function trimSilence(x, rate){
+  var frame = rate / 50, pad = rate * 0.3, limit = 200 / 32768;
+  function loud(at){ var sum = 0; for(var i = at; i < at + frame; i++) sum += x[i] * x[i]; return Math.sqrt(sum / frame) >= limit; }
+  var start = 0, end = x.length - x.length % frame;
+  while(start + frame <= x.length && !loud(start)) start += frame;
+  if(start + frame > x.length) return x;
+  while(end - frame > start && !loud(end - frame)) end -= frame;
+  return x.subarray(Math.max(0, start - pad), Math.min(x.length, end + pad));
+}
+function wavBlob(x, rate){
+  var view = new DataView(new ArrayBuffer(44 + x.length * 2));
+  function text(at, s){ for(var i = 0; i < s.length; i++) view.setUint8(at + i, s.charCodeAt(i)); }
+  text(0, 'RIFF'); view.setUint32(4, 36 + x.length * 2, true); text(8, 'WAVEfmt ');
+  view.setUint32(16, 16, true); view.setUint16(20, 1, true); view.setUint16(22, 1, true);
+  view.setUint32(24, rate, true); view.setUint32(28, rate * 2, true); view.setUint16(32, 2, true);
+  view.setUint16(34, 16, true); text(36, 'data'); view.setUint32(40, x.length * 2, true);
+  for(var i = 0; i < x.length; i++) view.setInt16(44 + i * 2, Math.max(-1, Math.min(1, x[i])) * 32767, true);
+  return new Blob([view.buffer], {type:'audio/wav'});
+}
 </script>
 """
-    content = base
+    content = base.replace("LANG_OPTIONS", "".join(
+        f'<option value="{h(name)}"{" selected" if name == lang else ""}>Enhance + translate to {h(name)}</option>'
+        for name in LANGUAGES
+    ))
+    if notice:
+        content += f'<div class="card" style="margin-top:12px"><div class="err"><i class="fas fa-circle-info"></i> {h(notice)}</div></div>'
     if transcript or enhanced or error:
+        if cached:
+            content += '<p style="margin:12px 0 0 0"><span class="kicker"><i class="fas fa-bolt"></i> Served from cache</span></p>'
+        elif g.get("upload_report"):
+            content += f'<p style="margin:12px 0 0 0"><span class="kicker"><i class="fas fa-compress"></i> {h(g.upload_report)}</span></p>'
         content += '<div class="grid grid-2" style="margin-top:12px">'
         if transcript:
             content += f"""
@@ -290,9 +921,13 @@ document.getElementById('audio').addEventListener('change', function(e){
   <div class="card"><h3 style="margin:0 0 6px 0">Enhanced</h3>
   <div class="textbox ok">{h(enhanced)}</div>
   <div style="display:flex; gap:10px; flex-wrap:wrap; margin-top:10px">
-    <a class="btn btn-outline" href="/translate"><i class="fas fa-language"></i> Translate</a>
-    <a class="btn btn-success" href="/speak"><i class="fas fa-volume-up"></i> Speak</a>
+    <a class="btn btn-outline" href="/translate?result={save_text(enhanced)}"><i class="fas fa-language"></i> Translate</a>
+    <a class="btn btn-success" href="/speak?result={save_text(enhanced)}"><i class="fas fa-volume-up"></i> Speak</a>
   </div></div>"""
+        if translation:
+            content += f"""
+  <div class="card"><h3 style="margin:0 0 6px 0">{h(lang or "Translation")}</h3>
+  <div class="textbox ok">{h(translation)}</div></div>"""
         content += "</div>"
     if error:
         content += f'<div class="card" style="margin-top:12px"><div class="err"><i class="fas fa-triangle-exclamation"></i> {h(error)}</div></div>'
@@ -308,23 +943,36 @@ def enhance():
             error = "No text provided."
         else:
             try:
-                raw = enhance_agent.run(text)
-                enhanced_text = clean_output(getattr(raw, "content", None) or getattr(raw, "text", None) or str(raw))
+                key = agent_key(enhance_agent(), text)
+                stored, failed = stored_result(key, wants_cache()), 0
+                if stored:
+                    enhanced_text = stored["enhanced"]
+                else:
+                    enhanced_text, failed = enhance_text(text, use_cache=wants_cache())
+                remember(history_user(), "enhance", text, enhanced=enhanced_text, key=None if failed else key)
                 original = text
+                if failed:
+                    error = f"{failed} parts could not be enhanced and are shown unchanged."
             except Exception as e:
                 error = f"Enhancement error: {e}"
+    return enhance_page(original, enhanced_text, error)
 
+def enhance_page(original=None, enhanced_text=None, error=None):
     content = """
 <div class="card">
   <h2 style="margin:0 0 8px 0"><i class="fas fa-wand-magic-sparkles"></i> Enhance Text</h2>
-  <form method="POST">
+  <form method="POST" data-stream="/enhance/stream">
     <textarea name="text" class="input" placeholder="Paste text to polish...">{}</textarea>
     <div style="text-align:center; margin-top:10px">
       <button class="btn btn-primary"><i class="fas fa-magic"></i> Enhance</button>
     </div>
   </form>
 </div>
-""".format(h(original or ""))
+<div class="card" id="live" style="margin-top:12px; display:none"><h3>Enhanced</h3>
+  <div class="textbox ok" id="live-text"></div>
+  <div class="err" id="live-err" style="display:none; margin-top:10px"></div>
+</div>
+""".format(h(original or "")) + STREAM_JS
 
     if enhanced_text:
         content += """
@@ -332,77 +980,345 @@ def enhance():
   <div class="card"><h3>Original</h3><div class="textbox">{}</div></div>
   <div class="card"><h3>Enhanced</h3><div class="textbox ok">{}</div>
     <div style="display:flex; gap:10px; flex-wrap:wrap; margin-top:10px">
-      <a href="/translate" class="btn btn-outline"><i class="fas fa-language"></i> Translate</a>
-      <a href="/speak" class="btn btn-success"><i class="fas fa-volume-up"></i> Speak</a>
+      <a href="/translate?result={id}" class="btn btn-outline"><i class="fas fa-language"></i> Translate</a>
+      <a href="/speak?result={id}" class="btn btn-success"><i class="fas fa-volume-up"></i> Speak</a>
     </div>
   </div>
-</div>""".format(h(original), h(enhanced_text))
+</div>""".format(h(original), h(enhanced_text), id=save_text(enhanced_text))
     if error:
         content += '<div class="card" style="margin-top:12px"><div class="err">{}</div></div>'.format(h(error))
     return render_page(content, "Enhance", "enhance")
 
+@app.route("/enhance/stream", methods=["POST"])
+def enhance_stream():
+    text = (request.form.get("text") or "").strip()
+    if not text:
+        return "No text provided", 400
+    return stream_agent_response(enhance_agent(), text, lambda part: part)
+
+
+def translated_page(lang, translated):
+    return """<!DOCTYPE html><html><head><meta charset='utf-8'><title>Translated</title>
+<style>body{background:#f6f8ff;color:#0f172a;font-family:'Plus Jakarta Sans',sans-serif;padding:24px} .box{white-space:pre-wrap;background:#fff;border:1px solid #e5e7eb;border-radius:12px;padding:14px;box-shadow:0 8px 30px rgba(17,24,39,.08)}</style>
+</head><body><h2 style="margin:0 0 10px 0">Translated to %s</h2><div class="box">%s</div><p style="margin-top:12px"><a href="/translate" style="color:#3730a3;text-decoration:none">New translation</a></p></body></html>""" % (h(lang), h(translated))
 
 @app.route("/translate", methods=["GET","POST"])
 def translate_page():
     if request.method == "POST":
-        text = (request.form.get("text") or "").strip()
+        text = submitted_text()
         lang = (request.form.get("lang") or "").strip() or "Spanish"
         if not text:
             return "No text provided", 400
         try:
-            raw = translate_agent.run(f"Translate the following English text to {lang}:\n\n{text}")
-            translated = clean_output(getattr(raw, "content", None) or getattr(raw, "text", None) or str(raw))
-            return """<!DOCTYPE html><html><head><meta charset='utf-8'><title>Translated</title>
-<style>body{background:#f6f8ff;color:#0f172a;font-family:'Plus Jakarta Sans',sans-serif;padding:24px} .box{white-space:pre-wrap;background:#fff;border:1px solid #e5e7eb;border-radius:12px;padding:14px;box-shadow:0 8px 30px rgba(17,24,39,.08)}</style>
-</head><body><h2 style="margin:0 0 10px 0">Translated to %s</h2><div class="box">%s</div><p style="margin-top:12px"><a href="/translate" style="color:#3730a3;text-decoration:none">New translation</a></p></body></html>""" % (h(lang), h(translated))
+            key = agent_key(translate_agent(), text, lang)
+            stored, failed = stored_result(key, wants_cache()), 0
+            if stored:
+                translated = stored["translation"]
+            else:
+                translated, failed = translate_text(text, lang, use_cache=wants_cache())
+            remember(history_user(), "translate", text, translation=translated, lang=lang, key=None if failed else key)
+            return translated_page(lang, translated)
         except Exception as e:
             return f"Translation error: {h(str(e))}", 500
 
+    # Text carried over from /transcribe or /enhance, so it need not be sent again.
+    result_id = request.args.get("result") or ""
+    carried = load_text(result_id)
     content = """
 <div class="card">
   <h2 style="margin:0 0 8px 0"><i class="fas fa-language"></i> Translate</h2>
-  <form method="POST">
+  <form method="POST" data-stream="/translate/stream">
     <div class="grid grid-2">
       <div>
         <label>Target language</label>
         <select name="lang" class="input" required>
           <option value="" disabled selected>Choose</option>
-          <option>Spanish</option><option>French</option><option>German</option>
-          <option>Hindi</option><option>Urdu</option><option>Bengali</option>
-          <option>Punjabi</option><option>Arabic</option><option>Turkish</option>
-          <option>Portuguese</option><option>Chinese (Simplified)</option>
-          <option>Tamil</option><option>Gujarati</option><option>Polish</option>
-          <option>Ukrainian</option><option>Swahili</option>
+          {options}
         </select>
       </div>
       <div style="display:flex; align-items:end; justify-content:flex-end">
         <button class="btn btn-success" type="submit"><i class="fas fa-globe"></i> Translate</button>
       </div>
     </div>
+    {carried}
     <label>Text</label>
     <textarea name="text" class="input" placeholder="Enter English text..."></textarea>
   </form>
 </div>
-"""
+<div class="card" id="live" style="margin-top:12px; display:none"><h3>Translation</h3>
+  <div class="textbox ok" id="live-text"></div>
+  <div class="err" id="live-err" style="display:none; margin-top:10px"></div>
+</div>
+<div class="card" style="margin-top:12px">
+  <h3 style="margin:0 0 8px 0"><i class="fas fa-layer-group"></i> Batch: several languages at once</h3>
+  <form method="POST" action="/translate/batch" id="batch">
+    <div style="display:grid; grid-template-columns:repeat(auto-fit,minmax(170px,1fr)); gap:6px; margin-bottom:10px">
+      {checkboxes}
+    </div>
+    {carried_id}<textarea name="text" class="input" placeholder="Enter English text..."{required}></textarea>
+    <div style="text-align:center; margin-top:10px">
+      <button class="btn btn-primary" type="submit"><i class="fas fa-globe"></i> Translate to selected</button>
+    </div>
+  </form>
+</div>
+<div class="grid grid-2" id="batch-results" style="margin-top:12px"></div>
+""".format(
+        options="".join(f"<option>{h(lang)}</option>" for lang in LANGUAGES),
+        carried=f'<label>From the previous step (or enter other text below)</label><div class="textbox">{h(carried)}</div>'
+        f'<input type="hidden" name="result" value="{result_id}"/>' if carried else "",
+        carried_id=f'<input type="hidden" name="result" value="{result_id}"/>' if carried else "",
+        required="" if carried else " required",
+        checkboxes="".join(
+            f'<label><input type="checkbox" name="langs" value="{h(lang)}"/> {h(lang)}</label>' for lang in LANGUAGES
+        ),
+    ) + STREAM_JS + BATCH_JS
     return render_page(content, "Translate", "translate")
 
+BATCH_JS = """
+<script>
+document.getElementById('batch').addEventListener('submit', async function(ev){
+  ev.preventDefault();
+  var form = ev.target, box = document.getElementById('batch-results');
+  if(!form.querySelector('input[name=langs]:checked')){ alert('Pick at least one language.'); return; }
+  var btn = form.querySelector('button'); btn.disabled = true;
+  box.innerHTML = '<div class="card">Translating…</div>';
+  try {
+    var resp = await fetch(form.action, {method:'POST', body:new FormData(form)});
+    var data = await resp.json();
+    if(!resp.ok) throw new Error(data.error || resp.statusText);
+    box.innerHTML = '';
+    Object.keys(data.results).forEach(function(lang){
+      var r = data.results[lang], card = document.createElement('div');
+      card.className = 'card';
+      card.innerHTML = '<h3 style="margin:0 0 6px 0"></h3><div class="textbox ok"></div><small></small>';
+      card.querySelector('h3').textContent = lang;
+      card.querySelector('.textbox').textContent = r.translation;
+      card.querySelector('small').textContent = r.cached ? 'from cache' : (r.seconds + ' s');
+      box.appendChild(card);
+    });
+    Object.keys(data.errors).forEach(function(lang){
+      var card = document.createElement('div');
+      card.className = 'card'; card.innerHTML = '<div class="err"></div>';
+      card.querySelector('.err').textContent = lang + ': ' + data.errors[lang];
+      box.appendChild(card);
+    });
+  } catch(e) { box.innerHTML = '<div class="card"><div class="err"></div></div>'; box.querySelector('.err').textContent = String(e.message || e); }
+  btn.disabled = false;
+});
+</script>
+"""
+
+@app.route("/translate/batch", methods=["POST"])
+def translate_batch():
+    """Translate one text into several languages and answer JSON keyed by language.
+
+    Accepts form fields or a JSON body: `text`, `langs` (list), `mode` (auto, fanout or
+    packed) and `concurrency` (capped at BATCH_TRANSLATE_CONCURRENCY)."""
+    data = request.get_json(silent=True) or {}
+    text = (data.get("text") or request.form.get("text") or "").strip()
+    if not text:
+        text = load_text(data.get("result") or request.form.get("result")) or ""
+    langs = data.get("langs") or request.form.getlist("langs")
+    if isinstance(langs, str):
+        langs = langs.split(",")
+    langs = list(dict.fromkeys(str(lang).strip() for lang in langs if str(lang).strip()))
+    mode = str(data.get("mode") or request.form.get("mode") or "auto").lower()
+    try:
+        concurrency = int(data.get("concurrency") or request.form.get("concurrency") or BATCH_TRANSLATE_CONCURRENCY)
+    except (TypeError, ValueError):
+        return jsonify({"error": "concurrency must be an integer"}), 400
+    concurrency = max(1, min(concurrency, BATCH_TRANSLATE_CONCURRENCY))
+    if not text:
+        return jsonify({"error": "No text provided."}), 400
+    if not langs:
+        return jsonify({"error": "No target languages provided."}), 400
+    if len(langs) > BATCH_MAX_LANGS:
+        return jsonify({"error": f"At most {BATCH_MAX_LANGS} languages per request."}), 400
+    if mode not in ("auto", "fanout", "packed"):
+        return jsonify({"error": "mode must be auto, fanout or packed"}), 400
+
+    started = time.perf_counter()
+    results, pending, fallback = {}, [], None
+    use_cache = wants_cache()
+    for lang in langs:
+        cached = result_cache.get(agent_key(translate_agent(), text, lang)) if use_cache else None
+        if cached:
+            results[lang] = {"translation": cached, "seconds": 0.0, "cached": True}
+        else:
+            pending.append(lang)
+
+    # One packed call beats N round-trips while the answer stays short; long texts
+    # risk the output limit, so they fan out instead.
+    if mode == "auto":
+        mode = "packed" if len(pending) >= 3 and len(text) <= BATCH_PACK_MAX_CHARS else "fanout"
+    if mode == "packed" and pending:
+        packed_started = time.perf_counter()
+        try:
+            found = parse_packed(agent_output(translate_agent(), packed_prompt(text, pending)), pending)
+        except Exception as e:
+            found, fallback = {}, f"packed call failed: {e}"
+        seconds = round(time.perf_counter() - packed_started, 3)
+        for lang, translated in found.items():
+            result_cache.set(agent_key(translate_agent(), text, lang), translated)
+            results[lang] = {"translation": translated, "seconds": seconds, "cached": False, "packed": True}
+        pending = [lang for lang in pending if lang not in found]
+        if pending and fallback is None:
+            fallback = f"packed answer missed {', '.join(pending)}"
+
+    def translate_one(lang):
+        translated, failed = translate_text(text, lang, use_cache=use_cache)
+        if failed:
+            raise RuntimeError(f"{failed} parts could not be translated")
+        # The memory path stores sentences, not whole answers; this is what the check above reads.
+        result_cache.set(agent_key(translate_agent(), text, lang), translated)
+        return translated
+
+    fanned, errors = fan_out(pending, translate_one, concurrency)
+    for lang, result in fanned.items():
+        results[lang] = dict(result, cached=False)
+    return jsonify({
+        "mode": mode,
+        "fallback": fallback,
+        "results": {lang: results[lang] for lang in langs if lang in results},
+        "errors": errors,
+        "seconds": round(time.perf_counter() - started, 3),
+    })
+
+@app.route("/translate/stream", methods=["POST"])
+def translate_stream():
+    text = submitted_text()
+    lang = (request.form.get("lang") or "").strip() or "Spanish"
+    if not text:
+        return "No text provided", 400
+    return stream_agent_response(translate_agent(), text, lambda part: translate_prompt(part, lang), lang=lang)
+
+def pipeline_result(enhanced, translation, lang, failed):
+    return {"enhanced": enhanced, "translation": translation, "lang": lang, "failed": failed, "result": save_text(enhanced)}
+
+@app.route("/pipeline", methods=["POST"])
+def pipeline():
+    """Enhance and translate in one model call (two for texts that fail to parse).
+
+    Form fields: `text` or `result` (an id from an earlier step) and `lang`. Answers
+    JSON with both texts and the `result` id of the enhanced text."""
+    text = submitted_text()
+    lang = (request.form.get("lang") or "").strip() or "Spanish"
+    if not text:
+        return jsonify({"error": "No text provided."}), 400
+    key = agent_key(pipeline_agent(), text, lang)
+    stored, failed = stored_result(key, wants_cache()), 0
+    if stored:
+        enhanced, translation = stored["enhanced"], stored["translation"]
+    else:
+        try:
+            enhanced, translation, failed = enhance_and_translate(text, lang, use_cache=wants_cache())
+        except Exception as e:
+            return jsonify({"error": str(e)}), 502
+    remember(history_user(), "pipeline", text, enhanced, translation, lang, key=None if failed else key)
+    return jsonify(pipeline_result(enhanced, translation, lang, failed))
+
 
 @app.route("/speak", methods=["GET","POST"])
 def speak_page():
     if request.method == "POST":
         return generate_speech()
-    content = """
+    content = SPEAK_CONTENT.replace("{text}", h(load_text(request.args.get("result")) or ""))
+    content = content.replace("{formats}", "".join(
+        f'<option value="{name}">{FORMAT_LABELS[name]}</option>' for name in transcode.offered()))
+    return render_page(content, "Speak", "speak")
+
+FORMAT_LABELS = {"ogg": "Ogg/Opus (smallest)", "mp3": "MP3", "wav": "WAV"}
+
+SPEAK_CONTENT = """
 <div class="card">
   <h2 style="margin:0 0 8px 0"><i class="fas fa-volume-up"></i> Text → Speech</h2>
   <form method="POST">
-    <textarea name="text" class="input" placeholder="Enter text…" required></textarea>
+    <textarea name="text" class="input" placeholder="Enter text…" required>{text}</textarea>
     <div style="display:flex; gap:10px; flex-wrap:wrap; justify-content:center; margin-top:10px">
-      <button class="btn btn-success" type="submit"><i class="fas fa-download"></i> Download WAV</button>
+      <select name="format" class="input" style="width:auto">{formats}</select>
+      <select name="bitrate" class="input" style="width:auto">
+        <option value="">Default bitrate</option><option value="16">16 kbps</option><option value="24">24 kbps</option>
+        <option value="48">48 kbps</option><option value="96">96 kbps</option>
+      </select>
+      <select name="rate" class="input" style="width:auto">
+        <option value="">Default sample rate</option><option value="16000">16 kHz</option><option value="24000">24 kHz</option>
+        <option value="48000">48 kHz</option>
+      </select>
+    </div>
+    <div style="display:flex; gap:10px; flex-wrap:wrap; justify-content:center; margin-top:10px">
+      <button class="btn btn-primary" type="button" onclick="streamSpeech(event)"><i class="fas fa-headphones"></i> Listen</button>
+      <button class="btn btn-primary" type="button" onclick="playSpeech(event)"><i class="fas fa-play-circle"></i> Play</button>
+      <button class="btn btn-success" type="submit"><i class="fas fa-download"></i> Download</button>
       <button class="btn btn-outline" type="button" onclick="previewSpeech(event)"><i class="fas fa-play"></i> Preview in Browser</button>
     </div>
+    <p id="speak-status" style="text-align:center; color:var(--muted); margin:8px 0 0 0"></p>
+    <audio id="speak-player" controls preload="auto" style="display:none; width:100%; margin-top:10px"></audio>
   </form>
 </div>
 <script>
+// Renders the file in the chosen format, then lets the player fetch it from /speech/…,
+// which answers Range requests, so playback starts before the whole file is downloaded.
+async function playSpeech(ev){
+  const btn = ev.currentTarget, form = btn.form, status = document.getElementById('speak-status');
+  const player = document.getElementById('speak-player');
+  if(!form.text.value.trim()){alert('Please enter text.');return;}
+  const started = performance.now();
+  btn.disabled = true; status.textContent = 'Synthesizing…';
+  try {
+    const resp = await fetch('/speak', {method:'POST', body:new FormData(form), headers:{'Accept':'application/json'}});
+    if(!resp.ok) throw new Error(await resp.text());
+    const info = await resp.json();
+    player.oncanplay = () => {
+      player.oncanplay = null;
+      status.textContent = info.format.toUpperCase() + ', ' + Math.round(info.bytes / 1024) + ' KB, playable after '
+        + Math.round(performance.now() - started) + ' ms';
+      player.play();
+    };
+    player.style.display = 'block'; player.src = info.url;
+  } catch(e) { status.textContent = String(e.message || e); }
+  btn.disabled = false;
+}
+
+// Plays /speak/stream as it arrives: 16-bit mono PCM after a 44-byte WAV header,
+// scheduled chunk by chunk on the Web Audio clock.
+async function streamSpeech(ev){
+  const btn = ev.currentTarget, form = btn.form, status = document.getElementById('speak-status');
+  if(!form.text.value.trim()){alert('Please enter text.');return;}
+  const Ctx = window.AudioContext || window.webkitAudioContext;
+  if(!Ctx || !window.ReadableStream){form.submit();return;}
+  const ctx = new Ctx(), started = performance.now();
+  btn.disabled = true; status.textContent = 'Synthesizing…';
+  try {
+    const resp = await fetch('/speak/stream', {method:'POST', body:new FormData(form)});
+    if(!resp.ok) throw new Error(await resp.text());
+    const reader = resp.body.getReader();
+    let rate = 0, rest = new Uint8Array(0), at = 0;
+    for(;;){
+      const {done, value} = await reader.read();
+      if(done) break;
+      let buf = new Uint8Array(rest.length + value.length);
+      buf.set(rest); buf.set(value, rest.length);
+      if(!rate){
+        if(buf.length < 44){rest = buf; continue;}
+        rate = new DataView(buf.buffer).getUint32(24, true);
+        buf = buf.slice(44);
+      }
+      const usable = buf.length - buf.length % 2;
+      rest = buf.slice(usable);
+      if(!usable) continue;
+      const pcm = new Int16Array(buf.slice(0, usable).buffer), chunk = ctx.createBuffer(1, pcm.length, rate);
+      const samples = chunk.getChannelData(0);
+      for(let i = 0; i < pcm.length; i++) samples[i] = pcm[i] / 32768;
+      const src = ctx.createBufferSource();
+      src.buffer = chunk; src.connect(ctx.destination);
+      if(!at) status.textContent = 'First audio after ' + Math.round(performance.now() - started) + ' ms';
+      at = Math.max(at, ctx.currentTime + 0.05);
+      src.start(at); at += chunk.duration;
+    }
+  } catch(e) { status.textContent = String(e.message || e); }
+  btn.disabled = false;
+}
+
 function previewSpeech(ev){
   const area = document.querySelector('textarea[name="text"]');
   const text = (area.value || '').trim();
@@ -419,43 +1335,407 @@ function previewSpeech(ev){
 }
 </script>
 """
-    return render_page(content, "Speak", "speak")
+
+def speech_options():
+    """(format, kbps, sample rate) from the request's `format`, `bitrate` and `rate`, or
+    an error response if that output can't be made here."""
+    try:
+        output = transcode.options(request.values.get("format"), request.values.get("bitrate") or None,
+                                   request.values.get("rate") or None)
+    except ValueError as e:
+        return None, (f"Unsupported audio output: {e}", 400)
+    if output[0] != "wav" and not transcode.available():
+        return None, (f"{output[0]} output needs ffmpeg on the server.", 501)
+    return output, None
 
 def generate_speech():
-    import pyttsx3
-    text = (request.form.get("text") or "").strip()
+    """The speech for `text` as a download, as WAV, Ogg/Opus or MP3 (`format`, with
+    optional `bitrate` in kbps and sample `rate`). With `Accept: application/json` the
+    answer is instead the file's /speech URL and size."""
+    text = submitted_text()
     if not text:
         return "No text provided", 400
-    tmp = tempfile.NamedTemporaryFile(delete=False, suffix=".wav")
-    path = tmp.name
-    tmp.close()
+    output, error = speech_options()
+    if error:
+        return error
+    name = output[0]
     try:
-        eng = pyttsx3.init()
-        chosen = None
-        for v in eng.getProperty("voices"):
-            name = (getattr(v, "name", "") or "").lower()
-            if any(k in name for k in ["male", "david", "mark", "daniel", "alex", "george", "tom"]):
-                chosen = v.id
-                break
-        if chosen:
-            eng.setProperty("voice", chosen)
-        base = eng.getProperty("rate") or 200
-        eng.setProperty("rate", max(80, int(base * 0.6)))
-        eng.setProperty("volume", 1.0)
-        eng.save_to_file(text, path)
-        eng.runAndWait()
-
-        @after_this_request
-        def cleanup(resp):
-            try:
-                os.remove(path)
-            except:
-                pass
-            return resp
+        with stage("tts"):
+            path, cached = tts_pool().speak(text)
+        with stage("transcode"):
+            key, path, converted = transcoder().convert(path, tts_pool().key(text), *output)
+    except Exception as e:
+        return f"Speech generation error: {e}", 500
+    url = f"/speech/{key}.{name}"
+    if request.accept_mimetypes.best == "application/json":
+        return jsonify({"url": url, "format": name, "bytes": os.path.getsize(path), "cached": cached and converted})
+    resp = send_file(path, mimetype=transcode.FORMATS[name].mimetype, as_attachment=True,
+                     download_name=f"eduspeak_audio.{name}")
+    resp.headers["X-Cache"] = "HIT" if cached and converted else "MISS"
+    resp.headers["Content-Location"] = url
+    return resp
 
-        return send_file(path, mimetype="audio/wav", as_attachment=True, download_name="eduspeak_audio.wav")
+@app.route("/speech/<name>")
+def speech_file(name):
+    """A rendered or transcoded speech file by key. The content never changes, so it is
+    cached for a year; Range requests let players seek and resume. The extension must
+    name the format the file was stored in."""
+    match = re.fullmatch(r"([0-9a-f]{64})\.(\w+)", name)
+    path = tts_pool().cache.lookup(match.group(1)) if match and match.group(2) in transcode.FORMATS else None
+    ext = match.group(2) if match else None
+    try:
+        if path is None or transcode.sniff(path) != ext:
+            return "Not found", 404
+    except OSError:  # evicted since the lookup
+        return "Not found", 404
+    resp = send_file(path, mimetype=transcode.FORMATS[ext].mimetype, etag=match.group(1), max_age=365 * 24 * 3600,
+                     as_attachment=bool(request.args.get("download")), download_name=f"eduspeak_audio.{ext}")
+    resp.cache_control.public = True
+    resp.cache_control.immutable = True
+    return resp
+
+def speech_stream(sentences):
+    """The WAV header, then each sentence's PCM in order, as soon as it is rendered.
+    Sentences that fail to render are left out; if none renders, the error is raised."""
+    yield audio.wav_stream_header(SPEECH_STREAM_RATE)
+    error, spoken = None, 0
+    for path, _, failure in tts_pool().speak_many(sentences):
+        if failure is not None:
+            error = error or failure
+            continue
+        spoken += 1
+        yield audio.decode(path, SPEECH_STREAM_RATE)
+    if not spoken and error is not None:
+        raise error
+
+@app.route("/speak/stream", methods=["POST"])
+def speak_stream():
+    """Speech as a WAV stream that starts playing after the first sentence. Sentences
+    render concurrently on the TTS workers and are cached one by one, so sentences
+    shared between texts are rendered once. Takes `text` or `result`."""
+    text = submitted_text()
+    if not text:
+        return "No text provided", 400
+    started = time.perf_counter()
+    chunks = speech_stream(split_sentences(text))
+    try:
+        with stage("tts"):
+            head = next(chunks) + next(chunks)
     except Exception as e:
+        chunks.close()
         return f"Speech generation error: {e}", 500
+    TTS_FIRST_AUDIO.observe(time.perf_counter() - started)
+
+    def generate():
+        yield head
+        yield from chunks
+
+    return Response(generate(), mimetype="audio/wav", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.errorhandler(RequestEntityTooLarge)
+def upload_too_large(e):
+    limit = app.config["MAX_CONTENT_LENGTH"] / 1024 / 1024
+    return f"Upload too large: the limit is {limit:.0f} MB.", 413
+
+@app.errorhandler(UnsupportedMediaType)
+def unsupported_upload(e):
+    return e.description, 415
+
+@app.route("/cache/stats")
+def cache_stats():
+    return jsonify({
+        "results": result_cache.stats(),
+        "transcripts": transcript_cache.stats(),
+        "speech": tts_pool().cache.stats(),
+        "translation_memory": translation_memory.stats(),
+    })
+
+# ---------- Glossary ----------
+@app.route("/glossary")
+def glossary():
+    """Glossary terms as {lang: {term: translation}}; `lang` limits it to one language."""
+    return jsonify(translation_memory.glossary(request.args.get("lang")))
+
+@app.route("/glossary", methods=["POST"])
+def set_glossary_term():
+    """Add or change a term (form fields or JSON: `lang`, `term`, `translation`).
+    Translations of it get that wording from now on."""
+    data = request.get_json(silent=True) or request.form
+    lang, term, translation = (str(data.get(name) or "").strip() for name in ("lang", "term", "translation"))
+    if not lang:
+        return jsonify({"error": "No language provided."}), 400
+    try:
+        translation_memory.set_term(lang, term, translation)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(translation_memory.glossary(lang))
+
+@app.route("/glossary/delete", methods=["POST"])
+def delete_glossary_term():
+    data = request.get_json(silent=True) or request.form
+    if not translation_memory.delete_term(str(data.get("lang") or ""), str(data.get("term") or "")):
+        return jsonify({"error": "No such term."}), 404
+    return jsonify(translation_memory.glossary(data.get("lang")))
+
+# ---------- History ----------
+HISTORY_KINDS = {"transcribe": "Transcription", "enhance": "Enhanced", "translate": "Translation",
+                 "pipeline": "Enhanced + translated"}
+
+def public_entry(entry):
+    """A history entry as the JSON API shows it (without the owner and cache key)."""
+    return {name: value for name, value in entry.items() if name not in ("user", "key")}
+
+def entry_date(entry) -> str:
+    return time.strftime("%Y-%m-%d %H:%M", time.localtime(entry["created"]))
+
+@app.route("/history")
+def history_page():
+    """This browser's saved results, newest first. `q` searches them; `before` (an entry
+    id) continues a list below that entry. Answers JSON for Accept: application/json."""
+    user = history_user()
+    query = (request.args.get("q") or "").strip()
+    try:
+        before = int(request.args.get("before") or 0) or None
+    except ValueError:
+        return "before must be an entry id", 400
+    with stage("history"):
+        entries, next_before = history.page(user, before, HISTORY_PAGE_SIZE, query or None)
+    next_url = "/history?" + urlencode(dict({"q": query} if query else {}, before=next_before)) if next_before else None
+    if request.accept_mimetypes.best == "application/json":
+        return jsonify({
+            "entries": [dict(public_entry(e), snippet=e["snippet"].replace(MARK, "").replace(END_MARK, "")) for e in entries],
+            "next": next_url,
+        })
+    content = f"""
+<div class="card">
+  <h2 style="margin:0 0 8px 0"><i class="fas fa-clock-rotate-left"></i> History</h2>
+  <form method="GET" action="/history" style="display:flex; gap:10px">
+    <input type="search" name="q" class="input" value="{h(query)}" placeholder="Search your transcripts and translations…"/>
+    <button class="btn btn-primary" type="submit"><i class="fas fa-search"></i> Search</button>
+  </form>
+</div>"""
+    for entry in entries:
+        snippet = h(entry["snippet"]).replace(MARK, "<mark>").replace(END_MARK, "</mark>")
+        lang = f" · {h(entry['lang'])}" if entry["lang"] else ""
+        content += f"""
+<a class="card" href="/history/{entry['id']}" style="display:block; margin-top:10px; text-decoration:none; color:inherit">
+  <small style="color:var(--muted)">{entry_date(entry)} · {HISTORY_KINDS.get(entry['kind'], h(entry['kind']))}{lang}</small>
+  <div style="margin-top:4px">{snippet}</div>
+</a>"""
+    if not entries:
+        empty = "No saved results match." if query else "Nothing saved yet. Results you transcribe, enhance or translate show up here."
+        content += f'<div class="card" style="margin-top:10px; color:var(--muted)">{empty}</div>'
+    links = ([f'<a class="btn btn-outline" href="/history{"?" + urlencode({"q": query}) if query else ""}">Newest</a>'] if before else []) + \
+            ([f'<a class="btn btn-outline" href="{h(next_url)}">Older <i class="fas fa-arrow-right"></i></a>'] if next_url else [])
+    if links:
+        content += f'<div style="display:flex; gap:10px; justify-content:center; margin-top:12px">{"".join(links)}</div>'
+    return render_page(content, "History", "history")
+
+@app.route("/history/<int:entry_id>")
+def history_entry(entry_id):
+    entry = history.get(history_user(), entry_id)
+    if entry is None:
+        return "Not found", 404
+    if request.accept_mimetypes.best == "application/json":
+        return jsonify(public_entry(entry))
+    source_title = "Raw Transcript" if entry["kind"] == "transcribe" else "Original"
+    follow_up = entry["enhanced"] or entry["source"]
+    content = f"""
+<div class="card">
+  <h2 style="margin:0 0 4px 0"><i class="fas fa-clock-rotate-left"></i> {HISTORY_KINDS.get(entry['kind'], h(entry['kind']))}</h2>
+  <small style="color:var(--muted)">{entry_date(entry)}</small>
+</div>
+<div class="grid grid-2" style="margin-top:12px">
+  <div class="card"><h3 style="margin:0 0 6px 0">{source_title}</h3><div class="textbox">{h(entry['source'])}</div></div>"""
+    if entry["enhanced"]:
+        content += f"""
+  <div class="card"><h3 style="margin:0 0 6px 0">Enhanced</h3><div class="textbox ok">{h(entry['enhanced'])}</div></div>"""
+    if entry["translation"]:
+        content += f"""
+  <div class="card"><h3 style="margin:0 0 6px 0">{h(entry['lang'] or "Translation")}</h3><div class="textbox ok">{h(entry['translation'])}</div></div>"""
+    content += f"""
+</div>
+<div style="display:flex; gap:10px; flex-wrap:wrap; justify-content:center; margin-top:12px">
+  <a class="btn btn-outline" href="/translate?result={save_text(follow_up)}"><i class="fas fa-language"></i> Translate</a>
+  <a class="btn btn-success" href="/speak?result={save_text(follow_up)}"><i class="fas fa-volume-up"></i> Speak</a>
+  <form method="POST" action="/history/{entry_id}/delete" style="margin:0">
+    <button class="btn btn-outline" type="submit"><i class="fas fa-trash"></i> Delete</button>
+  </form>
+  <a class="btn btn-outline" href="/history">Back to history</a>
+</div>"""
+    return render_page(content, "History", "history")
+
+@app.route("/history/<int:entry_id>/delete", methods=["POST"])
+def delete_history_entry(entry_id):
+    if not history.delete(history_user(), entry_id):
+        return "Not found", 404
+    return redirect("/history", code=303)
+
+# ---------- Background jobs ----------
+job_store = JobStore(os.getenv("JOBS_DIR", os.path.join(".cache", "jobs")), ttl=float(os.getenv("JOB_TTL", str(7 * 86400))))
+JOB_RECOVERY = os.getenv("JOB_RECOVERY", "requeue")
+
+def job_text(job, *stages):
+    for stage in stages:
+        text = job_store.read_output(job["id"], stage)
+        if text:
+            return text
+    return job["params"].get("text") or ""
+
+@upstream.bulk
+def job_transcribe(job):
+    params = job["params"]
+    if not params.get("digest"):
+        raise ValueError("job has no audio to transcribe")
+    key = transcript_key(params["digest"])
+    entry = json.loads(transcript_cache.get(key) or "{}")
+    if entry.get("transcript"):
+        return entry["transcript"]
+    with open(job_store.input_path(job["id"]), "rb") as f:
+        transcript, notice = whisper_transcribe(f, params.get("kind"), params["size"], params.get("long"))
+    if not notice:
+        transcript_cache.set(key, json.dumps({"transcript": transcript}).encode("utf-8"))
+    return transcript
+
+@upstream.bulk
+def job_enhance(job):
+    return enhance_text(job_text(job, "transcribe"))[0]
+
+@upstream.bulk
+def job_translate(job):
+    text = job_text(job, "enhance", "transcribe")
+    lang = job["params"].get("lang") or "Spanish"
+    return translate_text(text, lang)[0]
+
+def job_speak(job):
+    with stage("tts"):
+        path, _ = tts_pool().speak(job_text(job, "enhance", "transcribe"))
+    with open(path, "rb") as f:
+        return f.read()
+
+job_backend = make_backend(
+    os.getenv("JOB_BACKEND", "inprocess"),
+    JobRunner(job_store, {
+        "transcribe": job_transcribe,
+        "enhance": job_enhance,
+        "translate": job_translate,
+        "speak": job_speak,
+    }),
+    workers=int(os.getenv("JOB_WORKERS", "2")),
+)
+
+def recover_jobs():
+    """Requeue the jobs a stopped server left queued or running (they resume after their
+    last finished stage), or with JOB_RECOVERY=fail mark them failed."""
+    for job in job_store.orphaned():
+        if JOB_RECOVERY == "requeue":
+            job_backend.submit(job["id"])
+        else:
+            job_store.finish(job, "failed", "interrupted by a server restart")
+
+job_store.prune()
+recover_jobs()
+
+def job_status(job) -> dict:
+    results = {}
+    for stage in job["stages"]:
+        if not job_store.has_output(job["id"], stage):
+            continue
+        if stage == "speak":
+            results[stage] = f"/jobs/{job['id']}/speech"
+        else:
+            results[stage] = job_store.read_output(job["id"], stage)
+    return {
+        "id": job["id"],
+        "status": job["status"],
+        "stage": job["stage"],
+        "stages": job["stages"],
+        "reused": job["reused"],
+        "error": job["error"],
+        "results": results,
+        "status_url": f"/jobs/{job['id']}",
+    }
+
+def load_job(job_id):
+    try:
+        return job_store.load(job_id)
+    except ValueError:
+        return None
+
+@app.route("/jobs", methods=["POST"])
+def submit_job():
+    """Queue a pipeline run and return its id straight away; poll /jobs/<id> for results.
+
+    Form fields: `audio` (file) or `text`, optional `lang`, `stages` (comma separated,
+    any of transcribe,enhance,translate,speak) and `from_job` to start from the
+    outputs of an earlier job."""
+    with stage("upload"):
+        file = request.files.get("audio")
+    has_audio = bool(file and file.filename.strip())
+    text = given_text = (request.form.get("text") or "").strip()
+    lang = (request.form.get("lang") or "").strip()
+    source = None
+    if request.form.get("from_job"):
+        source = load_job(request.form["from_job"].strip())
+        if source is None:
+            return jsonify({"error": "from_job not found"}), 404
+        text = text or source["params"].get("text", "")
+        lang = lang or source["params"].get("lang", "")
+
+    stages = [s.strip() for s in (request.form.get("stages") or "").split(",") if s.strip()]
+    unknown = [s for s in stages if s not in STAGES]
+    if unknown:
+        return jsonify({"error": f"unknown stages: {', '.join(unknown)}"}), 400
+    if not stages:
+        stages = (["transcribe"] if has_audio else []) + ["enhance"] + (["translate"] if lang else [])
+    if has_audio and file.stream.kind is None:
+        return jsonify({"error": "The uploaded file is too short to be audio."}), 400
+    if not (has_audio or text or source):
+        return jsonify({"error": "Provide an audio file, text, or from_job."}), 400
+    if "transcribe" in stages and not has_audio and not (source and job_store.has_output(source["id"], "transcribe")):
+        return jsonify({"error": "The transcribe stage needs an audio upload."}), 400
+
+    job = job_store.create(stages, {"text": text, "lang": lang, "long": bool(request.form.get("long"))})
+    if has_audio:
+        digest, size, kind = save_upload(file, job_store.input_path(job["id"]))
+        job["params"].update(digest=digest, size=size, kind=kind)
+    if source:
+        # Outputs carry over only when they were made from the same input.
+        same_audio = not has_audio or job["params"]["digest"] == source["params"].get("digest")
+        same_text = not given_text or given_text == (source["params"].get("text") or "")
+        reusable = ["transcribe"] if same_audio else []
+        if same_audio and same_text:
+            reusable += ["enhance", "speak"]
+            if (source["params"].get("lang") or "") == lang:
+                reusable.append("translate")
+        job["reused"] = job_store.copy_outputs(source["id"], job["id"], [s for s in reusable if s in stages])
+        job["params"].setdefault("digest", source["params"].get("digest"))
+    job_store.save(job)
+    job_backend.submit(job["id"])
+    return jsonify(job_status(job)), 202, {"Location": f"/jobs/{job['id']}"}
+
+@app.route("/jobs/<job_id>")
+def get_job(job_id):
+    job = load_job(job_id)
+    if job is None:
+        return jsonify({"error": "job not found"}), 404
+    return jsonify(job_status(job))
+
+@app.route("/jobs/<job_id>/speech")
+def get_job_speech(job_id):
+    job = load_job(job_id)
+    if job is None or not job_store.has_output(job_id, "speak"):
+        return "Not found", 404
+    output, error = speech_options()
+    if error:
+        return error
+    name = output[0]
+    try:
+        with stage("transcode"):
+            _, path, _ = transcoder().convert(job_store.output_path(job_id, "speak"), f"job:{job_id}", *output)
+    except Exception as e:
+        return f"Transcoding error: {e}", 500
+    return send_file(path, mimetype=transcode.FORMATS[name].mimetype, download_name=f"eduspeak_audio.{name}")
 
 if __name__ == "__main__":
     app.run(debug=True)
@@ -0,0 +1,10 @@
+"""Point every store the app opens at a temporary folder, before any test imports talk."""
+import os, tempfile
+
+STATE_DIR = tempfile.mkdtemp(prefix="eduspeak-tests-")
+for name, path in (("TRANSCRIPT_CACHE_DIR", "transcripts"), ("TTS_CACHE_DIR", "speech"), ("TEXT_STORE_DIR", "texts"),
+                   ("JOBS_DIR", "jobs"), ("HISTORY_DB", "history.db"), ("TRANSLATION_MEMORY_DB", "translation-memory.db")):
+    os.environ[name] = os.path.join(STATE_DIR, path)
+os.environ.pop("RESULT_CACHE_DB", None)
+for name, value in (("OPENAI_API_KEY", "tests-not-used"), ("OPENAI_RPM", "1e9"), ("FAKE_RPM", "1e9"), ("WARM_UP", "0")):
+    os.environ.setdefault(name, value)
@@ -0,0 +1,69 @@
+import asyncio, json, threading
+
+import httpx
+import pytest
+
+import asgi
+import talk
+from bench.fakes import AsyncFakeWhisperClient, FakeAgent
+
+
+@pytest.fixture
+def client(monkeypatch):
+    """Drive asgi:app through an async client; `calls` lists the thread of every store access."""
+    talk.configure(enhance_agent=FakeAgent("Enhancer"), translate_agent=FakeAgent("Translator"),
+                   pipeline_agent=FakeAgent("Enhancer and Translator"))
+    asgi.configure(AsyncFakeWhisperClient())
+    calls = []
+    for store, name in ((talk.text_store, "get"), (talk.text_store, "set"), (talk.history, "lookup"),
+                        (talk.history, "add"), (talk.translation_memory, "terms_in")):
+        original = getattr(store, name)
+
+        def recorded(*args, original=original, **kwargs):
+            calls.append(threading.current_thread())
+            return original(*args, **kwargs)
+
+        monkeypatch.setattr(store, name, recorded)
+
+    def run(scenario):
+        async def main():
+            try:
+                async with httpx.AsyncClient(transport=httpx.ASGITransport(app=asgi.app), base_url="http://test") as c:
+                    return await scenario(c)
+            finally:
+                await asgi.shutdown()
+        return asyncio.run(main())
+
+    return run, calls
+
+
+def test_views_keep_sqlite_off_the_event_loop(client):
+    run, calls = client
+    talk.translation_memory.set_term("French", "photosynthesis", "photosynthèse")
+    result = talk.save_text("Photosynthesis makes sugar.")
+    calls.clear()
+
+    async def scenario(c):
+        enhanced = await c.post("/enhance", data={"text": "Plants use light."})
+        assert enhanced.status_code == 200 and "Plants use light." in enhanced.text
+        piped = await c.post("/pipeline", data={"result": result, "lang": "French"})
+        assert piped.status_code == 200 and piped.json()["enhanced"] == "Photosynthesis makes sugar."
+        streamed = await c.post("/translate/stream", data={"result": piped.json()["result"], "lang": "French"})
+        assert "event: done" in streamed.text
+        deltas = [json.loads(line[6:])["text"] for line in streamed.text.splitlines() if line.startswith("data: {\"text\"")]
+        assert "".join(deltas).strip() == "Photosynthesis makes sugar."
+        return threading.current_thread()
+
+    loop_thread = run(scenario)
+    assert calls and loop_thread not in calls
+
+
+def test_translate_page_reads_a_saved_result(client):
+    run, _ = client
+    result = talk.save_text("Open your books.")
+
+    async def scenario(c):
+        return await c.post("/translate", data={"result": result, "lang": "Spanish"})
+
+    resp = run(scenario)
+    assert resp.status_code == 200 and "Open your books." in resp.text
@@ -0,0 +1,45 @@
+import gzip
+
+import talk
+from assets import Asset, negotiate_encoding
+
+
+def test_encoding_follows_accept_encoding():
+    assert negotiate_encoding("gzip, deflate") == "gzip"
+    assert negotiate_encoding("gzip;q=0, identity") == "identity"
+    assert negotiate_encoding("") == "identity"
+
+
+def test_stylesheet_is_fingerprinted_cached_and_conditional():
+    client = talk.app.test_client()
+    page = client.get("/enhance").get_data(as_text=True)
+    assert talk.CSS_URL in page and "<style>" not in page
+    resp = client.get(talk.CSS_URL, headers={"Accept-Encoding": "gzip"})
+    assert resp.status_code == 200 and resp.headers["Content-Encoding"] == "gzip"
+    assert "immutable" in resp.headers["Cache-Control"] and "Accept-Encoding" in resp.headers["Vary"]
+    with open(talk.CSS_PATH, "rb") as f:
+        assert gzip.decompress(resp.get_data()) == f.read()
+    again = client.get(talk.CSS_URL, headers={"Accept-Encoding": "gzip", "If-None-Match": resp.headers["ETag"]})
+    assert again.status_code == 304 and again.get_data() == b""
+    assert client.get("/assets/eduspeak.000000000000.css").status_code == 404
+
+
+def test_home_page_answers_repeat_visits_with_304():
+    client = talk.app.test_client()
+    first = client.get("/")
+    assert first.status_code == 200 and first.headers["Cache-Control"] == "no-cache"
+    assert client.get("/", headers={"If-None-Match": first.headers["ETag"]}).status_code == 304
+
+
+def test_dynamic_html_is_compressed_when_asked():
+    client = talk.app.test_client()
+    plain = client.get("/enhance")
+    packed = client.get("/enhance", headers={"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in plain.headers and packed.headers["Content-Encoding"] == "gzip"
+    assert gzip.decompress(packed.get_data()) == plain.get_data()
+
+
+def test_small_assets_are_not_compressed():
+    asset = Asset(b"tiny", "text/plain")
+    assert set(asset.variants) == {"identity"}
+    assert asset.fingerprinted("static/a.css") == f"a.{asset.fingerprint}.css"
@@ -0,0 +1,45 @@
+import math, wave
+
+import pytest
+
+import audio
+
+
+def stereo_wav(path, seconds=25, rate=44100):
+    """A tone with a quiet second at each end, as a 16-bit stereo WAV."""
+    frames = bytearray()
+    for i in range(seconds * rate):
+        loud = rate <= i < (seconds - 1) * rate
+        value = int(8000 * math.sin(i / 20)) if loud else 0
+        frames += value.to_bytes(2, "little", signed=True) * 2
+    with wave.open(str(path), "wb") as w:
+        w.setnchannels(2)
+        w.setsampwidth(2)
+        w.setframerate(rate)
+        w.writeframes(bytes(frames))
+    return str(path)
+
+
+def test_decoded_maps_the_same_pcm_that_decode_returns(tmp_path):
+    path = stereo_wav(tmp_path / "long.wav")
+    with audio.decoded(path, tmp_dir=str(tmp_path / "tmp")) as pcm:
+        assert isinstance(pcm, memoryview)
+        assert abs(audio.duration_ms(pcm) - 25000) <= 1
+        assert bytes(pcm) == audio.decode(path)
+        trimmed = audio.trim_silence(pcm)
+        assert isinstance(trimmed, memoryview) and 23000 <= audio.duration_ms(trimmed) <= 23700
+        del trimmed
+    assert list((tmp_path / "tmp").iterdir()) == []
+
+
+def test_without_audioop_plain_wavs_still_decode(tmp_path, monkeypatch):
+    pcm = b"".join(int(5000 * math.sin(i / 7)).to_bytes(2, "little", signed=True) for i in range(16000))
+    path = tmp_path / "mono.wav"
+    path.write_bytes(audio.to_wav_bytes(pcm))
+    expected_rms = audio.rms(pcm)
+    monkeypatch.setattr(audio, "audioop", None)
+    assert audio.decode(str(path)) == pcm
+    assert abs(audio.rms(pcm) - expected_rms) <= 1
+    monkeypatch.setattr(audio.shutil, "which", lambda name: None)
+    with pytest.raises(RuntimeError, match="ffmpeg"):  # converting other WAVs needs ffmpeg then
+        audio.decode(stereo_wav(tmp_path / "stereo.wav", seconds=1))
@@ -0,0 +1,71 @@
+import json
+
+import pytest
+
+import talk
+from batch import packed_prompt, parse_packed
+from bench.fakes import FakeAgent
+
+
+class PackingAgent(FakeAgent):
+    """A FakeAgent that also answers packed prompts, skipping the languages in `drop`."""
+
+    def __init__(self, *args, drop=(), **kwargs):
+        super().__init__(*args, **kwargs)
+        self.drop = set(drop)
+
+    def answer(self, prompt):
+        if "JSON object whose keys" in prompt:
+            langs = prompt.split("languages: ", 1)[1].split(".\n", 1)[0].split(", ")
+            text = prompt.strip().splitlines()[-1]
+            return json.dumps({lang: f"{text} ({lang})" for lang in langs if lang not in self.drop})
+        return super().answer(prompt)
+
+
+@pytest.fixture
+def agent():
+    agent = PackingAgent("Translator")
+    talk.configure(translate_agent=agent)
+    return agent
+
+
+def batch(text, langs, mode):
+    response = talk.app.test_client().post("/translate/batch", json={"text": text, "langs": langs, "mode": mode})
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()
+
+
+def test_parse_packed_keeps_only_the_requested_languages():
+    output = '```json\n{"spanish": " Hola ", "French": "", "German": 3, "Italian": "Ciao"}\n```'
+    assert parse_packed(output, ["Spanish", "French", "German"]) == {"Spanish": "Hola"}
+    assert parse_packed("Sorry, I can't.", ["Spanish"]) == {}
+    assert parse_packed("[1, 2]", ["Spanish"]) == {}
+    assert packed_prompt("Hi.", ["Spanish", "French"]).endswith("Hi.")
+
+
+@pytest.mark.parametrize("mode", ["fanout", "packed"])
+def test_each_language_is_cached_under_its_translate_key(agent, mode):
+    text = f"Batch cache check for {mode}."
+    langs = ["Spanish", "French", "German"]
+    first = batch(text, langs, mode)
+    assert first["mode"] == mode and first["errors"] == {} and set(first["results"]) == set(langs)
+    for lang in langs:
+        assert talk.result_cache.get(talk.agent_key(agent, text, lang)) == first["results"][lang]["translation"]
+
+    calls = agent.calls
+    again = batch(text, langs, mode)
+    assert agent.calls == calls
+    assert all(r["cached"] for r in again["results"].values())
+    assert {lang: r["translation"] for lang, r in again["results"].items()} == \
+        {lang: r["translation"] for lang, r in first["results"].items()}
+
+
+def test_packed_answer_gaps_fan_out(monkeypatch):
+    agent = PackingAgent("Translator", drop={"French"})
+    talk.configure(translate_agent=agent)
+    monkeypatch.setattr(talk, "TRANSLATION_MEMORY", False)
+    data = batch("Packed gaps are filled.", ["Spanish", "French", "German"], "auto")
+    assert data["mode"] == "packed" and "French" in data["fallback"]
+    assert data["results"]["Spanish"]["packed"] and "packed" not in data["results"]["French"]
+    assert data["results"]["French"]["translation"] == "Packed gaps are filled."
+    assert agent.calls == 2
@@ -0,0 +1,58 @@
+import asyncio, os, sqlite3, threading
+
+from cache import BlobCache, ResultCache
+
+
+def test_total_follows_writes_replacements_and_evictions(tmp_path):
+    cache = BlobCache(str(tmp_path), max_bytes=250)
+    cache.set("a", b"x" * 100)
+    cache.set("b", b"x" * 100)
+    cache.set("a", b"x" * 50)
+    assert cache.total_bytes() == 150
+    cache.lookup("a")
+    cache.set("c", b"x" * 120)  # over the limit: "b" is the least recently used
+    assert cache.get("b") is None and cache.get("a") and cache.get("c")
+    assert cache.total_bytes() == 170
+    assert cache.total_bytes() == cache._db().execute("SELECT SUM(size) FROM blobs").fetchone()[0]
+
+
+def test_hits_update_access_times_in_batches(tmp_path):
+    cache = BlobCache(str(tmp_path), touch_batch=3, touch_interval=3600)
+    cache.set("a", b"data")
+    used = lambda: cache._db().execute("SELECT used FROM blobs WHERE key = 'a'").fetchone()[0]
+    before = used()
+    cache.lookup("a")
+    cache.lookup("a")
+    assert used() == before
+    cache.lookup("a")
+    cache.lookup("a")
+    assert used() > before
+
+
+def test_an_index_without_a_total_is_summed_once(tmp_path):
+    os.makedirs(tmp_path / "ab")
+    db = sqlite3.connect(tmp_path / "index.db")
+    db.execute("CREATE TABLE blobs (key TEXT PRIMARY KEY, size INTEGER NOT NULL, used REAL NOT NULL)")
+    db.execute("INSERT INTO blobs VALUES ('abc', 40, 0)")
+    db.commit()
+    db.close()
+    assert BlobCache(str(tmp_path)).total_bytes() == 40
+
+
+def test_async_lookups_use_the_disk_tier_off_the_event_loop(tmp_path):
+    cache = ResultCache(path=str(tmp_path / "results.db"))
+    threads = []
+    for name in ("get", "set"):
+        original = getattr(cache.disk, name)
+
+        def recorded(*args, original=original):
+            threads.append(threading.current_thread())
+            return original(*args)
+
+        setattr(cache.disk, name, recorded)
+
+    async def compute():
+        return "answer"
+
+    assert asyncio.run(cache.get_or_compute_async("k", compute)) == "answer"
+    assert len(threads) == 2 and threading.main_thread() not in threads
@@ -0,0 +1,50 @@
+import json, time
+
+import help
+
+
+def ok(item, lang=None, long_mode=False):
+    time.sleep(0.2)
+    return {"path": item["path"], "seconds": {}, "status": "ok", "audio_seconds": 1.0}
+
+
+def manifest(tmp_path, names):
+    for name in names:
+        if name != "missing.wav":
+            (tmp_path / name).write_bytes(b"RIFF")
+    path = tmp_path / "manifest.txt"
+    path.write_text("\n".join(names))
+    return str(path)
+
+
+def read(path):
+    return [json.loads(line) for line in open(path, encoding="utf-8")]
+
+
+def test_an_unreadable_entry_fails_alone(tmp_path, monkeypatch):
+    monkeypatch.setattr(help, "process", ok)
+    out = str(tmp_path / "out.jsonl")
+    assert help.main([manifest(tmp_path, ["a.wav", "missing.wav", "b.wav"]), "--out", out]) == 1
+    records = {r["path"].rsplit("/", 1)[-1]: r["status"] for r in read(out)}
+    assert records == {"a.wav": "ok", "missing.wav": "error", "b.wav": "ok"}
+    assert len(open(out + ".checkpoint").read().splitlines()) == 2
+
+
+def test_interrupt_keeps_running_work_and_skips_the_queue(tmp_path, monkeypatch):
+    monkeypatch.setattr(help, "process", ok)
+    real = help.as_completed
+    calls = []
+
+    def interrupted(futures):
+        calls.append(futures)
+        if len(calls) == 1:
+            raise KeyboardInterrupt
+        return real(futures)
+
+    monkeypatch.setattr(help, "as_completed", interrupted)
+    out = str(tmp_path / "out.jsonl")
+    started = time.perf_counter()
+    help.main([manifest(tmp_path, [f"{i}.wav" for i in range(6)]), "--out", out, "--workers", "1"])
+    assert time.perf_counter() - started < 0.8
+    assert [r["status"] for r in read(out)] == ["ok"]
+    assert len(open(out + ".checkpoint").read().splitlines()) == 1
@@ -0,0 +1,61 @@
+import pytest
+
+from history import END_MARK, MARK, HistoryStore, fts_query
+
+
+@pytest.fixture(params=[True, False], ids=["fts", "like"])
+def store(request, tmp_path):
+    store = HistoryStore(str(tmp_path / "history.db"))
+    store.fts = store.fts and request.param  # the LIKE fallback reads the same rows
+    return store
+
+
+def walk(store, user, limit, query=None):
+    pages, before = [], None
+    while True:
+        entries, before = store.page(user, before, limit, query)
+        pages.append([entry["id"] for entry in entries])
+        if before is None:
+            return pages
+
+
+def test_pages_walk_each_users_entries_newest_first(store):
+    ids = [store.add("ann", "transcribe", f"lesson {i}") for i in range(7)]
+    store.add("bob", "transcribe", "not ann's")
+    pages = walk(store, "ann", 3)
+    assert pages == [ids[6:3:-1], ids[3:0:-1], ids[:1]]
+    assert walk(store, "ann", 7) == [ids[::-1]]
+    assert store.page("nobody") == ([], None)
+
+
+def test_search_matches_any_text_field(store):
+    first = store.add("ann", "translate", "good morning", translation="buenos días")
+    store.add("ann", "enhance", "hello", enhanced="a polished greeting")
+    store.add("bob", "translate", "good night", translation="buenas noches")
+    entries, _ = store.page("ann", query="bueno")
+    assert [entry["id"] for entry in entries] == [first]
+    if store.fts:
+        assert MARK + "buenos" + END_MARK in entries[0]["snippet"]
+    assert [e["kind"] for e in store.page("ann", query="polished")[0]] == ["enhance"]
+
+
+def test_search_results_are_paged_too(store):
+    ids = [store.add("ann", "transcribe", f"verb drill {i}" if i % 2 else f"noun list {i}") for i in range(9)]
+    assert walk(store, "ann", 2, query="verb") == [[ids[7], ids[5]], [ids[3], ids[1]]]
+
+
+def test_search_text_is_not_parsed_as_syntax(store):
+    store.add("ann", "transcribe", 'he said "50% off" (today) OR NOT')
+    assert len(store.page("ann", query='"50% off" (today')[0]) == 1
+    assert store.page("ann", query="100%")[0] == []
+    assert fts_query('a "b" OR') == '"a" "b" "OR"*' and fts_query("?!") is None
+
+
+def test_lookup_finds_the_newest_entry_for_a_key_and_delete_is_per_user(store):
+    store.add("ann", "enhance", "x", enhanced="old", key="k1")
+    newest = store.add("bob", "enhance", "x", enhanced="new", key="k1")
+    assert store.lookup("k1")["enhanced"] == "new" and store.lookup("k2") is None
+    assert not store.delete("ann", newest)
+    assert store.delete("bob", newest)
+    assert store.lookup("k1")["enhanced"] == "old"
+    assert store.get("bob", newest) is None and len(store) == 1
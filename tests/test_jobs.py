@@ -0,0 +1,62 @@
+import os, time
+
+import talk
+from bench.fakes import FakeAgent
+from jobs import JobRunner, JobStore
+
+
+def test_finished_jobs_lose_their_input_and_expire(tmp_path):
+    store = JobStore(str(tmp_path), ttl=60)
+    runner = JobRunner(store, {"enhance": lambda job: "Better text."})
+    job = store.create(["enhance"])
+    with open(store.input_path(job["id"]), "wb") as f:
+        f.write(b"audio")
+    runner.run(job["id"])
+    assert store.load(job["id"])["status"] == "done"
+    assert not os.path.exists(store.input_path(job["id"]))
+
+    store.prune()
+    assert store.load(job["id"]) is not None
+    store.ttl = -1
+    store.prune()
+    assert store.load(job["id"]) is None
+
+
+def test_unfinished_jobs_are_handed_to_the_first_process_only(tmp_path):
+    job = JobStore(str(tmp_path)).create(["enhance"])
+    first, second = JobStore(str(tmp_path)), JobStore(str(tmp_path))
+    assert [j["id"] for j in first.orphaned()] == [job["id"]]
+    assert second.orphaned() == []
+
+
+def test_failed_stage_fails_the_job(tmp_path):
+    store = JobStore(str(tmp_path))
+
+    def broken(job):
+        raise RuntimeError("upstream down")
+
+    job = store.create(["enhance"])
+    JobRunner(store, {"enhance": broken}).run(job["id"])
+    job = store.load(job["id"])
+    assert (job["status"], job["stage"], job["error"]) == ("failed", "enhance", "enhance failed: upstream down")
+
+
+def test_from_job_reuses_outputs_only_for_the_same_input():
+    talk.configure(enhance_agent=FakeAgent("Enhancer"), translate_agent=FakeAgent("Translator"),
+                   pipeline_agent=FakeAgent("Enhancer and Translator"))
+    client = talk.app.test_client()
+
+    def finished(data):
+        job = client.post("/jobs", data=data).get_json()
+        for _ in range(200):
+            job = client.get(job["status_url"]).get_json()
+            if job["status"] in ("done", "failed"):
+                return job
+            time.sleep(0.01)
+        raise AssertionError(f"job {job['id']} did not finish")
+
+    first = finished({"text": "Plants need light.", "stages": "enhance"})
+    again = finished({"from_job": first["id"], "stages": "enhance"})
+    assert again["reused"] == ["enhance"] and again["results"]["enhance"] == "Plants need light."
+    other = finished({"from_job": first["id"], "text": "Roots drink water.", "stages": "enhance"})
+    assert other["reused"] == [] and other["results"]["enhance"] == "Roots drink water."
@@ -0,0 +1,21 @@
+from longaudio import GAP_MARKER, stitch
+
+
+def test_stitch_drops_the_repeated_overlap():
+    first = "today we talk about plants and how they make food from sunlight"
+    second = "make food from sunlight in their leaves every day"
+    assert stitch([first, second]) == "today we talk about plants and how they make food from sunlight in their leaves every day"
+
+
+def test_stitch_ignores_a_repeated_phrase_outside_the_overlap():
+    first = ("we looked at the history of the city and how its markets grew over many years "
+             "while the river brought traders from far away to sell grain and cloth")
+    second = ("and cloth in the square of the city economy was built on that trade "
+              "so the history of the city is really a history of its river")
+    stitched = stitch([first, second]).split()
+    assert len(stitched) == len(first.split()) + len(second.split())
+    assert "traders" in stitched and "square" in stitched
+
+
+def test_stitch_keeps_a_gap_marker_for_failed_segments():
+    assert stitch(["one two three", None, "four five"]) == f"one two three {GAP_MARKER} four five"
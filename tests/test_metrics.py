@@ -0,0 +1,51 @@
+import pytest
+
+import metrics
+import talk
+from metrics import Registry, percentile
+
+
+def test_registry_exposes_prometheus_text():
+    registry = Registry()
+    requests = registry.counter("t_requests_total", "Requests.")
+    seconds = registry.histogram("t_seconds", "Latency.", buckets=(0.1, 1.0))
+    requests.inc(endpoint="home", status=200)
+    requests.inc(2, endpoint="home", status=200)
+    for value in (0.05, 0.5, 5.0):
+        seconds.observe(value, stage='say "hi"')
+    registry.gauge_callback("t_depth", "Depth.", lambda: {(("queue", "bulk"),): 3, (("queue", "none"),): None})
+    lines = registry.exposition().splitlines()
+    assert "# TYPE t_requests_total counter" in lines
+    assert 't_requests_total{endpoint="home",status="200"} 3' in lines
+    assert 't_seconds_bucket{stage="say \\"hi\\"",le="0.1"} 1' in lines
+    assert 't_seconds_bucket{stage="say \\"hi\\"",le="1.0"} 2' in lines
+    assert 't_seconds_bucket{stage="say \\"hi\\"",le="+Inf"} 3' in lines
+    assert 't_seconds_count{stage="say \\"hi\\""} 3' in lines
+    assert 't_depth{queue="bulk"} 3' in lines and not any('"none"' in line for line in lines)
+    assert registry.counter("t_requests_total", "Again.") is requests
+
+
+def test_stage_times_blocks_and_counts_errors():
+    metrics.start_request()
+    with metrics.stage("t_ok") as timer:
+        pass
+    with pytest.raises(ValueError), metrics.stage("t_broken"):
+        raise ValueError
+    assert timer.seconds >= 0 and metrics.STAGE_ERRORS.value(stage="t_broken") >= 1
+    assert [part.split(";")[0] for part in metrics.server_timing().split(", ")] == ["t_ok", "t_broken"]
+
+
+def test_percentile_is_nearest_rank():
+    assert percentile([], 50) is None
+    assert percentile([5, 1, 4, 2, 3], 50) == 3
+    assert percentile(range(1, 101), 99) == 99 and percentile([7], 99) == 7
+
+
+def test_requests_report_server_timing_and_show_up_in_metrics():
+    client = talk.app.test_client()
+    resp = client.get("/enhance")
+    assert "render_page;dur=" in resp.headers["Server-Timing"]
+    body = client.get("/metrics").get_data(as_text=True)
+    assert 'eduspeak_http_requests_total{endpoint="enhance",status="200"}' in body
+    assert 'eduspeak_stage_seconds_count{stage="render_page"}' in body
+    assert 'eduspeak_cache_hit_ratio{cache="results"}' in body
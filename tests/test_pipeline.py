@@ -0,0 +1,41 @@
+import talk
+from bench.fakes import FakeAgent
+
+
+class PlainAgent(FakeAgent):
+    """Answers every prompt with plain text, so combined answers never parse."""
+
+    def answer(self, prompt):
+        return prompt.strip().splitlines()[-1]
+
+
+def agents(pipeline_agent):
+    found = dict(enhance_agent=FakeAgent("Enhancer"), translate_agent=FakeAgent("Translator"), pipeline_agent=pipeline_agent)
+    talk.configure(**found)
+    return found
+
+
+def test_one_call_answers_both_and_the_result_id_carries_the_text():
+    used = agents(FakeAgent("Enhancer and Translator"))
+    client = talk.app.test_client()
+    data = client.post("/pipeline", data={"text": "Pipeline in one call.", "lang": "French"}).get_json()
+    assert (data["enhanced"], data["translation"], data["lang"], data["failed"]) == \
+        ("Pipeline in one call.", "Pipeline in one call.", "French", 0)
+    assert used["pipeline_agent"].calls == 1 and used["enhance_agent"].calls == used["translate_agent"].calls == 0
+    assert talk.load_text(data["result"]) == data["enhanced"]
+
+    again = client.post("/pipeline", data={"result": data["result"], "lang": "French"}).get_json()
+    assert again == data and used["pipeline_agent"].calls == 1
+    assert client.post("/pipeline", data={"result": "0" * 64}).status_code == 400
+
+
+def test_unparsable_answers_fall_back_to_two_calls_and_are_not_cached():
+    used = agents(PlainAgent("Enhancer and Translator"))
+    client = talk.app.test_client()
+    data = client.post("/pipeline", data={"text": "Fallback text.", "lang": "German"}).get_json()
+    assert (data["enhanced"], data["translation"], data["failed"]) == ("Fallback text.", "Fallback text.", 0)
+    assert [used[name].calls for name in ("pipeline_agent", "enhance_agent", "translate_agent")] == [1, 1, 1]
+    assert talk.result_cache.get(talk.agent_key(used["pipeline_agent"], "Fallback text.", "German")) is None
+    # The two-call answer is complete, so the history still serves the repeat.
+    assert client.post("/pipeline", data={"text": "Fallback text.", "lang": "German"}).get_json() == data
+    assert used["pipeline_agent"].calls == 1
@@ -0,0 +1,15 @@
+from preprocess import summary
+
+
+def test_summary_reports_the_ratio_when_audio_shrank():
+    assert summary(5_200_000, 410_000, trimmed_ms=2500) == \
+        "Sent 0.41 MB to Whisper instead of 5.20 MB (12.7× smaller; 2.5 s of silence trimmed)."
+
+
+def test_summary_when_nothing_was_sent():
+    assert summary(5_200_000, 0) == "Sent 0.00 MB to Whisper instead of 5.20 MB."
+
+
+def test_summary_leaves_out_the_ratio_when_audio_did_not_shrink():
+    assert summary(1_000_000, 1_000_000) == "Sent 1.00 MB to Whisper instead of 1.00 MB."
+    assert summary(1_000_000, 1_100_000) == "Sent 1.10 MB to Whisper instead of 1.00 MB."
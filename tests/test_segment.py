@@ -0,0 +1,45 @@
+import time
+
+from segment import chunk_text, estimate_tokens, iter_chunks, join_chunks, split_sentences
+
+TEXT = (
+    "Dr. Smith read e.g. two poems and the class began. Everyone was ready! Was the homework done?\n\n"
+    "A short second paragraph.\n\n\n"
+    + " ".join(f"Sentence number {i} of a long third paragraph." for i in range(40))
+)
+
+
+def test_sentences_do_not_break_after_abbreviations():
+    assert split_sentences(TEXT.split("\n\n")[0]) == [
+        "Dr. Smith read e.g. two poems and the class began.", "Everyone was ready!", "Was the homework done?"]
+
+
+def test_chunks_stay_under_the_budget_and_rejoin_to_the_text():
+    chunks = chunk_text(TEXT, max_tokens=40)
+    assert all(estimate_tokens(chunk.text) <= 40 for chunk in chunks)
+    assert chunks[0].text == TEXT.split("\n\n")[0] and chunks[1].text == "A short second paragraph."
+    assert [chunk.sep for chunk in chunks].count("\n\n") == 3
+    assert join_chunks((chunk, chunk.text) for chunk in chunks) == \
+        "\n\n".join(p.strip() for p in TEXT.split("\n\n") if p.strip())
+    giant = chunk_text("word " * 500, max_tokens=20)
+    assert len(giant) > 1 and all(estimate_tokens(chunk.text) <= 20 for chunk in giant)
+
+
+def test_editing_one_paragraph_keeps_the_other_chunks():
+    before = [chunk.text for chunk in chunk_text(TEXT, max_tokens=40)]
+    after = [chunk.text for chunk in chunk_text(TEXT.replace("A short", "An edited"), max_tokens=40)]
+    assert [a for a, b in zip(before, after) if a != b] == ["A short second paragraph."]
+
+
+def test_results_come_back_in_order_with_errors_in_place():
+    chunks = chunk_text("One.\n\nTwo.\n\nThree.")
+
+    def process(text):
+        if text == "Two.":
+            raise ValueError("bad chunk")
+        time.sleep(0.05 if text == "One." else 0)
+        return text.upper()
+
+    results = list(iter_chunks(chunks, process, workers=3))
+    assert [(chunk.text, output) for chunk, output, _ in results] == [("One.", "ONE."), ("Two.", None), ("Three.", "THREE.")]
+    assert isinstance(results[1][2], ValueError)
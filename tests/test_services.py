@@ -0,0 +1,56 @@
+import os, subprocess, sys, threading, time
+from types import SimpleNamespace
+
+import pytest
+
+import services
+
+
+@pytest.fixture(autouse=True)
+def fresh(monkeypatch):
+    monkeypatch.setattr(services, "_instances", {})
+
+
+def test_a_service_is_built_once_across_threads():
+    built = []
+
+    @services.service
+    def widget():
+        """A widget."""
+        time.sleep(0.01)
+        built.append(1)
+        return object()
+
+    assert services.created("widget") is None
+    got = []
+    threads = [threading.Thread(target=lambda: got.append(widget())) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(built) == 1 and len({id(x) for x in got}) == 1
+    assert services.created("widget") is got[0] and widget.__doc__ == "A widget."
+
+
+def test_override_replaces_services_and_ignores_none():
+    fake = SimpleNamespace(name="Fake")
+    services.override(translate_agent=fake, enhance_agent=None)
+    assert services.translate_agent() is fake
+    assert services.created("enhance_agent") is None
+
+
+def test_warm_up_logs_failures_instead_of_raising(caplog):
+    class Models:
+        def retrieve(self, model):
+            raise ConnectionError("offline")
+
+    services.override(openai_client=SimpleNamespace(models=Models()), enhance_agent=SimpleNamespace())
+    assert services.warm_up(agents=("enhance_agent", "missing_agent")) >= 0
+    assert "OpenAI: offline" in caplog.text and "missing_agent" in caplog.text
+
+
+def test_importing_the_app_loads_no_sdk():
+    code = "import sys, talk; print(' '.join(m for m in ('openai', 'agno', 'groq', 'pyttsx3') if m in sys.modules))"
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, env=dict(os.environ, WARM_UP="0"),
+                         cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))), check=True).stdout
+    assert out.strip() == ""
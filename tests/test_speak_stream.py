@@ -0,0 +1,46 @@
+import pytest
+
+import audio
+import talk
+from bench.fakes import FakeEngineFactory
+
+SENTENCES = ["First sentence.", "The second one is longer.", "Third!"]
+
+
+@pytest.fixture(scope="module")
+def pool():
+    talk.configure(tts_engine_factory=FakeEngineFactory())
+    yield talk.tts_pool()
+    talk.tts_pool().shutdown()
+
+
+def sentence_pcm(pool, sentence):
+    return audio.decode(pool.speak(sentence)[0], talk.SPEECH_STREAM_RATE)
+
+
+def test_sentences_stream_in_order_after_one_header(pool):
+    resp = talk.app.test_client().post("/speak/stream", data={"text": " ".join(SENTENCES)})
+    body = resp.get_data()
+    assert resp.status_code == 200 and resp.mimetype == "audio/wav"
+    assert body[:44] == audio.wav_stream_header(talk.SPEECH_STREAM_RATE)
+    assert body[44:] == b"".join(sentence_pcm(pool, sentence) for sentence in SENTENCES)
+
+
+def test_failed_sentences_are_left_out(pool, monkeypatch):
+    speak_many = pool.speak_many
+
+    def flaky(texts):
+        for text, result in zip(texts, speak_many(texts)):
+            yield (None, False, RuntimeError("engine down")) if text == SENTENCES[1] else result
+
+    monkeypatch.setattr(pool, "speak_many", flaky)
+    body = talk.app.test_client().post("/speak/stream", data={"text": " ".join(SENTENCES)}).get_data()
+    assert body[44:] == sentence_pcm(pool, SENTENCES[0]) + sentence_pcm(pool, SENTENCES[2])
+
+
+def test_nothing_spoken_is_an_error(pool, monkeypatch):
+    monkeypatch.setattr(pool, "speak_many", lambda texts: iter([(None, False, RuntimeError("engine down"))] * len(texts)))
+    client = talk.app.test_client()
+    resp = client.post("/speak/stream", data={"text": "Nothing works."})
+    assert resp.status_code == 500 and "engine down" in resp.get_data(as_text=True)
+    assert client.post("/speak/stream", data={"text": "  "}).status_code == 400
@@ -0,0 +1,43 @@
+import random
+
+import pytest
+
+from streaming import ThinkStripper
+from talk import clean_output
+
+SAMPLES = [
+    "Hello there.",
+    "  <think>plan the answer</think>\n\nThe answer is 4.  \n",
+    "<think>a</think>Part one. <think>b\nc</think> Part two.\n",
+    "Text with a < sign and <thin words> that only look like tags.",
+    "Answer first.<think>trailing thoughts</think>   ",
+    "<think>never closed, so it is kept",
+    "<think></think><think>x</think>",
+    "\n\n  \t",
+]
+
+
+def stream(text, pieces):
+    stripper = ThinkStripper()
+    return "".join(stripper.feed(p) for p in pieces) + stripper.finish()
+
+
+@pytest.mark.parametrize("text", SAMPLES)
+def test_matches_clean_output_however_the_text_is_split(text):
+    expected = clean_output(text)
+    assert stream(text, [text]) == expected
+    assert stream(text, list(text)) == expected
+    rng = random.Random(text)
+    for _ in range(50):
+        cuts = sorted(rng.sample(range(1, len(text)), min(len(text) - 1, rng.randint(1, 6))))
+        pieces = [text[i:j] for i, j in zip([0] + cuts, cuts + [len(text)])]
+        assert stream(text, pieces) == expected
+
+
+def test_text_is_released_before_the_response_ends():
+    stripper = ThinkStripper()
+    assert stripper.feed("<think>hidden") == ""
+    assert stripper.feed("</think> Visible") == "Visible"
+    assert stripper.feed(" text <thi") == " text"  # the partial tag is held back
+    assert stripper.feed("nk>x</think>!") == " !"  # with the space held back before it
+    assert stripper.finish() == ""
@@ -0,0 +1,32 @@
+import audio
+import talk
+import transcode
+
+
+def test_sniff_names_the_stored_format(tmp_path):
+    heads = {"wav": b"RIFF\x24\x00\x00\x00WAVE", "ogg": b"OggS\x00\x02", "mp3": b"ID3\x04\x00", None: b"fLaC\x00"}
+    for name, head in heads.items():
+        path = tmp_path / f"{name}.bin"
+        path.write_bytes(head)
+        assert transcode.sniff(path) == name
+
+
+def test_offered_is_wav_alone_without_ffmpeg(monkeypatch):
+    monkeypatch.setattr(transcode, "available", lambda: False)
+    assert transcode.offered() == ["wav"]
+
+
+def test_speech_files_answer_range_requests():
+    body = audio.wav_stream_header(16000) + bytes(range(256)) * 8
+    key = "ab" * 32
+    talk.tts_pool().cache.set(key, body)
+    client = talk.app.test_client()
+    whole = client.get(f"/speech/{key}.wav")
+    assert whole.status_code == 200 and whole.get_data() == body
+    assert "immutable" in whole.headers["Cache-Control"] and whole.headers["Accept-Ranges"] == "bytes"
+    part = client.get(f"/speech/{key}.wav", headers={"Range": "bytes=100-199"})
+    assert part.status_code == 206 and part.get_data() == body[100:200]
+    assert part.headers["Content-Range"] == f"bytes 100-199/{len(body)}"
+    assert client.get(f"/speech/{key}.wav", headers={"If-None-Match": whole.headers["ETag"]}).status_code == 304
+    assert client.get(f"/speech/{key}.mp3").status_code == 404
+    assert client.get(f"/speech/{'cd' * 32}.wav").status_code == 404
@@ -0,0 +1,71 @@
+import pytest
+
+import talk
+from bench.fakes import FakeAgent
+from transmem import TranslationMemory, segments
+
+
+@pytest.fixture
+def memory(tmp_path):
+    memory = TranslationMemory(str(tmp_path / "tm.db"))
+    memory.learn("French", [("They walk to school.", "Ils marchent jusqu'à l'école."),
+                            ("Open the book.", "Ouvrez le livre.")])
+    return memory
+
+
+def test_case_whitespace_and_punctuation_still_match(memory):
+    assert memory.lookup("french", ["they  WALK to school!", "Um, open the book"]) == {
+        "they  WALK to school!": "Ils marchent jusqu'à l'école.",
+        "Um, open the book": "Ouvrez le livre.",
+    }
+
+
+@pytest.mark.parametrize("source", [
+    "They walked to school.",
+    "They talk to school.",
+    "Open the books.",
+    "They do not walk to school.",
+])
+def test_a_different_word_is_a_new_sentence(memory, source):
+    assert memory.lookup("French", [source]) == {}
+
+
+def test_memory_is_per_language(memory):
+    assert memory.lookup("German", ["Open the book."]) == {}
+
+
+def test_segments_keep_paragraphs_and_list_lines():
+    text = "One. Two!\n\n- first item\n- second item\nwrapped on."
+    assert [(s.source, s.sep) for s in segments(text)] == [
+        ("One.", " "), ("Two!", "\n\n"), ("- first item", "\n"), ("- second item wrapped on.", ""),
+    ]
+
+
+def test_glossary_changes_change_the_version_and_forget_segments(memory):
+    assert memory.glossary_version("French") == ""
+    memory.set_term("French", "book", "bouquin")
+    first = memory.glossary_version("French")
+    assert first and memory.lookup("French", ["Open the book."]) == {}
+    memory.learn("French", [("Open the book.", "Ouvrez le bouquin.")])
+    memory.set_term("French", "book", "bouquin")  # unchanged: nothing forgotten
+    assert memory.glossary_version("French") == first
+    assert memory.lookup("French", ["Open the book."])
+    memory.set_term("French", "book", "livre")
+    assert memory.glossary_version("French") not in ("", first)
+    memory.learn("French", [("Open the book.", "Ouvrez le livre.")])
+    assert memory.delete_term("French", "book")
+    assert memory.glossary_version("French") == ""
+    assert memory.lookup("French", ["Open the book."]) == {}
+    assert memory.lookup("French", ["They walk to school."])
+
+
+def test_a_glossary_term_retires_that_languages_answers():
+    agent = FakeAgent("Translator")
+    talk.configure(translate_agent=agent)
+    before = {lang: talk.agent_key(agent, "Read the chapter.", lang) for lang in ("Polish", "Swahili")}
+    client = talk.app.test_client()
+    assert client.post("/glossary", json={"lang": "Polish", "term": "chapter", "translation": "rozdział"}).get_json() == \
+        {"polish": {"chapter": "rozdział"}}
+    assert talk.agent_key(agent, "Read the chapter.", "Polish") != before["Polish"]
+    assert talk.agent_key(agent, "Read the chapter.", "Swahili") == before["Swahili"]
+    assert "chapter → rozdział" in talk.translate_prompt("Read the chapter.", "Polish")
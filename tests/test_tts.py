@@ -0,0 +1,46 @@
+import os, wave
+
+import pytest
+
+from bench.fakes import FakeEngineFactory
+from cache import BlobCache
+from tts import TTSPool
+
+
+@pytest.fixture(scope="module")
+def pool(tmp_path_factory):
+    pool = TTSPool(BlobCache(str(tmp_path_factory.mktemp("speech"))), workers=2, engine_factory=FakeEngineFactory())
+    yield pool
+    pool.shutdown()
+
+
+def test_workers_resolve_the_voice_once(pool):
+    settings = pool.start()
+    assert settings == {"voice": "fake-male", "rate": 120, "volume": 1.0}
+    assert pool.start() is settings
+
+
+def test_speech_is_rendered_once_then_served_from_the_cache(pool):
+    path, cached = pool.speak("Good morning, class.")
+    assert not cached
+    with wave.open(path) as w:
+        assert w.getnframes() == 160 * len("Good morning, class.")
+    assert pool.speak(" Good morning,\n class. ") == (path, True)  # the same text once whitespace is collapsed
+
+
+def test_speak_many_keeps_the_order_and_renders_repeats_once(pool):
+    texts = ["First line.", "Second line.", "First line.", "Third line."]
+    results = list(pool.speak_many(texts))
+    assert [error for _, _, error in results] == [None] * 4
+    assert results[0][0] == results[2][0] and results[2][1] is True
+    assert len({path for path, _, _ in results}) == 3
+
+
+def test_stopping_early_leaves_no_partial_files(pool):
+    before = set(os.listdir(pool.cache.folder))
+    speaking = pool.speak_many([f"Unread sentence {i}." for i in range(6)])
+    next(speaking)
+    speaking.close()
+    pool.shutdown()  # waits for the renders already running
+    left = set(os.listdir(pool.cache.folder)) - before
+    assert all(not name.startswith("tmp") for name in left)
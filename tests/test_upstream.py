@@ -0,0 +1,123 @@
+import asyncio, email.utils, threading, time
+from types import SimpleNamespace
+
+import pytest
+
+import upstream
+from upstream import CircuitOpenError, Upstream
+
+
+class HTTPError(Exception):
+    def __init__(self, status, headers=None):
+        super().__init__(f"HTTP {status}")
+        self.status_code = status
+        self.response = SimpleNamespace(status_code=status, headers=headers or {})
+
+
+def failing(*errors, result="ok"):
+    """A callable raising `errors` in turn, then returning `result`; counts its calls."""
+    errors = list(errors)
+
+    def fn():
+        fn.calls += 1
+        if errors:
+            raise errors.pop(0)
+        return result
+
+    fn.calls = 0
+    return fn
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    slept = []
+    monkeypatch.setattr(upstream.time, "sleep", slept.append)
+    return slept
+
+
+def test_transient_errors_are_retried_and_bad_requests_are_not(sleeps):
+    up = Upstream("test", retries=3, backoff=0.01)
+    fn = failing(HTTPError(503), TimeoutError(), HTTPError(500))
+    assert up.call(fn) == "ok" and fn.calls == 4 and len(sleeps) == 3
+    bad = failing(HTTPError(400))
+    with pytest.raises(HTTPError):
+        up.call(bad)
+    assert bad.calls == 1
+
+
+def test_retries_give_up_after_the_limit(sleeps):
+    fn = failing(*[HTTPError(502)] * 5)
+    with pytest.raises(HTTPError):
+        Upstream("test", retries=2, breaker_failures=100).call(fn)
+    assert fn.calls == 3
+
+
+def test_retry_after_sets_the_delay(sleeps):
+    later = email.utils.formatdate(time.time() + 30, usegmt=True)
+    fn = failing(HTTPError(503, {"retry-after": "3"}), HTTPError(503, {"retry-after-ms": "250"}),
+                 HTTPError(503, {"retry-after": later}), HTTPError(503, {"retry-after": "9999"}))
+    Upstream("test", retries=4).call(fn)
+    assert sleeps[:2] == [3.0, 0.25]
+    assert 28 <= sleeps[2] <= 30 and sleeps[3] == upstream.MAX_RETRY_AFTER
+
+
+def test_429_halves_the_rate_and_success_brings_it_back(sleeps):
+    up = Upstream("test", rate_per_min=6000, retries=1)
+    up.call(failing(HTTPError(429, {"retry-after": "0"})))
+    assert up.bucket.rate == pytest.approx(100 / 2 + 100 / 20)
+
+
+def test_breaker_opens_then_lets_one_probe_through():
+    up = Upstream("test", retries=0, breaker_failures=2, breaker_reset_s=0.05)
+    for _ in range(2):
+        with pytest.raises(HTTPError):
+            up.call(failing(HTTPError(503)))
+    assert up.breaker.state == "open"
+    untouched = failing()
+    with pytest.raises(CircuitOpenError):
+        up.call(untouched)
+    assert untouched.calls == 0
+
+    time.sleep(0.06)
+    assert up.breaker.state == "half-open"
+    with pytest.raises(HTTPError):  # the probe fails: open again at once
+        up.call(failing(HTTPError(503)))
+    assert up.breaker.state == "open"
+
+    time.sleep(0.06)
+    assert up.call(failing()) == "ok"
+    assert up.breaker.state == "closed"
+
+
+def test_async_calls_retry_too(monkeypatch):
+    async def no_sleep(seconds):
+        pass
+
+    monkeypatch.setattr(upstream.asyncio, "sleep", no_sleep)
+    fn = failing(HTTPError(503))
+
+    async def main():
+        return await Upstream("test", retries=2).acall(fn)
+
+    assert asyncio.run(main()) == "ok" and fn.calls == 2
+
+
+def test_interactive_calls_go_ahead_of_bulk_ones():
+    up = Upstream("test", concurrency=1)
+    order = []
+    with up.slot():  # hold the only slot while both wait
+        def wait(level, name):
+            with upstream.priority(level), up.slot():
+                order.append(name)
+
+        threads = [threading.Thread(target=wait, args=(upstream.BULK, "bulk"))]
+        threads[0].start()
+        while up.depth()[upstream.BULK] == 0:
+            time.sleep(0.001)
+        threads.append(threading.Thread(target=wait, args=(upstream.INTERACTIVE, "interactive")))
+        threads[1].start()
+        while up.depth()[upstream.INTERACTIVE] == 0:
+            time.sleep(0.001)
+    for thread in threads:
+        thread.join()
+    assert order == ["interactive", "bulk"]
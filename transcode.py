@@ -0,0 +1,139 @@
+"""Re-encode speech WAVs as Ogg/Opus or MP3 with ffmpeg, on a bounded worker pool.
+
+Outputs go into the same BlobCache as the WAVs, keyed by source, format, bitrate and
+sample rate. Concurrent requests for the same output share one ffmpeg run."""
+import hashlib, os, shutil, subprocess, tempfile, threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class Format:
+    mimetype: str
+    codec: tuple  # ffmpeg output options; empty for the WAV the engine writes
+    bitrate: int  # default kbps
+    rates: tuple  # sample rates the encoder accepts; the first is the default
+
+
+FORMATS = {
+    "wav": Format("audio/wav", (), 0, ()),
+    # Opus at 24-32 kbps is transparent for speech; "voip" tunes it for intelligibility.
+    "ogg": Format("audio/ogg", ("-c:a", "libopus", "-application", "voip"), 32, (24000, 16000, 12000, 8000, 48000)),
+    "mp3": Format("audio/mpeg", ("-c:a", "libmp3lame"), 64, (22050, 16000, 24000, 32000, 44100, 48000)),
+}
+ALIASES = {"opus": "ogg", "mpeg": "mp3", "wave": "wav"}
+MIN_KBPS, MAX_KBPS = 8, 192
+
+
+def available() -> bool:
+    return shutil.which("ffmpeg") is not None
+
+
+def offered() -> list:
+    """The formats this server can produce, smallest first: WAV alone without ffmpeg."""
+    return ["ogg", "mp3", "wav"] if available() else ["wav"]
+
+
+def sniff(path):
+    """The format name of the file at `path`, from its first bytes, or None if unknown."""
+    with open(path, "rb") as f:
+        head = f.read(4)
+    if head[:4] == b"RIFF":
+        return "wav"
+    if head[:4] == b"OggS":
+        return "ogg"
+    if head[:3] == b"ID3" or (len(head) > 1 and head[0] == 0xFF and head[1] & 0xE0 == 0xE0):
+        return "mp3"
+    return None
+
+
+def options(name, bitrate=None, rate=None):
+    """(format name, kbps, sample rate) with defaults filled in; ValueError if unsupported."""
+    name = ALIASES.get((name or "wav").lower(), (name or "wav").lower())
+    if name not in FORMATS:
+        raise ValueError(f"unknown format {name!r}; choose from {', '.join(FORMATS)}")
+    fmt = FORMATS[name]
+    if name == "wav":
+        return name, None, None
+    bitrate = int(bitrate or fmt.bitrate)
+    rate = int(rate or fmt.rates[0])
+    if not MIN_KBPS <= bitrate <= MAX_KBPS:
+        raise ValueError(f"bitrate must be {MIN_KBPS}-{MAX_KBPS} kbps")
+    if rate not in fmt.rates:
+        raise ValueError(f"{name} supports sample rates {', '.join(map(str, sorted(fmt.rates)))}")
+    return name, bitrate, rate
+
+
+def encode_pcm(pcm: bytes, rate, name, bitrate, extra=()) -> bytes:
+    """16-bit mono PCM at `rate` as a `name` file (not WAV), encoded in memory; `extra`
+    are more ffmpeg output options."""
+    ffmpeg = shutil.which("ffmpeg")
+    if not ffmpeg:
+        raise RuntimeError(f"ffmpeg is required for {name} output")
+    proc = subprocess.run(
+        [ffmpeg, "-nostdin", "-loglevel", "error", "-f", "s16le", "-ar", str(rate), "-ac", "1", "-i", "pipe:0",
+         *FORMATS[name].codec, *extra, "-b:a", f"{bitrate}k", "-f", name, "pipe:1"],
+        input=pcm, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=False,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"ffmpeg failed: {proc.stderr.decode(errors='replace').strip()}")
+    return proc.stdout
+
+
+class Transcoder:
+    def __init__(self, cache, workers=2, timeout=300):
+        self.cache = cache
+        self.timeout = timeout
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="transcode")
+        self._running = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(src_key, name, bitrate, rate) -> str:
+        return hashlib.sha256(f"{src_key}:{name}:{bitrate}:{rate}".encode()).hexdigest()
+
+    def convert(self, src_path, src_key, name, bitrate=None, rate=None):
+        """Returns (key, path, served from cache) of `src_path` in format `name`; a WAV
+        is returned as it is. `src_key` identifies the source's content."""
+        name, bitrate, rate = options(name, bitrate, rate)
+        if name == "wav":
+            return src_key, src_path, True
+        key = self.key(src_key, name, bitrate, rate)
+        path = self.cache.lookup(key)
+        if path:
+            return key, path, True
+        with self._lock:
+            future = self._running.get(key)
+            if future is None:
+                future = self._running[key] = self._pool.submit(self._encode, src_path, key, name, bitrate, rate)
+                future.add_done_callback(lambda _: self._forget(key))
+        return key, future.result(timeout=self.timeout), False
+
+    def _forget(self, key):
+        with self._lock:
+            self._running.pop(key, None)
+
+    def _encode(self, src_path, key, name, bitrate, rate):
+        ffmpeg = shutil.which("ffmpeg")
+        if not ffmpeg:
+            raise RuntimeError(f"ffmpeg is required for {name} output")
+        fd, tmp = tempfile.mkstemp(suffix=f".{name}", dir=self.cache.folder)
+        os.close(fd)
+        try:
+            proc = subprocess.run(
+                [ffmpeg, "-nostdin", "-loglevel", "error", "-y", "-i", src_path, "-ac", "1", "-ar", str(rate),
+                 *FORMATS[name].codec, "-b:a", f"{bitrate}k", tmp],
+                stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, check=False,
+            )
+            if proc.returncode != 0:
+                raise RuntimeError(f"ffmpeg failed: {proc.stderr.decode(errors='replace').strip()}")
+            return self.cache.set_file(key, tmp)
+        except BaseException:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            raise
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,300 @@
+"""Translation memory: sentence translations kept per language in SQLite, and a glossary
+of fixed term translations.
+
+Text is cut into sentence segments. A segment whose normalized form (case, quotes,
+whitespace, punctuation and filler words aside) was translated before is served from
+the memory. Any other difference, down to a single letter ("walk"/"walked",
+"book"/"books"), makes it a new segment. Only the new segments go to the model, with
+the glossary terms they contain spelled out in the prompt."""
+import hashlib, json, os, re, sqlite3, threading, time, unicodedata
+from dataclasses import dataclass, field
+
+from segment import PARAGRAPH_RE, estimate_tokens, split_sentences
+
+FILLERS = {"um", "uh", "erm", "er", "hmm", "mm"}
+LINE_END_RE = re.compile(r"[.!?…:;。！？][\"'”’)\]]*$")
+LIST_ITEM_RE = re.compile(r"^([-*•]|\d+[.)])\s")
+MAX_TERMS = 30
+SCHEMA_VERSION = 2
+# How long a worker trusts its copy of a glossary before checking for changes made by others.
+GLOSSARY_RECHECK_S = 1.0
+
+
+def normalize(text: str) -> str:
+    """The form segments are matched on: NFKC, lower case, words only, no fillers."""
+    text = unicodedata.normalize("NFKC", text).casefold().replace("’", "'")
+    return " ".join(word for word in re.findall(r"[\w']+", text) if word not in FILLERS)
+
+
+def digest(norm: str) -> str:
+    return hashlib.sha1(norm.encode("utf-8")).hexdigest()
+
+
+def language(lang: str) -> str:
+    return " ".join((lang or "").split()).casefold()
+
+
+@dataclass
+class Segment:
+    source: str
+    sep: str  # what follows it: " " inside a line, "\n" between lines, "\n\n" between paragraphs, "" at the end
+
+
+def segments(text: str):
+    """`text` as sentence segments. A line break ends a segment after sentence
+    punctuation or before a list item; otherwise it is a wrapped line, read as a space."""
+    out = []
+    for paragraph in PARAGRAPH_RE.split(text.strip()):
+        lines = []
+        for line in (line.strip() for line in paragraph.splitlines()):
+            if not line:
+                continue
+            if lines and not LINE_END_RE.search(lines[-1]) and not LIST_ITEM_RE.match(line):
+                lines[-1] += " " + line
+            else:
+                lines.append(line)
+        for i, line in enumerate(lines):
+            sentences = split_sentences(line)
+            for j, sentence in enumerate(sentences):
+                sep = " " if j < len(sentences) - 1 else "\n" if i < len(lines) - 1 else "\n\n"
+                out.append(Segment(" ".join(sentence.split()), sep))
+    if out:
+        out[-1].sep = ""
+    return out
+
+
+def batches(sources, max_tokens):
+    """Consecutive runs of `sources` of up to `max_tokens`, one model call each."""
+    out, current, size = [], [], 0
+    for source in sources:
+        tokens = estimate_tokens(source)
+        if current and size + tokens > max_tokens:
+            out.append(current)
+            current, size = [], 0
+        current.append(source)
+        size += tokens
+    if current:
+        out.append(current)
+    return out
+
+
+def parse_list(output: str, count: int):
+    """The translations in a JSON array answer, or None unless it has exactly `count` strings."""
+    output = re.sub(r"^```(?:json)?|```$", "", output.strip(), flags=re.MULTILINE).strip()
+    start, end = output.find("["), output.rfind("]")
+    if start == -1 or end <= start:
+        return None
+    try:
+        data = json.loads(output[start:end + 1])
+    except ValueError:
+        return None
+    if not isinstance(data, list) or len(data) != count or not all(isinstance(item, str) and item.strip() for item in data):
+        return None
+    return [item.strip() for item in data]
+
+
+@dataclass
+class Plan:
+    """What a translation needs: the segments, the ones already known (source ->
+    translation), and the unseen ones in model-call batches with their glossary terms."""
+    segments: list
+    known: dict
+    batches: list = field(default_factory=list)
+    terms: list = field(default_factory=list)
+    hits: int = 0
+
+
+class TranslationMemory:
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._patterns = {}
+        db = self._db()
+        if db.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+            # Version 1 also served near-duplicates and kept a trigram index for them.
+            db.executescript(f"""
+                DROP TABLE IF EXISTS segments; DROP TABLE IF EXISTS grams; DROP TABLE IF EXISTS gram_counts;
+                DROP TABLE IF EXISTS lookups; PRAGMA user_version = {SCHEMA_VERSION};
+            """)
+        db.executescript("""
+            CREATE TABLE IF NOT EXISTS segments (
+                id INTEGER PRIMARY KEY, lang TEXT NOT NULL, hash TEXT NOT NULL, norm TEXT NOT NULL,
+                source TEXT NOT NULL, target TEXT NOT NULL, created REAL NOT NULL, UNIQUE (lang, hash)
+            );
+            CREATE TABLE IF NOT EXISTS glossary (
+                lang TEXT NOT NULL, norm TEXT NOT NULL, term TEXT NOT NULL, translation TEXT NOT NULL,
+                updated REAL NOT NULL, PRIMARY KEY (lang, norm)
+            );
+            CREATE TABLE IF NOT EXISTS lookups (
+                lang TEXT PRIMARY KEY, hits INTEGER NOT NULL, misses INTEGER NOT NULL
+            );
+        """)
+        db.commit()
+
+    def _db(self):
+        db = getattr(self._local, "db", None)
+        if db is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            db = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    # ---------- Segments ----------
+    def plan(self, lang, text, max_tokens=800, use_memory=True) -> Plan:
+        """Segment `text`, look its segments up and batch the unseen ones. Counts the
+        lookups for `stats`, unless `use_memory` is off (then everything is unseen)."""
+        segs = segments(text)
+        sources = list(dict.fromkeys(seg.source for seg in segs))
+        plan = Plan(segs, {})
+        if use_memory:
+            plan.known = self.lookup(lang, sources)
+            plan.hits = len(plan.known)
+        unseen = [source for source in sources if source not in plan.known]
+        plan.batches = batches(unseen, max_tokens)
+        plan.terms = self.terms_in(lang, unseen)
+        if use_memory:
+            self._count(lang, plan.hits, len(unseen))
+        return plan
+
+    def lookup(self, lang, sources) -> dict:
+        """source -> translation, for the `sources` the memory knows."""
+        lang, db = language(lang), self._db()
+        by_hash = {digest(norm): source for source, norm in ((source, normalize(source)) for source in sources) if norm}
+        found, hashes = {}, list(by_hash)
+        for i in range(0, len(hashes), 500):
+            part = hashes[i:i + 500]
+            rows = db.execute(f"SELECT hash, target FROM segments WHERE lang = ? AND hash IN ({','.join('?' * len(part))})",
+                              (lang, *part)).fetchall()
+            found.update((by_hash[row_hash], target) for row_hash, target in rows)
+        return found
+
+    def learn(self, lang, pairs):
+        """Remember (source, translation) pairs; a newer translation replaces an older one."""
+        lang, db = language(lang), self._db()
+        now = time.time()
+        for source, target in pairs:
+            norm = normalize(source)
+            if not norm or not target:
+                continue
+            db.execute("INSERT INTO segments (lang, hash, norm, source, target, created) VALUES (?, ?, ?, ?, ?, ?) "
+                       "ON CONFLICT (lang, hash) DO UPDATE SET source = excluded.source, target = excluded.target, "
+                       "created = excluded.created", (lang, digest(norm), norm, source, target, now))
+        db.commit()
+
+    def forget(self, lang, phrase) -> int:
+        """Drop the segments of `lang` that contain `phrase`; returns how many."""
+        lang, db = language(lang), self._db()
+        like = "% " + normalize(phrase).replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + " %"
+        deleted = db.execute("DELETE FROM segments WHERE lang = ? AND ' ' || norm || ' ' LIKE ? ESCAPE '\\'",
+                             (lang, like)).rowcount
+        db.commit()
+        return deleted
+
+    def _count(self, lang, hits, misses):
+        db = self._db()
+        db.execute("INSERT INTO lookups (lang, hits, misses) VALUES (?, ?, ?) ON CONFLICT (lang) DO UPDATE "
+                   "SET hits = hits + excluded.hits, misses = misses + excluded.misses", (language(lang), hits, misses))
+        db.commit()
+
+    def stats(self) -> dict:
+        """Per language: stored segments, glossary terms, lookups by outcome and hit ratio."""
+        db = self._db()
+        langs = {}
+        for lang, segment_count in db.execute("SELECT lang, COUNT(*) FROM segments GROUP BY lang"):
+            langs.setdefault(lang, {})["segments"] = segment_count
+        for lang, term_count in db.execute("SELECT lang, COUNT(*) FROM glossary GROUP BY lang"):
+            langs.setdefault(lang, {})["terms"] = term_count
+        for lang, hits, misses in db.execute("SELECT lang, hits, misses FROM lookups"):
+            langs.setdefault(lang, {}).update(hits=hits, misses=misses,
+                                              hit_ratio=round(hits / (hits + misses), 4) if hits + misses else 0.0)
+        return {lang: dict({"segments": 0, "terms": 0, "hits": 0, "misses": 0, "hit_ratio": 0.0}, **values)
+                for lang, values in sorted(langs.items())}
+
+    # ---------- Glossary ----------
+    def set_term(self, lang, term, translation):
+        """Add or change a glossary term. Remembered segments containing it are
+        forgotten when the translation changes, so they are translated again with it."""
+        term, translation = " ".join(term.split()), " ".join(translation.split())
+        if not normalize(term) or not translation:
+            raise ValueError("a glossary entry needs a term and its translation")
+        db = self._db()
+        old = db.execute("SELECT translation FROM glossary WHERE lang = ? AND norm = ?",
+                         (language(lang), normalize(term))).fetchone()
+        db.execute("INSERT INTO glossary (lang, norm, term, translation, updated) VALUES (?, ?, ?, ?, ?) "
+                   "ON CONFLICT (lang, norm) DO UPDATE SET term = excluded.term, translation = excluded.translation, "
+                   "updated = excluded.updated", (language(lang), normalize(term), term, translation, time.time()))
+        db.commit()
+        self._patterns.pop(language(lang), None)
+        if old is None or old[0] != translation:
+            self.forget(lang, term)
+
+    def delete_term(self, lang, term) -> bool:
+        """Remove a glossary term, and the remembered segments translated with it."""
+        db = self._db()
+        deleted = db.execute("DELETE FROM glossary WHERE lang = ? AND norm = ?", (language(lang), normalize(term))).rowcount
+        db.commit()
+        self._patterns.pop(language(lang), None)
+        if deleted:
+            self.forget(lang, term)
+        return bool(deleted)
+
+    def glossary_version(self, lang) -> str:
+        """A digest of `lang`'s glossary ("" when it has none); it changes with every term."""
+        return self._glossary(language(lang))["version"]
+
+    def glossary(self, lang=None):
+        """{lang: {term: translation}}, for one language or all."""
+        query, args = "SELECT lang, term, translation FROM glossary", ()
+        if lang:
+            query, args = query + " WHERE lang = ?", (language(lang),)
+        out = {}
+        for row_lang, term, translation in self._db().execute(query + " ORDER BY lang, norm", args):
+            out.setdefault(row_lang, {})[term] = translation
+        return out
+
+    def load_glossary(self, path):
+        """Add the terms of a JSON file shaped like `glossary()`'s answer."""
+        with open(path, encoding="utf-8") as f:
+            for lang, terms in json.load(f).items():
+                for term, translation in terms.items():
+                    self.set_term(lang, term, translation)
+
+    def terms_in(self, lang, texts):
+        """(term, translation) for the glossary terms of `lang` that occur in `texts`,
+        in order of first occurrence, at most MAX_TERMS."""
+        if not texts:
+            return []
+        glossary = self._glossary(language(lang))
+        pattern, translations = glossary["pattern"], glossary["translations"]
+        if pattern is None:
+            return []
+        found = {}
+        for text in texts:
+            for match in pattern.finditer(normalize(text)):
+                found.setdefault(match.group(0), translations[match.group(0)])
+        return list(found.values())[:MAX_TERMS]
+
+    def _glossary(self, lang):
+        """`lang`'s terms, one regex over them (longest first) and their version. Checked
+        against the database at most every GLOSSARY_RECHECK_S, and at once after a
+        change made through this object."""
+        now = time.monotonic()
+        cached = self._patterns.get(lang)
+        if cached and now - cached["checked"] < GLOSSARY_RECHECK_S:
+            return cached
+        stamp = self._db().execute("SELECT COUNT(*), MAX(updated) FROM glossary WHERE lang = ?", (lang,)).fetchone()
+        if cached and cached["stamp"] == stamp:
+            cached["checked"] = now
+            return cached
+        rows = sorted(self._db().execute("SELECT norm, term, translation FROM glossary WHERE lang = ?", (lang,)).fetchall())
+        translations = {norm: (term, translation) for norm, term, translation in rows}
+        pattern, version = None, ""
+        if rows:
+            alternatives = "|".join(re.escape(norm) for norm in sorted(translations, key=len, reverse=True))
+            pattern = re.compile(rf"(?<![\w'])(?:{alternatives})(?![\w'])")
+            version = digest(json.dumps(rows, ensure_ascii=False))[:16]
+        self._patterns[lang] = glossary = {"stamp": stamp, "checked": now, "pattern": pattern,
+                                           "translations": translations, "version": version}
+        return glossary
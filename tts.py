@@ -0,0 +1,151 @@
+"""Text-to-speech on a pool of pre-initialised pyttsx3 engines, with rendered WAVs cached.
+
+pyttsx3 engines are not thread-safe and `pyttsx3.init()` hands back one shared engine
+per driver, so every engine lives in its own worker process. Each worker sets up its
+engine once, with the voice, rate and volume resolved at startup."""
+import hashlib, json, os, tempfile, threading
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+
+from cache import normalize_text
+
+VOICE_HINTS = ["male", "david", "mark", "daniel", "alex", "george", "tom"]
+
+_engine = None
+
+
+def _init_worker(engine_factory, voice_hints, rate_factor, volume):
+    global _engine
+    if engine_factory is None:
+        import pyttsx3
+        engine_factory = pyttsx3.init
+    eng = engine_factory()
+    chosen = None
+    for v in eng.getProperty("voices") or []:
+        name = (getattr(v, "name", "") or "").lower()
+        if "female" not in name and any(k in name for k in voice_hints):
+            chosen = v.id
+            break
+    if chosen:
+        eng.setProperty("voice", chosen)
+    base = eng.getProperty("rate") or 200
+    eng.setProperty("rate", max(80, int(base * rate_factor)))
+    eng.setProperty("volume", volume)
+    _engine = eng
+
+
+def _describe():
+    return {
+        "voice": _engine.getProperty("voice"),
+        "rate": _engine.getProperty("rate"),
+        "volume": _engine.getProperty("volume"),
+    }
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def _render(text, path):
+    _engine.save_to_file(text, path)
+    _engine.runAndWait()
+    return path
+
+
+class TTSPool:
+    """`speak(text)` returns the path of a cached WAV, rendering it on a worker if needed.
+
+    `engine_factory` (a picklable callable returning a pyttsx3-like engine) replaces
+    `pyttsx3.init`, e.g. with a fake for benchmarks."""
+
+    def __init__(self, cache, workers=2, voice_hints=None, rate_factor=0.6, volume=1.0,
+                 engine_factory=None, timeout=120):
+        self.cache = cache
+        self.workers = workers
+        self.timeout = timeout
+        self._initargs = (engine_factory, voice_hints or VOICE_HINTS, rate_factor, volume)
+        self._pool = None
+        self._settings = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Spawn the workers and resolve the voice; called lazily by `speak`."""
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                    initargs=self._initargs,
+                )
+                # One call per worker so every engine is initialised before traffic arrives.
+                futures = [self._pool.submit(_describe) for _ in range(self.workers)]
+                self._settings = futures[0].result(timeout=self.timeout)
+                for future in futures[1:]:
+                    future.result(timeout=self.timeout)
+        return self._settings
+
+    def key(self, text) -> str:
+        settings = self.start()
+        payload = json.dumps([normalize_text(text), settings["voice"], settings["rate"], settings["volume"]])
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def speak(self, text):
+        """Returns (path to WAV, served from cache)."""
+        path, cached, error = next(self.speak_many([text]))
+        if error is not None:
+            raise error
+        return path, cached
+
+    def speak_many(self, texts):
+        """Yields (path or None, served from cache, error or None) per text, in order.
+
+        Every text missing from the cache is queued on the workers at once, so later
+        texts render while earlier ones are consumed. Renders not yet consumed are
+        cancelled (or discarded) when the caller stops early."""
+        jobs, queued = [], {}
+        for text in texts:
+            key = self.key(text)
+            if key in queued:  # repeated within this call: rendered once
+                jobs.append((key, None, None))
+                continue
+            path = self.cache.lookup(key)
+            if path:
+                jobs.append((key, None, path))
+                continue
+            fd, tmp = tempfile.mkstemp(suffix=".wav", dir=self.cache.folder)
+            os.close(fd)
+            queued[key] = self._pool.submit(_render, text, tmp)
+            jobs.append((key, queued[key], tmp))
+        done = 0
+        try:
+            for key, future, path in jobs:
+                done += 1
+                if future is None:
+                    path = path or self.cache.lookup(key)
+                    yield path, True, None if path else RuntimeError("speech engine produced no audio")
+                    continue
+                try:
+                    future.result(timeout=self.timeout)
+                    if os.path.getsize(path) == 0:
+                        raise RuntimeError("speech engine produced no audio")
+                    path = self.cache.set_file(key, path)
+                except Exception as e:
+                    _remove(path)
+                    yield None, False, e
+                    continue
+                yield path, False, None
+        finally:
+            for key, future, path in jobs[done:]:
+                if future is not None:
+                    future.cancel()
+                    future.add_done_callback(lambda _, path=path: _remove(path))
+
+    def shutdown(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown()
+                self._pool = None
@@ -0,0 +1,71 @@
+"""Upload ingest: uploads are hashed and sniffed while Werkzeug writes them, into a
+buffer that stays in memory when small and spills to a dedicated temp dir when large."""
+import hashlib, os, shutil, tempfile
+from contextlib import contextmanager
+
+from flask import Request, current_app
+from werkzeug.exceptions import UnsupportedMediaType
+
+import audio
+
+
+class HashingFile:
+    """Write-through wrapper that hashes the upload and checks its container type from
+    the first bytes, so bad uploads are rejected before the rest is even stored."""
+
+    def __init__(self, f):
+        self._f = f
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+        self.kind = None
+        self._head = b""
+
+    def write(self, data):
+        if self.kind is None:
+            self._head += bytes(data[:audio.SNIFF_BYTES - len(self._head)])
+            if len(self._head) >= audio.SNIFF_BYTES:
+                self.kind = audio.sniff(self._head)
+                if self.kind is None:
+                    raise UnsupportedMediaType("Unrecognised audio file; upload WAV, MP3, M4A, FLAC, OGG or WebM.")
+        self.sha256.update(data)
+        self.size += len(data)
+        return self._f.write(data)
+
+    @property
+    def digest(self) -> str:
+        return self.sha256.hexdigest()
+
+    def __getattr__(self, name):
+        return getattr(self._f, name)
+
+    def __iter__(self):
+        return iter(self._f)
+
+
+class UploadRequest(Request):
+    """Uploads go into a HashingFile: in memory up to UPLOAD_SPOOL_BYTES, otherwise a
+    named temp file under UPLOAD_TMP_DIR that is deleted when the request ends."""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        config = current_app.config
+        if (total_content_length or 0) > config["UPLOAD_SPOOL_BYTES"]:
+            os.makedirs(config["UPLOAD_TMP_DIR"], exist_ok=True)
+            return HashingFile(tempfile.NamedTemporaryFile(dir=config["UPLOAD_TMP_DIR"], suffix=".upload"))
+        return HashingFile(tempfile.SpooledTemporaryFile(config["UPLOAD_SPOOL_BYTES"], dir=config["UPLOAD_TMP_DIR"]))
+
+
+@contextmanager
+def on_disk(stream, tmp_dir, suffix=""):
+    """Path of a file holding `stream`: the stream's own file when it has one, else a
+    temp copy (only needed for small in-memory uploads)."""
+    name = getattr(stream, "name", None)
+    if isinstance(name, str) and os.path.isfile(name):
+        stream.flush()
+        yield name
+        return
+    os.makedirs(tmp_dir, exist_ok=True)
+    with tempfile.NamedTemporaryFile(dir=tmp_dir, suffix=suffix) as tmp:
+        stream.seek(0)
+        shutil.copyfileobj(stream, tmp)
+        tmp.flush()
+        yield tmp.name
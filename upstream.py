@@ -0,0 +1,405 @@
+"""Shared scheduler for calls to the hosted models (Whisper, Groq).
+
+There is one `Upstream` per provider and model. Each one provides:
+- a token bucket that sets the request rate. A 429 halves the rate, and the rate
+  creeps back up as calls succeed.
+- a priority queue, so interactive requests go ahead of bulk jobs.
+- retries of transient errors with exponential backoff and full jitter, honouring
+  Retry-After.
+- a circuit breaker that fails fast while the provider keeps failing.
+
+Threads use `call`/`slot`; coroutines use `acall`/`aslot`. The priority comes from the
+current context, so wrap bulk work in `with priority(BULK):`."""
+import asyncio, contextvars, email.utils, functools, heapq, inspect, itertools, os, random, threading, time
+from contextlib import asynccontextmanager, contextmanager
+from types import SimpleNamespace
+
+from metrics import REGISTRY
+
+INTERACTIVE, BULK = 0, 1
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BULK: "bulk"}
+RETRYABLE_STATUS = {408, 409, 429}
+MAX_RETRY_AFTER = 120.0
+
+WAIT_SECONDS = REGISTRY.histogram("eduspeak_upstream_wait_seconds", "Time calls spent queued for an upstream slot.")
+RETRIES = REGISTRY.counter("eduspeak_upstream_retries_total", "Upstream calls retried after a transient error.")
+REJECTED = REGISTRY.counter("eduspeak_upstream_rejected_total", "Calls failed fast by an open circuit breaker.")
+
+_priority = contextvars.ContextVar("upstream_priority", default=INTERACTIVE)
+_upstreams = {}
+_registry_lock = threading.Lock()
+
+
+class CircuitOpenError(RuntimeError):
+    pass
+
+
+@contextmanager
+def priority(level):
+    token = _priority.set(level)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def bulk(fn):
+    """Decorator: run `fn` at BULK priority."""
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        with priority(BULK):
+            return fn(*args, **kwargs)
+    return wrapper
+
+
+def status_of(error):
+    for obj in (error, getattr(error, "response", None)):
+        code = getattr(obj, "status_code", None)
+        if isinstance(code, int):
+            return code
+    return None
+
+
+def is_retryable(error) -> bool:
+    """Rate limits, timeouts, connection failures and 5xx; not bad requests."""
+    code = status_of(error)
+    if code is not None:
+        return code in RETRYABLE_STATUS or code >= 500
+    name = type(error).__name__
+    return any(word in name for word in ("Timeout", "Connection", "RateLimit"))
+
+
+def retry_after(error):
+    """Seconds from a Retry-After(-ms) header on the error's response, or None."""
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    if not headers:
+        return None
+    try:
+        if headers.get("retry-after-ms"):
+            return min(MAX_RETRY_AFTER, float(headers["retry-after-ms"]) / 1000)
+        value = headers.get("retry-after")
+        if not value:
+            return None
+        try:
+            seconds = float(value)
+        except ValueError:
+            seconds = email.utils.parsedate_to_datetime(value).timestamp() - time.time()
+        return min(MAX_RETRY_AFTER, max(0.0, seconds))
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """`rate` tokens per second, up to `burst`. Not locked; Upstream holds its lock."""
+
+    def __init__(self, rate, burst):
+        self.max_rate = self.rate = rate
+        self.min_rate = rate / 16
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+
+    def delay(self, now) -> float:
+        """Seconds until a token is available."""
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        wait = max(0.0, self.paused_until - now)
+        if self.tokens < 1:
+            wait = max(wait, (1 - self.tokens) / self.rate)
+        return wait
+
+    def take(self):
+        self.tokens -= 1
+
+    def throttle(self, pause):
+        """Rate limited upstream: halve the rate and hold every caller for `pause`."""
+        self.rate = max(self.min_rate, self.rate / 2)
+        self.tokens = min(self.tokens, 0.0)
+        self.paused_until = max(self.paused_until, time.monotonic() + pause)
+
+    def recover(self):
+        self.rate = min(self.max_rate, self.rate + self.max_rate / 20)
+
+
+class CircuitBreaker:
+    """Opens after `failures` consecutive transient failures. While it is open, calls
+    fail fast. After `reset_s`, one probe call is let through, and its outcome closes
+    or re-opens the breaker. Not locked; Upstream holds its lock."""
+
+    def __init__(self, name, failures=5, reset_s=30.0):
+        self.name, self.threshold, self.reset_s = name, failures, reset_s
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        return "half-open" if self.probing or time.monotonic() >= self.opened_at + self.reset_s else "open"
+
+    def admit(self):
+        if self.opened_at is None:
+            return
+        remaining = self.opened_at + self.reset_s - time.monotonic()
+        if remaining > 0 or self.probing:
+            raise CircuitOpenError(f"{self.name} is unavailable; retrying in {max(remaining, 1):.0f}s")
+        self.probing = True
+
+    def success(self):
+        self.failures, self.opened_at, self.probing = 0, None, False
+
+    def failure(self):
+        self.failures += 1
+        if self.probing or self.failures >= self.threshold:
+            self.opened_at = time.monotonic()
+        self.probing = False
+
+
+class _Waiter:
+    __slots__ = ("priority", "wake", "enqueued", "granted", "cancelled")
+
+    def __init__(self, priority, wake):
+        self.priority, self.wake = priority, wake
+        self.enqueued = time.monotonic()
+        self.granted = self.cancelled = False
+
+
+class Upstream:
+    def __init__(self, name, rate_per_min=600.0, burst=None, concurrency=16, retries=4, backoff=0.5,
+                 max_backoff=30.0, breaker_failures=5, breaker_reset_s=30.0):
+        self.name = name
+        self.concurrency = concurrency
+        self.retries, self.backoff, self.max_backoff = retries, backoff, max_backoff
+        self.bucket = TokenBucket(rate_per_min / 60, burst or concurrency)
+        self.breaker = CircuitBreaker(name, breaker_failures, breaker_reset_s)
+        self._lock = threading.Lock()
+        self._queue = []
+        self._seq = itertools.count()
+        self._active = 0
+        self._timer = None
+
+    # ----- queue -----
+    def _dispatch(self):
+        """Grant slots to the best waiters the bucket allows. Called with the lock held."""
+        while self._queue and self._active < self.concurrency:
+            waiter = self._queue[0][2]
+            if waiter.cancelled:
+                heapq.heappop(self._queue)
+                continue
+            delay = self.bucket.delay(time.monotonic())
+            if delay > 0:
+                if self._timer is None:
+                    self._timer = threading.Timer(delay, self._tick)
+                    self._timer.daemon = True
+                    self._timer.start()
+                return
+            heapq.heappop(self._queue)
+            self.bucket.take()
+            self._active += 1
+            waiter.granted = True
+            WAIT_SECONDS.observe(time.monotonic() - waiter.enqueued, upstream=self.name,
+                                 priority=PRIORITY_NAMES.get(waiter.priority, str(waiter.priority)))
+            waiter.wake()
+
+    def _tick(self):
+        with self._lock:
+            self._timer = None
+            self._dispatch()
+
+    def _enqueue(self, wake):
+        waiter = _Waiter(_priority.get(), wake)
+        with self._lock:
+            heapq.heappush(self._queue, (waiter.priority, next(self._seq), waiter))
+            self._dispatch()
+        return waiter
+
+    def _cancel(self, waiter):
+        with self._lock:
+            waiter.cancelled = True
+            if waiter.granted:
+                self._active -= 1
+                self._dispatch()
+
+    def _release(self):
+        with self._lock:
+            self._active -= 1
+            self._dispatch()
+
+    def _acquire(self):
+        event = threading.Event()
+        waiter = self._enqueue(event.set)
+        try:
+            event.wait()
+        except BaseException:
+            self._cancel(waiter)
+            raise
+
+    async def _aacquire(self):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        waiter = self._enqueue(lambda: loop.call_soon_threadsafe(lambda: future.done() or future.set_result(None)))
+        try:
+            await future
+        except BaseException:
+            self._cancel(waiter)
+            raise
+
+    def depth(self) -> dict:
+        with self._lock:
+            counts = {level: 0 for level in PRIORITY_NAMES}
+            for level, _, waiter in self._queue:
+                if not waiter.cancelled:
+                    counts[level] = counts.get(level, 0) + 1
+            return counts
+
+    # ----- outcomes -----
+    def _admit(self):
+        with self._lock:
+            try:
+                self.breaker.admit()
+            except CircuitOpenError:
+                REJECTED.inc(upstream=self.name)
+                raise
+
+    def _settle(self, outcome):
+        """`outcome` is True, the exception raised, or None when the call never ran."""
+        with self._lock:
+            if outcome is None:
+                self.breaker.probing = False
+            elif outcome is True or not is_retryable(outcome):
+                # Any real answer, even a 400, shows the provider is up.
+                self.breaker.success()
+                self.bucket.recover()
+            else:
+                self.breaker.failure()
+                if status_of(outcome) == 429:
+                    self.bucket.throttle(retry_after(outcome) or 1.0)
+
+    def retry_delay(self, attempt, error) -> float:
+        return retry_after(error) or random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    @contextmanager
+    def slot(self):
+        """Rate limit and circuit breaker, without retries (e.g. for a stream)."""
+        self._admit()
+        outcome = None
+        try:
+            self._acquire()
+            try:
+                yield
+                outcome = True
+            except Exception as e:
+                outcome = e
+                raise
+            finally:
+                self._release()
+        finally:
+            self._settle(outcome)
+
+    @asynccontextmanager
+    async def aslot(self):
+        self._admit()
+        outcome = None
+        try:
+            await self._aacquire()
+            try:
+                yield
+                outcome = True
+            except Exception as e:
+                outcome = e
+                raise
+            finally:
+                self._release()
+        finally:
+            self._settle(outcome)
+
+    def call(self, fn, *args, **kwargs):
+        """`fn(*args, **kwargs)` in a slot, retrying transient errors."""
+        for attempt in itertools.count():
+            try:
+                with self.slot():
+                    return fn(*args, **kwargs)
+            except CircuitOpenError:
+                raise
+            except Exception as e:
+                if attempt >= self.retries or not is_retryable(e):
+                    raise
+                RETRIES.inc(upstream=self.name)
+                time.sleep(self.retry_delay(attempt, e))
+
+    async def acall(self, fn, *args, **kwargs):
+        """`call` for coroutines; `fn` may return an awaitable."""
+        for attempt in itertools.count():
+            try:
+                async with self.aslot():
+                    result = fn(*args, **kwargs)
+                    return await result if inspect.isawaitable(result) else result
+            except CircuitOpenError:
+                raise
+            except Exception as e:
+                if attempt >= self.retries or not is_retryable(e):
+                    raise
+                RETRIES.inc(upstream=self.name)
+                await asyncio.sleep(self.retry_delay(attempt, e))
+
+
+DEFAULT_RPM = {"groq": 300, "openai": 500}
+
+
+def get(provider, model) -> Upstream:
+    """The shared Upstream for a provider/model, configured from the environment
+    (<PROVIDER>_RPM plus the UPSTREAM_* settings)."""
+    provider = (provider or "model").lower()
+    name = f"{provider}:{model}"
+    with _registry_lock:
+        if name not in _upstreams:
+            _upstreams[name] = Upstream(
+                name,
+                rate_per_min=float(os.getenv(f"{provider.upper()}_RPM", DEFAULT_RPM.get(provider, 600))),
+                concurrency=int(os.getenv("UPSTREAM_CONCURRENCY", "16")),
+                retries=int(os.getenv("UPSTREAM_RETRIES", "4")),
+                breaker_failures=int(os.getenv("UPSTREAM_BREAKER_FAILURES", "5")),
+                breaker_reset_s=float(os.getenv("UPSTREAM_BREAKER_RESET_S", "30")),
+            )
+        return _upstreams[name]
+
+
+def for_agent(agent) -> Upstream:
+    model = getattr(agent, "model", None)
+    return get(getattr(model, "provider", None), getattr(model, "id", None) or agent.name)
+
+
+def scheduled_client(client, upstream, asynchronous=False):
+    """A stand-in for an (Async)OpenAI `client` whose `audio.transcriptions.create` goes
+    through `upstream`. The uploaded file is rewound before every attempt."""
+    def create(**kwargs):
+        payload = kwargs.get("file")
+        payload = payload[1] if isinstance(payload, tuple) else payload
+        start = payload.tell() if hasattr(payload, "seek") else None
+
+        def attempt():
+            if start is not None:
+                payload.seek(start)
+            return client.audio.transcriptions.create(**kwargs)
+        return upstream.acall(attempt) if asynchronous else upstream.call(attempt)
+
+    return SimpleNamespace(audio=SimpleNamespace(transcriptions=SimpleNamespace(create=create)))
+
+
+def _gauge(read):
+    return lambda: {(("upstream", u.name),): read(u) for u in list(_upstreams.values())}
+
+
+REGISTRY.gauge_callback(
+    "eduspeak_upstream_queue_depth", "Calls waiting for an upstream slot.",
+    lambda: {
+        (("upstream", u.name), ("priority", PRIORITY_NAMES[level])): n
+        for u in list(_upstreams.values()) for level, n in u.depth().items()
+    },
+)
+REGISTRY.gauge_callback("eduspeak_upstream_in_flight", "Upstream calls running.", _gauge(lambda u: u._active))
+REGISTRY.gauge_callback("eduspeak_upstream_rate_per_second", "Current adaptive request rate.", _gauge(lambda u: u.bucket.rate))
+REGISTRY.gauge_callback("eduspeak_upstream_circuit_open", "1 while the circuit breaker is open or probing.",
+                        _gauge(lambda u: 0 if u.breaker.state == "closed" else 1))